@@ -0,0 +1,34 @@
+#
+# Shared laser guidance components behind the unified runner (runner.py) and
+# the detectnet_* laser scripts:  Helios DAC bindings, calibrated
+# camera-to-laser coordinate mapping, closed-loop beam correction, frame
+# buffers, targeting strategies, box outline rasterization, scan path
+# planning, target tracking and selection, region-of-interest detection,
+# capture prefetching, audience-safety exclusion zones, DAC readiness
+# scheduling, the background output threads, fixed-rate DAC refresh, latency
+# instrumentation, the low-rate display side channel, record/replay, and a
+# simulated DAC, camera, projector and scene for running without hardware
+# attached.
+#
+from .helios import HeliosPoint, HELIOS_POINT_DTYPE, load_helios, clamp_coord, make_frame, point_view, wait_ready
+from .mapping import Mapping, LaserMapping, LinearMapping, Detection, detection_centers, detection_boxes, box_corners
+from .calibration import Calibration, LUTMapping
+from .feedback import BeamFeedback, CorrectionGrid, FeedbackMapping, find_dot
+from .buffers import FrameBuffer, FramePool
+from .planner import ScanPlanner, plan_order
+from .outline import OutlineRasterizer
+from .tracker import TargetTracker, LatencyEstimator
+from .selection import TargetSelector
+from .roi import ROIDetector, CropDetector
+from .capture import CapturePrefetcher, cuda_copy
+from .colormap import ColorLUT, create_colormap
+from .targeting import TargetingStrategy, CenterTargeting, CornerTargeting, OutlineTargeting, ConfidenceTargeting, create_strategy
+from .safety import ExclusionMask
+from .scheduler import ReadinessScheduler
+from .writer import LaserWriter, LaserTransform, DeviceWorker, Mailbox
+from .governor import FrameGovernor
+from .profiler import SpanRecorder
+from .display import SideChannel, draw_boxes
+from .runner import GuidanceRunner
+from .recording import Recorder, read_recording, replay
+from .simulator import FakeHeliosDAC, FakeVideoSource, FakeVideoOutput, FakeProjector, SyntheticScene
@@ -0,0 +1,1045 @@
+#!/usr/bin/env python3
+#
+# CPU-only benchmarks of the laser guidance components, run against the
+# simulated Helios DAC so that no camera, Jetson or laser is required.
+#
+#   $ python3 -m laser_guidance.benchmark writer --detect-time 0.02 --transfer-latency 0.01
+#
+import os
+import sys
+import time
+import argparse
+import collections
+import tracemalloc
+
+import numpy as np
+
+from .helios import HeliosPoint, make_frame, wait_ready, DEFAULT_PPS, DEFAULT_FLAGS
+from .mapping import LaserMapping
+from .calibration import Calibration, LUTMapping
+from .buffers import FramePool
+from .colormap import ColorLUT
+from .planner import ScanPlanner, tour_length
+from .outline import OutlineRasterizer
+from .writer import LaserWriter
+from .scheduler import ReadinessScheduler
+from .tracker import TargetTracker
+from .mapping import detection_boxes, box_corners
+from .roi import ROIDetector
+from .profiler import SpanRecorder
+from .targeting import STRATEGIES, create_strategy
+from .runner import GuidanceRunner, create_mapping
+from .capture import CapturePrefetcher
+from .display import SideChannel
+from .safety import ExclusionMask
+from .selection import TargetSelector
+from .feedback import BeamFeedback, FeedbackMapping, CorrectionGrid, find_dot
+from .governor import FrameGovernor
+from .mapping import LinearMapping
+from .simulator import FakeHeliosDAC, SyntheticScene, SyntheticImage, FakeDetector, FakeVideoSource, FakeVideoOutput, FakeProjector, frame_points
+
+
+def percentiles(samples):
+    """
+    Format the mean/p50/p95/p99 of a list of durations (in seconds) as milliseconds.
+    """
+    samples = np.asarray(samples) * 1000.0
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return f"mean {samples.mean():7.3f} ms  p50 {p50:7.3f} ms  p95 {p95:7.3f} ms  p99 {p99:7.3f} ms"
+
+
+def fake_dac(args, num_devices=None):
+    return FakeHeliosDAC(num_devices=num_devices or args.devices,
+                         status_latency=args.status_latency,
+                         write_latency=args.write_latency,
+                         transfer_latency=args.transfer_latency)
+
+
+def bench_writer(args):
+    """
+    Compare the guidance loop latency when the DAC is written inline (as the
+    original detectnet_* scripts do) against posting to the LaserWriter thread.
+    """
+    points = [(2048, 2048)] * args.points
+    coords = np.array(points, dtype=np.uint16)
+
+    # inline:  Capture/Detect, then wait on and write each DAC in the same loop
+    dac = fake_dac(args)
+    num_devices = dac.OpenDevices()
+    inline = []
+
+    for _ in range(args.frames):
+        time_begin = time.perf_counter()
+        time.sleep(args.detect_time)
+        frame = make_frame(points)
+        for device in range(num_devices):
+            wait_ready(dac, device)
+            dac.WriteFrame(device, DEFAULT_PPS, DEFAULT_FLAGS, frame, len(frame))
+        inline.append(time.perf_counter() - time_begin)
+
+    # threaded:  Capture/Detect, then post the target to the writer thread
+    dac = fake_dac(args)
+    writer = LaserWriter(dac)
+    writer.start()
+    threaded = []
+
+    for _ in range(args.frames):
+        time_begin = time.perf_counter()
+        time.sleep(args.detect_time)
+        writer.submit(writer.acquire().set(coords))
+        threaded.append(time.perf_counter() - time_begin)
+
+    writer.stop()
+
+    print(f"inline   loop:  {percentiles(inline)}  ({args.frames / sum(inline):.1f} FPS)")
+    print(f"threaded loop:  {percentiles(threaded)}  ({args.frames / sum(threaded):.1f} FPS)")
+    print(f"writer: {writer.frames_written} frames written, {writer.frames_dropped} dropped, "
+          f"{writer.not_ready} missed the ready deadline")
+
+
+def bench_mapping(args):
+    """
+    Compare mapping detection corners one at a time with scalar numpy calls
+    (like calculate_laser_coords() did) against one batched LaserMapping pass.
+    """
+    def calculate_laser_coords(x, y, camera_width=800, camera_height=600, laser_max=4095, exp_x=0.93, exp_y=0.5):
+        scaled_x = laser_max * np.power(x / camera_width, exp_x) + 100
+        scaled_y = laser_max * np.power(y / camera_height, exp_y) - 400
+        return int(np.clip(scaled_x, 0, laser_max)), laser_max - int(np.clip(scaled_y, 0, laser_max))
+
+    mapping = LaserMapping()
+    corners = np.random.default_rng(0).uniform((0, 0), (800, 600), size=(args.points, 2))
+    frame = (HeliosPoint * args.points)()
+
+    scalar = []
+    batched = []
+
+    for _ in range(args.frames):
+        time_begin = time.perf_counter()
+        for n, (x, y) in enumerate(corners):
+            frame[n] = HeliosPoint(*calculate_laser_coords(x, y), 50, 0, 0, 63)
+        scalar.append(time.perf_counter() - time_begin)
+
+        time_begin = time.perf_counter()
+        mapping.fill(frame, corners)
+        batched.append(time.perf_counter() - time_begin)
+
+    print(f"{args.points} points per frame")
+    print(f"scalar  mapping:  {percentiles(scalar)}")
+    print(f"batched mapping:  {percentiles(batched)}")
+
+
+def bench_calibration(args):
+    """
+    Fit a calibration to synthetic point pairs, and compare evaluating the model
+    directly against gathering from the baked lookup table.
+    """
+    width, height = 1280, 720
+    grid = np.stack(np.meshgrid(np.linspace(0, width - 1, 7), np.linspace(0, height - 1, 5)), axis=-1).reshape(-1, 2)
+    laser = np.stack([grid[:,0] * 3.2, 4095 - grid[:,1] * 5.7], axis=1)
+    laser += np.random.default_rng(0).normal(scale=4.0, size=laser.shape)
+
+    time_begin = time.perf_counter()
+    calibration = Calibration.fit(grid, laser, width, height, degree=3)
+    time_fit = time.perf_counter() - time_begin
+
+    time_begin = time.perf_counter()
+    lut = LUTMapping(calibration)
+    time_lut = time.perf_counter() - time_begin
+
+    points = np.random.default_rng(1).uniform((0, 0), (width, height), size=(args.points, 2))
+    analytic = []
+    lookup = []
+
+    for _ in range(args.frames):
+        time_begin = time.perf_counter()
+        calibration.project(points)
+        analytic.append(time.perf_counter() - time_begin)
+
+        time_begin = time.perf_counter()
+        lut(points)
+        lookup.append(time.perf_counter() - time_begin)
+
+    print(f"fit {len(grid)} pairs in {time_fit * 1000:.1f} ms, residual rms {calibration.residuals['rms']:.2f} "
+          f"max {calibration.residuals['max']:.2f} (DAC units)")
+    print(f"built {width}x{height} LUT in {time_lut * 1000:.1f} ms")
+    print(f"analytic model:  {percentiles(analytic)}")
+    print(f"LUT gather:      {percentiles(lookup)}")
+
+
+def bench_buffers(args):
+    """
+    Compare building a new ctypes frame for every send (like the scripts did)
+    against filling a preallocated FramePool buffer in place - both the time
+    per frame, and the memory allocated per frame (measured with tracemalloc).
+    """
+    coords = np.random.default_rng(0).integers(0, 4096, size=(args.points, 2), dtype=np.uint16)
+    pool = FramePool(args.points)
+
+    def per_frame_ctypes():
+        frame = (HeliosPoint * len(coords))(*[HeliosPoint(x, y, 50, 0, 0, 63) for x, y in coords.tolist()])
+        return frame
+
+    def per_frame_pool():
+        buffer = pool.acquire().set(coords)
+        buffer.release()
+        return buffer
+
+    for name, func in (('new ctypes frame', per_frame_ctypes), ('FramePool buffer', per_frame_pool)):
+        timings = []
+
+        for _ in range(args.frames):
+            time_begin = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - time_begin)
+
+        tracemalloc.start()
+        peak = 0
+
+        for _ in range(args.frames):
+            tracemalloc.reset_peak()
+            current = tracemalloc.get_traced_memory()[0]
+            func()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+
+        tracemalloc.stop()
+
+        print(f"{name}:  {percentiles(timings)}  peak {peak} bytes allocated per frame")
+
+    print(f"{args.points} points per frame, pool grew by {pool.allocations} buffers")
+
+
+def bench_colors(args):
+    """
+    Compare coloring detections with the per-detection if/elif confidence chain from
+    detectnet_balloon.py against the ColorLUT gather, both filling a point buffer.
+    """
+    confidence = np.random.default_rng(0).uniform(0.5, 1.0, size=args.points)
+    coords = np.random.default_rng(1).integers(0, 4096, size=(args.points, 2), dtype=np.uint16)
+    buffer = FramePool(args.points, buffers=1).acquire()
+    lut = ColorLUT.steps()
+
+    def if_chain():
+        r = g = b = 0
+        for n, det_conf in enumerate(confidence):
+            if det_conf < 0.7:
+                r, g, b = 10, 0, 0
+            elif 0.7 < det_conf < 0.8:
+                r, g, b = 0, 0, 10
+            elif 0.8 < det_conf < 0.9:
+                r, g, b = 0, 10, 0
+            buffer.view[n] = (coords[n, 0], coords[n, 1], r, g, b, 10)
+
+    def lookup():
+        buffer.set(coords, lut(confidence))
+
+    for name, func in (('if/elif chain', if_chain), ('ColorLUT', lookup)):
+        timings = []
+
+        for _ in range(args.frames):
+            time_begin = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - time_begin)
+
+        print(f"{name:<14} {percentiles(timings)}")
+
+    print(f"{args.points} detections per frame")
+
+
+def bench_planner(args):
+    """
+    Measure the time to plan a combined multi-target frame, and the galvo travel
+    of the planned tour compared to visiting the targets in detection order.
+    """
+    rng = np.random.default_rng(0)
+    planner = ScanPlanner()
+    buffer = FramePool(buffers=1).acquire()
+
+    timings = []
+    unordered = 0.0
+    planned = 0.0
+
+    for _ in range(args.frames):
+        targets = rng.uniform(0, 4095, size=(args.points, 2))
+
+        time_begin = time.perf_counter()
+        order = planner.plan(targets, buffer)
+        timings.append(time.perf_counter() - time_begin)
+
+        unordered += tour_length(targets, np.arange(len(targets)))
+        planned += tour_length(targets, order)
+
+    print(f"{args.points} targets per frame, {buffer.count} points in the last frame")
+    print(f"plan time:  {percentiles(timings)}")
+    print(f"galvo travel per frame:  detection order {unordered / args.frames:.0f}  planned {planned / args.frames:.0f}  (DAC units)")
+
+
+def bench_outline(args):
+    """
+    Compare tracing the boxes with their 5 corner points (detectnet_frame.py) against the
+    OutlineRasterizer:  rasterization time, points per frame (and the refresh rate that gives
+    at the output rate), and the spacing between consecutive lit points along the edges.
+    """
+    rng = np.random.default_rng(0)
+    mapping = create_mapping('exponential-raw', 800, 600)
+    rasterizer = OutlineRasterizer(pps=args.pps)
+    buffer = FramePool(buffers=1).acquire()
+
+    def corners(boxes):
+        buffer.set(mapping(box_corners(boxes, order=('tl', 'tr', 'br', 'bl', 'tl')).reshape(-1, 2)))
+
+    def outline(boxes):
+        rasterizer.draw(boxes, mapping, buffer)
+
+    for name, func in (('5 corners', corners), ('OutlineRasterizer', outline)):
+        timings = []
+        points = []
+        spacing = []
+
+        for _ in range(args.frames):
+            origin = rng.uniform((0, 0), (600, 450), size=(args.boxes, 2))
+            boxes = np.concatenate([origin, origin + rng.uniform(50, 200, size=(args.boxes, 2))], axis=1)
+
+            time_begin = time.perf_counter()
+            func(boxes)
+            timings.append(time.perf_counter() - time_begin)
+
+            view = buffer.view[:buffer.count]
+            lit = (view['i'][1:] > 0) & (view['i'][:-1] > 0)
+            xy = np.stack([view['x'], view['y']], axis=1).astype(np.float64)
+            steps = np.linalg.norm(np.diff(xy, axis=0), axis=1)[lit]
+
+            points.append(buffer.count)
+            spacing.extend(steps[steps > 0])
+
+        print(f"{name:<18} {percentiles(timings)}")
+        print(f"{'':<18} {np.mean(points):.0f} points per frame ({args.pps / np.mean(points):.0f} Hz at {args.pps} pps), "
+              f"lit point spacing p50 {np.median(spacing):.0f}  max {np.max(spacing):.0f} (DAC units)")
+
+    print(f"{args.boxes} boxes per frame, {rasterizer.reduced} frames reduced to fit {rasterizer.budget} points")
+
+
+def bench_mask(args):
+    """
+    Measure the per-frame cost of blanking the points inside audience-safety zones with an
+    ExclusionMask bitmap, against testing every point against the zone polygons in Python.
+    """
+    mapping = create_mapping('exponential', 1280, 720)
+    camera_zone = [(0, 540), (1280, 540), (1280, 720), (0, 720)]        # the bottom quarter of the image
+    laser_zone = [(1500, 1500), (2500, 1300), (2700, 2600), (1400, 2400)]
+
+    time_begin = time.perf_counter()
+    mask = ExclusionMask(shift=args.shift)
+    mask.add_camera_polygon(camera_zone, mapping, margin=args.margin)
+    mask.add_polygon(laser_zone, margin=args.margin)
+    print(f"rasterized the zones into a {mask.size}x{mask.size} mask in {(time.perf_counter() - time_begin) * 1000:.1f} ms")
+
+    polygons = [np.asarray(mapping(np.asarray(camera_zone, dtype=np.float64)), dtype=np.float64),
+                np.asarray(laser_zone, dtype=np.float64)]
+
+    def inside(x, y, polygon):
+        result = False
+        for (x0, y0), (x1, y1) in zip(polygon, np.roll(polygon, -1, axis=0)):
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                result = not result
+        return result
+
+    def per_point(view):
+        blanked = 0
+        for point in view:
+            if point['i'] > 0 and any(inside(point['x'], point['y'], polygon) for polygon in polygons):
+                point['r'] = point['g'] = point['b'] = point['i'] = 0
+                blanked += 1
+        return blanked
+
+    rng = np.random.default_rng(0)
+    buffer = FramePool(args.points, buffers=1).acquire()
+
+    for name, func in (('per-point polygons', per_point), ('ExclusionMask', mask.apply)):
+        timings = []
+        blanked = 0
+
+        for _ in range(args.frames):
+            buffer.set(rng.integers(0, 4096, size=(args.points, 2)))
+
+            time_begin = time.perf_counter()
+            blanked += func(buffer.view[:buffer.count])
+            timings.append(time.perf_counter() - time_begin)
+
+        print(f"{name:<19} {percentiles(timings)}  {blanked / (args.frames * args.points):.1%} of the points blanked")
+
+    print(f"{args.points} points per frame (the mask also blanks a {args.margin:.0f} DAC unit margin around the zones)")
+
+    # the per-frame check of whether the camera space zone moved with the mapping (on the
+    # camera thread), and rasterizing it again when it has (in the background)
+    grid = CorrectionGrid(1280, 720)
+    corrected = FeedbackMapping(mapping, grid)
+    checks, rebuilds = [], []
+
+    for frame in range(args.frames):
+        grid.offsets[:] = (0.0, 2 * mask.tolerance * (frame % 2))
+
+        time_begin = time.perf_counter()
+        started = mask.follow(corrected)
+        checks.append(time.perf_counter() - time_begin)
+
+        if started:
+            mask.wait()
+            rebuilds.append(time.perf_counter() - time_begin)
+
+    print(f"follow() per frame  {percentiles(checks)}")
+    print(f"background rebuild  {percentiles(rebuilds)}  (the zones moved {mask.rebuilds} times)")
+
+
+def bench_readiness(args):
+    """
+    Compare waiting for the DAC with the 512-iteration GetStatus() spin from the
+    scripts against the ReadinessScheduler, writing frames back-to-back so that
+    every write has to wait for the device:  wall time and CPU time per wait,
+    and the number of GetStatus() calls.
+    """
+    points = (HeliosPoint * args.points)()
+    pps = args.pps
+
+    def spin(dac, device):
+        return wait_ready(dac, device, 512)
+
+    for name in ('512-poll spin', 'ReadinessScheduler'):
+        dac = fake_dac(args)
+        num_devices = dac.OpenDevices()
+        scheduler = ReadinessScheduler(dac, deadline=args.deadline)
+
+        wall = []
+        cpu = []
+        written = 0
+        dropped = 0
+
+        for _ in range(args.frames):
+            for device in range(num_devices):
+                time_begin = time.perf_counter()
+                cpu_begin = time.thread_time()
+
+                if name == 'ReadinessScheduler':
+                    ready = scheduler.wait(device)
+                else:
+                    ready = spin(dac, device)
+
+                wall.append(time.perf_counter() - time_begin)
+                cpu.append(time.thread_time() - cpu_begin)
+
+                if not ready and name == 'ReadinessScheduler':
+                    dropped += 1
+                    continue
+
+                dac.WriteFrame(device, pps, DEFAULT_FLAGS, points, args.points)
+                scheduler.wrote(device, args.points, pps)
+                written += 1
+
+        print(f"{name}:")
+        print(f"    wait wall time:  {percentiles(wall)}")
+        print(f"    wait CPU time:   {percentiles(cpu)}")
+        print(f"    {dac.total_status_calls / len(wall):.1f} GetStatus() calls per wait, "
+              f"{written} frames written, {dropped} dropped")
+
+    overhead = scheduler.stats()[0]['overhead']
+    print(f"learned overhead {overhead * 1000:.2f} ms (simulated transfer latency {args.transfer_latency * 1000:.2f} ms)")
+
+
+def bench_fanout(args):
+    """
+    Compare the time from submitting a frame until every DAC has been written, between
+    writing the devices one after another (like the scripts did) and broadcasting the
+    frame to the LaserWriter's per-device workers, for 1 to --devices DACs.  Both paths
+    simulate Capture+Detect before each frame and time the same span, from the submit
+    until the last device was written (the parallel one through the writer's profiler).
+    """
+    coords = np.full((args.points, 2), 2048, dtype=np.uint16)
+
+    for num_devices in range(1, args.devices + 1):
+        # serial:  wait on and write each device in turn
+        dac = fake_dac(args, num_devices)
+        scheduler = ReadinessScheduler(dac)
+        buffer = FramePool(args.points, buffers=1).acquire().set(coords)
+        serial = []
+        written = 0
+        time_start = time.perf_counter()
+
+        for _ in range(args.frames):
+            time.sleep(args.detect_time)
+            time_begin = time.perf_counter()
+            for device in range(num_devices):
+                if scheduler.wait(device):
+                    dac.WriteFrame(device, DEFAULT_PPS, DEFAULT_FLAGS, buffer.points, buffer.count)
+                    scheduler.wrote(device, buffer.count, DEFAULT_PPS)
+                    written += 1
+            serial.append(time.perf_counter() - time_begin)
+
+        serial_fps = args.frames / (time.perf_counter() - time_start)
+
+        # parallel:  broadcast to one worker thread per device
+        profiler = SpanRecorder(capacity=args.frames)
+        writer = LaserWriter(fake_dac(args, num_devices), profiler=profiler)
+        writer.start()
+        time_start = time.perf_counter()
+
+        for _ in range(args.frames):
+            time.sleep(args.detect_time)
+            frame = writer.acquire().set(coords)
+            frame.timestamp = time.perf_counter()
+            writer.submit(frame)
+
+        parallel_fps = args.frames / (time.perf_counter() - time_start)
+        writer.stop()
+
+        histogram = profiler.stage('capture->write')
+        parallel = histogram.samples[:min(histogram.count, args.frames)] / 1e9
+
+        print(f"{num_devices} DAC(s)  serial:    {percentiles(serial)}  ({serial_fps:.0f} FPS, "
+              f"{written} of {args.frames * num_devices} device writes)")
+        print(f"{num_devices} DAC(s)  parallel:  {percentiles(parallel)}  ({parallel_fps:.0f} FPS, "
+              f"{writer.frames_written} frames written, {writer.frames_dropped} dropped)")
+
+
+def bench_roi(args):
+    """
+    Compare detecting every frame in full against detecting in crops around the tracked
+    targets (with a full frame every --interval frames), using a fake detector whose cost
+    is a fixed time per call plus a time per pixel.  Also prints the expected FPS gain for
+    a range of crop areas under the same cost model.
+    """
+    scene = SyntheticScene(num_targets=args.points, speed=args.speed, size=48)
+    width, height = (int(v) for v in scene.extent)
+    recall = {}
+
+    for name in ('full frame', 'ROI'):
+        detector = FakeDetector(args.fixed_cost, args.pixel_cost)
+        tracker = TargetTracker()
+        roi = ROIDetector(detector, tracker, full_frame_interval=args.interval, padding=args.padding)
+        timings = []
+        found = 0
+
+        for frame in range(args.frames):
+            capture_time = frame * args.detect_time
+            image = SyntheticImage(scene, capture_time)
+
+            time_begin = time.perf_counter()
+            detections = detector(image) if name == 'full frame' else roi(image, capture_time)
+            timings.append(time.perf_counter() - time_begin)
+
+            tracker.update(detection_boxes(detections), timestamp=capture_time)
+            found += min(len(detections), args.points)
+
+        recall[name] = found / (args.frames * args.points)
+        print(f"{name:<10}  detect:  {percentiles(timings)}  ({1 / np.mean(timings):.0f} FPS, "
+              f"recall {recall[name] * 100:.1f}%)")
+
+    print(f"ROI:  {roi.full_frames} of {roi.frames} frames were full-frame, {roi.crops} crops "
+          f"covering {roi.mean_crop_area * 100:.1f}% of the frame on average")
+
+    # expected speedup of the detection stage from the cost model, amortized over the full-frame interval
+    full = detector.cost(width * height)
+
+    print(f"expected detect FPS gain ({args.points} crop(s), full frame every {args.interval}):")
+
+    for area in (0.02, 0.05, 0.1, 0.25, 0.5):
+        crops = args.points * detector.fixed_cost + detector.pixel_cost * area * width * height
+        amortized = (full + (args.interval - 1) * crops) / args.interval
+        print(f"    crops covering {area * 100:4.0f}% of the frame:  {full / amortized:.2f}x")
+
+
+def bench_capture(args):
+    """
+    Compare capturing each frame inline before detecting it (as the detectnet_* scripts do)
+    against a CapturePrefetcher that captures the next frame while the current one is detected:
+    loop rate, time blocked in Capture(), and the age of each frame when its detection ends.
+    """
+    for name in ('inline Capture()', 'CapturePrefetcher'):
+        source = FakeVideoSource(fps=args.fps, latency=args.capture_latency, frames=args.frames)
+        detector = FakeDetector(fixed_cost=args.detect_time, pixel_cost=0.0)
+
+        if name == 'CapturePrefetcher':
+            input = CapturePrefetcher(source, copy=SyntheticImage.copy)
+        else:
+            input = source
+
+        waits = []
+        ages = []
+        frames = 0
+        time_begin = time.perf_counter()
+
+        while input.IsStreaming():
+            wait_begin = time.perf_counter()
+            img = input.Capture()
+            waits.append(time.perf_counter() - wait_begin)
+
+            if img is None:
+                continue
+
+            detector(img)
+            ages.append(time.perf_counter() - (source.start_time + img.t))
+            frames += 1
+
+        elapsed = time.perf_counter() - time_begin
+        dropped = input.dropped if name == 'CapturePrefetcher' else source.captured - frames
+
+        print(f"{name:<18} {frames / elapsed:5.1f} FPS  {dropped} camera frames dropped")
+        print(f"{'':<18} capture wait:  {percentiles(waits)}")
+        print(f"{'':<18} frame age:     {percentiles(ages)}")
+
+    print(f"{args.fps:.0f} FPS camera with {args.capture_latency * 1000:.1f} ms capture latency, "
+          f"{args.detect_time * 1000:.1f} ms detection")
+
+
+def bench_headless(args):
+    """
+    Measure the guidance loop throughput with the overlay, rendering and per-frame logging
+    of the detectnet_* scripts, against production mode with the SideChannel showing
+    every --display-interval frames, and with no display at all.
+    """
+    configs = (('display every frame', False, 1),
+               (f'production 1/{args.display_interval}', True, args.display_interval),
+               ('production headless', True, 0))
+
+    with open(os.devnull, 'w') as devnull:
+        def log(detections):
+            for detection in detections:
+                print(detection.Left, detection.Top, detection.Right, detection.Bottom, detection.Confidence, file=devnull)
+
+        def overlay(img, detections):
+            time.sleep(args.overlay_cost)
+
+        for name, production, interval in configs:
+            source = FakeVideoSource(fps=args.fps, latency=0.0, frames=args.frames)
+            input = CapturePrefetcher(source, copy=SyntheticImage.copy)
+            detector = FakeDetector(fixed_cost=args.detect_time, pixel_cost=0.0)
+            output = FakeVideoOutput(render_cost=args.render_cost)
+
+            writer = LaserWriter(fake_dac(args))
+            writer.start()
+
+            runner = GuidanceRunner(create_strategy('center'), create_mapping('exponential', 1280, 720), writer)
+            display = SideChannel(output, interval, overlay=overlay if production else None, status=lambda: "", log=log)
+
+            timings = []
+            time_begin = time.perf_counter()
+
+            while input.IsStreaming():
+                img = input.Capture()
+
+                if img is None:
+                    continue
+
+                loop_begin = time.perf_counter()
+                detections = detector(img)
+
+                if not production:
+                    overlay(img, detections)   # drawn by net.Detect(overlay=...) in the scripts
+
+                runner.process(detections, input.timestamp)
+                display(img, detections)
+                timings.append(time.perf_counter() - loop_begin)
+
+            elapsed = time.perf_counter() - time_begin
+            writer.stop()
+
+            print(f"{name:<22} {len(timings) / elapsed:6.1f} FPS  {output.rendered} rendered  {input.dropped} camera frames dropped")
+            print(f"{'':<22} loop: {percentiles(timings)}")
+
+    print(f"{args.fps:.0f} FPS camera, {args.detect_time * 1000:.1f} ms detection, {args.overlay_cost * 1000:.1f} ms overlay, "
+          f"{args.render_cost * 1000:.1f} ms render")
+
+
+def bench_tracker(args):
+    """
+    Track synthetic moving targets and compare the aim error at the time the laser
+    fires (capture time + latency) between aiming at the raw detection centers and
+    at the latency-compensated track predictions.
+    """
+    scene = SyntheticScene(num_targets=args.points, speed=args.speed)
+    tracker = TargetTracker()
+
+    frame_time = args.detect_time
+    raw_error = []
+    predicted_error = []
+    timings = []
+
+    for frame in range(args.frames):
+        capture_time = frame * frame_time
+        boxes, confidence = scene.detect(capture_time)
+        truth = scene.truth(capture_time + args.latency)
+
+        time_begin = time.perf_counter()
+        assigned = tracker.update(boxes, confidence, timestamp=capture_time)
+        ids, centers = tracker.predict(capture_time, latency=args.latency)
+        timings.append(time.perf_counter() - time_begin)
+
+        detected = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+        raw_error.append(np.linalg.norm(detected - truth, axis=1))
+
+        for track_id, center in zip(ids, centers):
+            target = np.flatnonzero(assigned == track_id)
+            if len(target):
+                predicted_error.append(np.linalg.norm(center - truth[target[0]]))
+
+    raw_error = np.concatenate(raw_error)
+    predicted_error = np.asarray(predicted_error)
+
+    print(f"{args.points} targets at {args.speed:.0f} px/s, {1 / frame_time:.0f} FPS, {args.latency * 1000:.0f} ms latency")
+    print(f"update+predict:  {percentiles(timings)}")
+    print(f"raw detection aim error:  mean {raw_error.mean():6.1f} px  p95 {np.percentile(raw_error, 95):6.1f} px")
+    print(f"predicted aim error:      mean {predicted_error.mean():6.1f} px  p95 {np.percentile(predicted_error, 95):6.1f} px")
+
+
+def bench_profiler(args):
+    """
+    Run a simulated guidance loop with every stage recorded by a SpanRecorder,
+    print the per-stage percentiles, and measure the overhead of a span.
+    """
+    profiler = SpanRecorder(trace=args.trace is not None)
+    mapping = LaserMapping()
+    planner = ScanPlanner()
+    centers = np.random.default_rng(0).uniform((0, 0), (800, 600), size=(args.points, 2))
+
+    dac = fake_dac(args)
+    writer = LaserWriter(dac, profiler=profiler)
+    writer.start()
+
+    for _ in range(args.frames):
+        with profiler.span('capture'):
+            time.sleep(args.detect_time * 0.25)
+
+        capture_time = time.perf_counter()
+
+        with profiler.span('detect'):
+            time.sleep(args.detect_time * 0.75)
+
+        with profiler.span('map'):
+            coords = mapping(centers)
+
+        with profiler.span('plan'):
+            frame = writer.acquire()
+            frame.timestamp = capture_time
+            planner.plan(coords, frame)
+
+        writer.submit(frame)
+
+    writer.stop()
+    profiler.report(force=True)
+
+    # cost of recording an empty span
+    overhead = SpanRecorder(trace=args.trace is not None)
+    time_begin = time.perf_counter()
+
+    for _ in range(10000):
+        with overhead.span('empty'):
+            pass
+
+    print(f"span overhead:  {(time.perf_counter() - time_begin) / 10000 * 1e6:.2f} us")
+
+    if args.trace:
+        profiler.dump_trace(args.trace)
+
+
+def bench_runner(args):
+    """
+    Run the unified GuidanceRunner in each targeting mode on synthetic detections,
+    and report the per-frame processing time and the points per laser frame.
+    """
+    scene = SyntheticScene(num_targets=args.points, width=800, height=600)
+
+    for mode in STRATEGIES:
+        dac = fake_dac(args)
+        writer = LaserWriter(dac)
+        writer.start()
+
+        runner = GuidanceRunner(create_strategy(mode), create_mapping('exponential'), writer)
+        timings = []
+        points = []
+
+        for frame in range(args.frames):
+            detections = scene.detections(frame * args.detect_time)
+
+            time_begin = time.perf_counter()
+            runner.process(detections)
+            timings.append(time.perf_counter() - time_begin)
+
+            time.sleep(args.detect_time)
+
+        writer.stop()
+
+        for device_frames in dac.frames:
+            points.extend(len(f) for f in device_frames)
+
+        print(f"{mode:<11} process:  {percentiles(timings)}  {writer.frames_written} frames written, "
+              f"{np.mean(points):.0f} points per frame")
+
+
+def bench_selection(args):
+    """
+    Run the GuidanceRunner on a crowded synthetic scene with every target aimed at, and with
+    the TargetSelector picking the best few (with and without the minimum dwell):  targets and
+    points per laser frame, how often the selected targets change, and the processing time.
+    """
+    configs = (('all targets', None),
+               (f'top {args.max_targets}, no dwell', TargetSelector(args.max_targets, min_dwell=0.0)),
+               (f'top {args.max_targets}, {args.min_dwell} s dwell', TargetSelector(args.max_targets, min_dwell=args.min_dwell)),
+               (f'{args.point_budget} point budget', TargetSelector(point_budget=args.point_budget, min_dwell=args.min_dwell)))
+
+    for name, selector in configs:
+        scene = SyntheticScene(num_targets=args.targets, width=1280, height=720, speed=150.0)
+        dac = fake_dac(args)
+        writer = LaserWriter(dac)
+        writer.start()
+
+        runner = GuidanceRunner(create_strategy('center'), create_mapping('exponential', 1280, 720), writer,
+                                tracker=TargetTracker(), predict=False, selector=selector)
+        timings = []
+        targets = []
+
+        for frame in range(args.frames):
+            capture_time = frame / 30.0
+
+            time_begin = time.perf_counter()
+            targets.append(len(runner.process(scene.detections(capture_time), capture_time, timestamp=time_begin)))
+            timings.append(time.perf_counter() - time_begin)
+
+            time.sleep(0.002)   # let the writer take the frame
+
+        writer.stop()
+        points = [len(f) for device_frames in dac.frames for f in device_frames]
+        switches = f"{selector.switches / (args.frames / 30.0):5.1f} target switches/s" if selector is not None else ""
+
+        print(f"{name:<20} {np.mean(targets):5.1f} targets  {np.mean(points):6.0f} points per frame  {switches}")
+        print(f"{'':<20} process:  {percentiles(timings)}")
+
+    print(f"{args.targets} moving targets")
+
+
+def bench_feedback(args):
+    """
+    Aim at moving targets through a projector that is out of alignment with its mapping, with
+    BeamFeedback finding the laser dots in the simulated camera frames and correcting the mapping:
+    how far the beam lands from the targets as the correction is learned, and the time to find
+    the dots in windows around the targets against searching the whole frame.  The camera sees
+    the laser frame written --latency seconds after the capture it was aimed from, and the dots
+    are matched with the aim points of that frame, or (as if there were no latency) with the
+    ones aimed from the previous capture.
+    """
+    mapping = LinearMapping(scale=(3.2, -5.6), offset=(0, 4095))
+    period = 1 / 30.0
+
+    targets = SyntheticScene(num_targets=args.targets, width=1280, height=720, speed=150.0).truth(0.0)
+    projector = FakeProjector(mapping, 1280, 720, shift=args.shift, rotation=args.rotation)
+    error = np.linalg.norm(projector.camera_points(mapping(targets)) - targets, axis=1).mean()
+    print(f"without feedback     beam {error:5.1f} pixels from the targets")
+
+    for name, latency in (('previous frame', 0.0), ('write time', args.latency)):
+        projector = FakeProjector(mapping, 1280, 720, shift=args.shift, rotation=args.rotation)
+        scene = SyntheticScene(num_targets=args.targets, width=1280, height=720, speed=150.0)
+        feedback = BeamFeedback(mapping, 1280, 720, window=args.window, gain=args.gain)
+
+        written = collections.deque()   # (write time, DAC coordinates) of the laser frames
+        errors = []
+        timings = []
+        report = max(args.frames // 5, 1)
+
+        print(f"{name}:")
+
+        for frame in range(args.frames):
+            capture_time = frame * period
+            targets = scene.truth(capture_time)
+
+            # the camera sees the last laser frame written before the capture
+            while len(written) > 1 and written[1][0] <= capture_time:
+                written.popleft()
+
+            lit = written[0][1] if written and written[0][0] <= capture_time else np.zeros((0, 2))
+            image = projector.render(lit)
+
+            # the true miss of the beam, before this frame's correction
+            errors.append(np.linalg.norm(projector.camera_points(feedback.mapping(targets)) - targets, axis=1).mean())
+
+            time_begin = time.perf_counter()
+            feedback.observe(image, capture_time)
+            timings.append(time.perf_counter() - time_begin)
+
+            # aim at this frame's targets, which reach the DAC after the latency
+            written.append((capture_time + args.latency, feedback.mapping(targets)))
+            feedback.aimed(targets, capture_time + latency)
+
+            if (frame + 1) % report == 0:
+                print(f"frames {frame + 2 - report:4d}-{frame + 1:<4d}   beam {np.mean(errors[-report:]):5.1f} pixels from the targets")
+
+        print(f"found {feedback.observations} dots, missed {feedback.misses}")
+
+    full_frame = []
+
+    for _ in range(20):
+        time_begin = time.perf_counter()
+        find_dot(image, (640, 360), window=1280)
+        full_frame.append(time.perf_counter() - time_begin)
+
+    print(f"windowed search     {percentiles(timings)}  ({args.targets} dots in {2 * args.window + 1} pixel windows)")
+    print(f"full-frame search   {percentiles(full_frame)}  (one search of the 1280x720 frame)")
+
+
+def bench_governor(args):
+    """
+    Aim at a moving target detected at the camera rate, writing a laser frame per camera frame
+    against a FrameGovernor refreshing the DAC at a fixed rate:  laser frames per second, how far
+    the beam jumps between consecutive frames, and what the laser does when the detections stop.
+    """
+    for name, rate in (('per camera frame', 0), (f'governor {args.rate:.0f} Hz', args.rate)):
+        scene = SyntheticScene(num_targets=1, width=1280, height=720, speed=args.speed)
+        dac = fake_dac(args)
+        writes = []
+
+        def write_frame(device, pps, flags, points, num_points, write_frame=dac.WriteFrame):
+            point = frame_points(points, 1)[0]
+            writes.append((time.perf_counter(), point.x, point.y, point.i))
+            return write_frame(device, pps, flags, points, num_points)
+
+        dac.WriteFrame = write_frame
+        writer = LaserWriter(dac)
+        writer.start()
+
+        mapping = create_mapping('exponential', 1280, 720)
+        strategy = create_strategy('center')
+        governor = FrameGovernor(writer, strategy, mapping, rate=rate, timeout=args.timeout) if rate > 0 else None
+
+        if governor is not None:
+            governor.start()
+
+        runner = GuidanceRunner(strategy, mapping, writer, tracker=TargetTracker(), predict=False, governor=governor)
+        time_begin = time.perf_counter()
+
+        for frame in range(args.frames):
+            capture_time = frame / args.fps
+            time.sleep(max(time_begin + capture_time - time.perf_counter(), 0))
+            runner.process(scene.detections(capture_time), capture_time)
+
+        # the camera stops delivering detections
+        time_end = time.perf_counter()
+        time.sleep(args.timeout * 2)
+
+        if governor is not None:
+            governor.stop()
+
+        writer.stop()
+
+        tracking = np.array([w for w in writes if w[0] < time_end])
+        steps = np.linalg.norm(np.diff(tracking[:, 1:3], axis=0), axis=1)
+        blanked = [w[0] - time_end for w in writes if w[0] >= time_end and w[3] == 0]
+        after = f"blanked {blanked[0]:.2f} s after the last detection" if blanked else "beam frozen on the last target"
+
+        print(f"{name:<18} {len(tracking) / (time_end - time_begin):5.1f} laser frames/s  "
+              f"beam steps mean {steps.mean():5.1f}  p95 {np.percentile(steps, 95):5.1f}  max {steps.max():5.1f} DAC units  {after}")
+
+    print(f"target moving at {args.speed:.0f} pixels/s, detected at {args.fps:.0f} FPS")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the laser guidance pipeline against a simulated Helios DAC.")
+
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    def add_benchmark(name, func, help, **defaults):
+        """
+        Add a benchmark with the options shared by all of them (the keyword arguments override
+        their defaults - the parsers don't share these options, so that's local to the benchmark).
+        """
+        subparser = subparsers.add_parser(name, help=help, formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+        def option(flag, dest, **kwargs):
+            kwargs['default'] = defaults.get(dest, kwargs['default'])
+            subparser.add_argument(flag, dest=dest, **kwargs)
+
+        option("--frames", "frames", type=int, default=200, help="number of loop iterations to run")
+        option("--devices", "devices", type=int, default=1, help="number of simulated DACs")
+        option("--points", "points", type=int, default=1, help="number of points per frame")
+        option("--detect-time", "detect_time", type=float, default=0.015, help="simulated Capture+Detect time (seconds)")
+        option("--status-latency", "status_latency", type=float, default=0.0001, help="simulated GetStatus() round-trip (seconds)")
+        option("--write-latency", "write_latency", type=float, default=0.0, help="simulated WriteFrame() USB transfer time (seconds)")
+        option("--transfer-latency", "transfer_latency", type=float, default=0.02, help="time the DAC stays busy after a write (seconds)")
+
+        subparser.set_defaults(func=func)
+        return subparser
+
+    add_benchmark("writer", bench_writer, help="inline DAC writes vs. the LaserWriter thread")
+    add_benchmark("mapping", bench_mapping, help="per-point vs. batched camera->laser mapping", points=50)
+    add_benchmark("calibration", bench_calibration, help="calibration model vs. lookup table")
+    add_benchmark("buffers", bench_buffers, help="per-frame ctypes allocation vs. a preallocated FramePool", points=200)
+    add_benchmark("colors", bench_colors, help="if/elif confidence coloring vs. a ColorLUT", points=50)
+    add_benchmark("planner", bench_planner, help="multi-target scan path planning", points=8)
+
+    outline = add_benchmark("outline", bench_outline, help="5-point box outlines vs. the OutlineRasterizer")
+    outline.add_argument("--boxes", type=int, default=3, help="number of boxes per frame")
+    outline.add_argument("--pps", type=int, default=DEFAULT_PPS, help="output rate in points per second")
+
+    mask = add_benchmark("mask", bench_mask, help="per-point polygon tests vs. the ExclusionMask bitmap",
+                         points=2000, frames=50)
+    mask.add_argument("--shift", type=int, default=0, help="mask cells are 2**shift DAC units wide")
+    mask.add_argument("--margin", type=float, default=32, help="safety margin around the zones (DAC units)")
+
+    readiness = add_benchmark("readiness", bench_readiness, help="busy-spin vs. adaptive DAC readiness polling")
+    readiness.add_argument("--pps", type=int, default=DEFAULT_PPS, help="output rate in points per second")
+    readiness.add_argument("--deadline", type=float, default=0.05, help="seconds to poll past the expected ready time")
+
+    add_benchmark("fanout", bench_fanout, help="serial vs. per-device parallel writes to several DACs",
+                  devices=4, write_latency=0.003, transfer_latency=0.0)
+
+    roi = add_benchmark("roi", bench_roi, help="full-frame vs. region-of-interest detection with a fake detector")
+    roi.add_argument("--interval", type=int, default=10, help="full-frame detection every N frames")
+    roi.add_argument("--padding", type=float, default=0.5, help="crop padding relative to the track size")
+    roi.add_argument("--speed", type=float, default=200.0, help="target speed (pixels per second)")
+    roi.add_argument("--fixed-cost", type=float, default=0.004, help="simulated seconds per detector call")
+    roi.add_argument("--pixel-cost", type=float, default=10e-9, help="simulated seconds per detected pixel")
+
+    capture = add_benchmark("capture", bench_capture, help="inline vs. prefetched camera capture with a fake video source")
+    capture.add_argument("--fps", type=float, default=60.0, help="frame rate of the fake camera")
+    capture.add_argument("--capture-latency", type=float, default=0.01, help="seconds for the fake camera to deliver a frame")
+
+    headless = add_benchmark("headless", bench_headless, help="loop throughput with and without the display side channel")
+    headless.add_argument("--fps", type=float, default=240.0, help="frame rate of the fake camera")
+    headless.add_argument("--display-interval", type=int, default=30, help="show every Nth frame in production mode")
+    headless.add_argument("--overlay-cost", type=float, default=0.001, help="simulated seconds to draw the detection overlay")
+    headless.add_argument("--render-cost", type=float, default=0.004, help="simulated seconds per Render()")
+
+    tracker = add_benchmark("tracker", bench_tracker, help="latency-compensated tracking of synthetic targets")
+    tracker.add_argument("--speed", type=float, default=300.0, help="target speed (pixels per second)")
+    tracker.add_argument("--latency", type=float, default=0.06, help="capture to DAC write latency (seconds)")
+
+    selection = add_benchmark("selection", bench_selection, help="aiming at every target vs. the TargetSelector",
+                              frames=300, transfer_latency=0.001)
+    selection.add_argument("--targets", type=int, default=20, help="number of moving targets in the scene")
+    selection.add_argument("--max-targets", type=int, default=3, help="targets picked per frame")
+    selection.add_argument("--point-budget", type=int, default=200, help="point budget of the budgeted selector")
+    selection.add_argument("--min-dwell", type=float, default=0.5, help="seconds a selected target is held")
+
+    feedback = add_benchmark("feedback", bench_feedback, help="closed-loop beam correction through a misaligned projector",
+                             frames=300)
+    feedback.add_argument("--targets", type=int, default=3, help="number of moving targets in the scene")
+    feedback.add_argument("--window", type=int, default=48, help="half size of the dot search window (pixels)")
+    feedback.add_argument("--gain", type=float, default=0.2, help="fraction of each miss that is corrected")
+    feedback.add_argument("--shift", type=float, nargs=2, default=(24.0, -16.0), help="projector misalignment (pixels)")
+    feedback.add_argument("--rotation", type=float, default=1.0, help="projector misalignment (degrees)")
+    feedback.add_argument("--latency", type=float, default=0.06, help="capture to DAC write latency (seconds)")
+
+    governor = add_benchmark("governor", bench_governor, help="laser frames per camera frame vs. a fixed-rate FrameGovernor",
+                             frames=60, transfer_latency=0.002)
+    governor.add_argument("--fps", type=float, default=15.0, help="detection rate (frames per second)")
+    governor.add_argument("--rate", type=float, default=60.0, help="governor refresh rate (Hz)")
+    governor.add_argument("--timeout", type=float, default=0.5, help="seconds without targets before the governor blanks")
+    governor.add_argument("--speed", type=float, default=300.0, help="target speed (pixels per second)")
+
+    add_benchmark("runner", bench_runner, help="the guidance runner in each targeting mode")
+
+    profiler = add_benchmark("profiler", bench_profiler, help="per-stage latency of a simulated guidance loop")
+    profiler.add_argument("--trace", type=str, default=None, help="write the spans to this Chrome trace JSON file")
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
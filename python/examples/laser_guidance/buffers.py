@@ -0,0 +1,112 @@
+#
+# Preallocated Helios point buffers.
+#
+# Building a frame the usual ctypes way - (HeliosPoint * n)(*[HeliosPoint(...)])
+# - creates a new array type, a list, and a structure per point on every send.
+# A FramePool instead allocates a few fixed-capacity ctypes arrays up front,
+# each paired with a numpy structured view of the same memory, so frames are
+# filled in place with vectorized writes and handed to WriteFrame() as-is.
+#
+# Buffers circulate between the thread filling them and the LaserWriter:
+# acquire() takes a free buffer, and it goes back to the pool once it has
+# been written to the DAC (or was replaced in the mailbox before that).
+#
+import collections
+
+from .helios import (HeliosPoint, HELIOS_MAX_POINTS, DEFAULT_COLOR,
+                     point_view, write_points)
+
+
+class FrameBuffer:
+    """
+    A fixed-capacity HeliosPoint array, its numpy view, and the number of valid points.
+    The timestamp can be set to the capture time of the camera frame the points came
+    from, so that the LaserWriter can measure the end-to-end latency.
+    """
+    __slots__ = ('points', 'view', 'count', 'timestamp', 'pool')
+
+    def __init__(self, capacity, pool=None):
+        self.points = (HeliosPoint * capacity)()
+        self.view = point_view(self.points)
+        self.count = 0
+        self.timestamp = None
+        self.pool = pool
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return len(self.view)
+
+    def fill(self, mapping, points, color=DEFAULT_COLOR):
+        """
+        Map camera pixel coordinates into the buffer (replacing its contents).
+        """
+        self.count = mapping.fill(self.view, points, color)
+        return self
+
+    def set(self, coords, color=DEFAULT_COLOR):
+        """
+        Copy an (N,2) array of laser coordinates into the buffer (replacing its contents).
+        """
+        self.count = write_points(self.view, coords, color)
+        return self
+
+    def append(self, coords, color=DEFAULT_COLOR):
+        """
+        Add an (N,2) array of laser coordinates after the existing points.
+        """
+        self.count = write_points(self.view, coords, color, self.count)
+        return self
+
+    def clear(self):
+        self.count = 0
+        return self
+
+    def release(self):
+        """
+        Return the buffer to the pool it came from.
+        """
+        if self.pool is not None:
+            self.pool.release(self)
+
+
+class FramePool:
+    """
+    Ring of preallocated FrameBuffers.  With a single producer and the LaserWriter
+    as the consumer, three buffers are enough:  one being filled, one waiting in
+    the mailbox, and one being written to the DAC.  If the pool ever runs dry,
+    acquire() allocates another buffer and counts it in FramePool.allocations.
+    """
+    def __init__(self, capacity=HELIOS_MAX_POINTS, buffers=3):
+        """
+        Parameters:
+            capacity (int) -- maximum number of points per frame
+            buffers (int) -- number of buffers to preallocate
+        """
+        self.capacity = capacity
+        self.free = collections.deque(FrameBuffer(capacity, self) for _ in range(buffers))
+        self.size = buffers
+        self.allocations = 0
+
+    def acquire(self):
+        """
+        Take a free (and cleared) buffer from the pool.
+        """
+        try:
+            buffer = self.free.popleft()
+        except IndexError:
+            buffer = FrameBuffer(self.capacity, self)
+            self.size += 1
+            self.allocations += 1
+
+        buffer.count = 0
+        buffer.timestamp = None
+        return buffer
+
+    def release(self, buffer):
+        """
+        Return a buffer to the pool.  This is safe to call from any thread.
+        """
+        self.free.append(buffer)
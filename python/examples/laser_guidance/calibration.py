@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+#
+# Camera -> laser calibration.
+#
+# Instead of hand-tuned scale factors and exponents, a calibration is fit
+# from recorded pairs of (camera pixel, laser DAC coordinate) - e.g. by
+# pointing the beam at known DAC coordinates and noting where the dot lands
+# in the camera image.  The model is a homography (for the projector/camera
+# perspective) plus a low-order 2D polynomial correction of the residuals
+# (for galvo pincushion and lens distortion).
+#
+# At runtime the model is baked into a dense lookup table over the camera
+# resolution, so mapping a detection is a single array gather.  LUTMapping
+# watches the calibration file and rebuilds the table when it changes - in a
+# background thread, because baking the table takes a good fraction of a
+# second at 1280x720, which would stall the guidance loop that polls it.
+#
+#   $ python3 -m laser_guidance.calibration pairs.csv --output calibration.json
+#
+# where pairs.csv has one "camera_x, camera_y, laser_x, laser_y" row per point.
+#
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+
+from .helios import HELIOS_MAX_COORD
+from .mapping import Mapping
+
+
+def normalize_points(points):
+    """
+    Return the similarity transform that moves the centroid of the points to the
+    origin and scales their mean distance to sqrt(2) (for conditioning the DLT).
+    """
+    centroid = points.mean(axis=0)
+    distance = np.sqrt(((points - centroid) ** 2).sum(axis=1)).mean()
+    scale = np.sqrt(2) / max(distance, 1e-12)
+
+    return np.array([[scale, 0, -scale * centroid[0]],
+                     [0, scale, -scale * centroid[1]],
+                     [0, 0, 1]])
+
+
+def fit_homography(src, dst):
+    """
+    Fit the 3x3 homography mapping the (N,2) src points to the dst points
+    with the normalized direct linear transform.  Needs at least 4 points.
+    """
+    src = np.asarray(src, dtype=np.float64).reshape(-1, 2)
+    dst = np.asarray(dst, dtype=np.float64).reshape(-1, 2)
+
+    if len(src) < 4 or len(src) != len(dst):
+        raise ValueError(f"fitting a homography needs at least 4 point pairs (got {len(src)} -> {len(dst)})")
+
+    src_T = normalize_points(src)
+    dst_T = normalize_points(dst)
+
+    s = apply_homography(src_T, src)
+    d = apply_homography(dst_T, dst)
+
+    zeros = np.zeros(len(s))
+    ones = np.ones(len(s))
+
+    A = np.concatenate([
+        np.stack([-s[:,0], -s[:,1], -ones, zeros, zeros, zeros, d[:,0] * s[:,0], d[:,0] * s[:,1], d[:,0]], axis=1),
+        np.stack([zeros, zeros, zeros, -s[:,0], -s[:,1], -ones, d[:,1] * s[:,0], d[:,1] * s[:,1], d[:,1]], axis=1)
+    ])
+
+    H = np.linalg.svd(A)[2][-1].reshape(3, 3)
+    H = np.linalg.inv(dst_T) @ H @ src_T
+
+    return H / H[2,2]
+
+
+def apply_homography(H, points):
+    """
+    Transform an (N,2) array of points by the 3x3 homography.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    projected = points @ H[:,:2].T + H[:,2]
+    return projected[:,:2] / projected[:,2:]
+
+
+def polynomial_terms(u, v, degree):
+    """
+    Return the (N, terms) matrix of monomials u^i * v^j for 0 < i+j <= degree.
+    The constant term is omitted because the homography already absorbs it.
+    """
+    return np.stack([u ** (n - j) * v ** j for n in range(1, degree + 1) for j in range(n + 1)], axis=-1)
+
+
+class Calibration:
+    """
+    Camera -> laser model:  a homography followed by a 2D polynomial correction,
+    with the polynomial evaluated on camera coordinates normalized to [-1, 1].
+    """
+    def __init__(self, camera_width, camera_height, homography=None, correction=None,
+                 laser_max=HELIOS_MAX_COORD, residuals=None):
+        """
+        Parameters:
+            camera_width (int) -- width of the camera image (in pixels)
+            camera_height (int) -- height of the camera image (in pixels)
+            homography (3x3 array) -- camera pixel -> laser homography
+            correction (terms x 2 array) -- polynomial coefficients for the x/y residuals
+            laser_max (int) -- maximum DAC coordinate
+            residuals (dict) -- fit error statistics (filled in by fit())
+        """
+        self.camera_width = int(camera_width)
+        self.camera_height = int(camera_height)
+        self.laser_max = laser_max
+        self.homography = np.eye(3) if homography is None else np.asarray(homography, dtype=np.float64)
+        self.correction = None if correction is None else np.asarray(correction, dtype=np.float64)
+        self.residuals = residuals or {}
+
+    @staticmethod
+    def fit(camera_points, laser_points, camera_width, camera_height, degree=2, iterations=20, laser_max=HELIOS_MAX_COORD):
+        """
+        Fit a calibration from corresponding (N,2) camera pixel and laser DAC coordinates.
+
+        Parameters:
+            degree (int) -- degree of the polynomial correction (0 to use only the homography)
+            iterations (int) -- number of rounds refining the homography and correction together
+
+        The fit error is stored in Calibration.residuals (in DAC units).
+        """
+        camera_points = np.asarray(camera_points, dtype=np.float64).reshape(-1, 2)
+        laser_points = np.asarray(laser_points, dtype=np.float64).reshape(-1, 2)
+
+        calibration = Calibration(camera_width, camera_height, fit_homography(camera_points, laser_points),
+                                  laser_max=laser_max)
+
+        if degree > 0:
+            terms = calibration.terms(camera_points, degree)
+
+            if len(camera_points) < terms.shape[1] + 4:
+                raise ValueError(f"a degree {degree} correction needs at least {terms.shape[1] + 4} point pairs "
+                                 f"(got {len(camera_points)})")
+
+            # alternate between fitting the polynomial to the homography residuals, and
+            # re-fitting the homography to the points with the correction removed
+            for _ in range(iterations):
+                residual = laser_points - apply_homography(calibration.homography, camera_points)
+                calibration.correction = np.linalg.lstsq(terms, residual, rcond=None)[0]
+                calibration.homography = fit_homography(camera_points, laser_points - terms @ calibration.correction)
+
+            residual = laser_points - apply_homography(calibration.homography, camera_points)
+            calibration.correction = np.linalg.lstsq(terms, residual, rcond=None)[0]
+
+        error = np.linalg.norm(calibration.project(camera_points, clip=False) - laser_points, axis=1)
+
+        calibration.residuals = {
+            'points': len(error),
+            'rms': float(np.sqrt((error ** 2).mean())),
+            'mean': float(error.mean()),
+            'max': float(error.max()),
+        }
+
+        return calibration
+
+    @property
+    def degree(self):
+        """
+        The degree of the polynomial correction (0 if there isn't one).
+        """
+        if self.correction is None:
+            return 0
+
+        degree = 0
+
+        while (degree + 1) * (degree + 4) // 2 <= len(self.correction):
+            degree += 1
+
+        return degree
+
+    def terms(self, points, degree=None):
+        """
+        Polynomial terms of the normalized camera coordinates.
+        """
+        u = points[:,0] * (2.0 / self.camera_width) - 1.0
+        v = points[:,1] * (2.0 / self.camera_height) - 1.0
+        return polynomial_terms(u, v, self.degree if degree is None else degree)
+
+    def project(self, points, clip=True):
+        """
+        Evaluate the model on an (N,2) array of camera pixel coordinates.
+        Returns an (N,2) float array of laser DAC coordinates.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        laser = apply_homography(self.homography, points)
+
+        if self.correction is not None:
+            laser += self.terms(points) @ self.correction
+
+        if clip:
+            np.clip(laser, 0, self.laser_max, out=laser)
+
+        return laser
+
+    def build_lut(self):
+        """
+        Evaluate the model at every camera pixel, returning a (height, width, 2) uint16 table.
+        """
+        ys, xs = np.mgrid[0:self.camera_height, 0:self.camera_width]
+        pixels = np.stack([xs.ravel(), ys.ravel()], axis=1).astype(np.float64)
+        lut = np.rint(self.project(pixels)).astype(np.uint16)
+        return lut.reshape(self.camera_height, self.camera_width, 2)
+
+    def to_dict(self):
+        return {
+            'camera_width': self.camera_width,
+            'camera_height': self.camera_height,
+            'laser_max': self.laser_max,
+            'homography': self.homography.tolist(),
+            'correction': None if self.correction is None else self.correction.tolist(),
+            'residuals': self.residuals,
+        }
+
+    def save(self, path):
+        """
+        Save the calibration to a JSON file.  The file is replaced atomically so
+        that a running LUTMapping never reloads a partially-written calibration.
+        """
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        """
+        Load a calibration from a JSON file written by save()
+        """
+        with open(path) as file:
+            config = json.load(file)
+
+        return Calibration(config['camera_width'], config['camera_height'],
+                           homography=config['homography'],
+                           correction=config.get('correction'),
+                           laser_max=config.get('laser_max', HELIOS_MAX_COORD),
+                           residuals=config.get('residuals'))
+
+
+class LUTMapping(Mapping):
+    """
+    Camera -> laser mapping through a lookup table baked from a Calibration.
+    Each lookup rounds the pixel coordinates and gathers from the table.
+
+    When created from a file, poll() can be called from the guidance loop to
+    pick up a re-calibration without restarting - it checks the file's
+    modification time at most once per interval, and when it changed, loads
+    and bakes the new calibration in a background thread that swaps in the
+    new table when it's done (the old one stays in use until then).
+    """
+    def __init__(self, calibration, reload_interval=1.0):
+        """
+        Parameters:
+            calibration (Calibration or string) -- the calibration, or a path to its JSON file
+            reload_interval (float) -- minimum seconds between checks of the file in poll()
+        """
+        self.path = calibration if isinstance(calibration, str) else None
+        self.reload_interval = reload_interval
+        self.mtime = None
+        self.bad_mtime = None   # modification time of a file that failed to load
+        self.last_poll = time.monotonic()
+        self.reloads = 0
+        self.published = 0   # value of reloads when poll() last reported a new calibration
+        self.loader = None   # thread reloading the calibration in the background
+
+        if self.path is not None:
+            self.reload()
+        else:
+            self.set_calibration(calibration)
+
+        self.published = self.reloads
+
+    def set_calibration(self, calibration):
+        """
+        Bake a new calibration into the table.  The table and its bounds replace the old
+        ones together in a single assignment, so lookups from other threads see either
+        the old pair or the new one.
+        """
+        lut = calibration.build_lut()
+        bounds = np.array([calibration.camera_width - 1, calibration.camera_height - 1])
+        self.table = (bounds, lut)
+        self.calibration = calibration
+
+    def reload(self):
+        """
+        Re-read the calibration file and rebuild the table (this blocks while it's built).
+        If loading fails, the previous calibration stays in use, and the error is only
+        printed once for each version of the file (poll() doesn't retry it until it changes).
+        Returns true if a new calibration was loaded.
+        """
+        mtime = None
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+            calibration = Calibration.load(self.path)
+        except Exception as error:
+            if self.mtime is None:
+                raise
+            if mtime is not None and mtime != self.bad_mtime:
+                print(f"[laser] failed to load calibration from {self.path}, keeping the previous one ({error})")
+            self.bad_mtime = mtime
+            return False
+
+        self.set_calibration(calibration)
+        self.mtime = mtime
+        self.reloads += 1
+
+        print(f"[laser] loaded calibration from {self.path} (rms error {calibration.residuals.get('rms', float('nan')):.1f})")
+        return True
+
+    def poll(self):
+        """
+        Start reloading the calibration in the background if its file changed (checked at
+        most once per reload_interval).  This doesn't wait for the new table to be built.
+        Returns true if a new calibration was loaded since the last call.
+        """
+        if self.path is None:
+            return False
+
+        if self.reloads != self.published:
+            self.published = self.reloads
+            return True
+
+        now = time.monotonic()
+
+        if now - self.last_poll < self.reload_interval:
+            return False
+
+        if self.loader is not None and self.loader.is_alive():
+            return False
+
+        self.last_poll = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return False
+
+        if mtime == self.mtime or mtime == self.bad_mtime:
+            return False
+
+        self.loader = threading.Thread(target=self.reload, name='calibration-loader', daemon=True)
+        self.loader.start()
+
+        return False
+
+    def wait(self, timeout=None):
+        """
+        Wait for a reload started by poll() to finish.
+        """
+        if self.loader is not None:
+            self.loader.join(timeout)
+
+    def __call__(self, points):
+        bounds, lut = self.table
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        pixels = np.rint(points).astype(np.intp)
+        np.clip(pixels, 0, bounds, out=pixels)
+        return lut[pixels[:,1], pixels[:,0]]
+
+
+def load_pairs(path):
+    """
+    Load recorded point pairs from a CSV file with "camera_x, camera_y, laser_x, laser_y"
+    rows (lines starting with # are ignored).  Returns (camera_points, laser_points).
+    """
+    pairs = np.loadtxt(path, delimiter=',', comments='#', ndmin=2)
+
+    if pairs.shape[1] != 4:
+        raise ValueError(f"expected 4 columns in {path} (camera_x, camera_y, laser_x, laser_y), found {pairs.shape[1]}")
+
+    return pairs[:,:2], pairs[:,2:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit a camera->laser calibration from recorded point pairs.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    parser.add_argument("pairs", type=str, help="CSV file of camera_x, camera_y, laser_x, laser_y rows")
+    parser.add_argument("--output", type=str, default="calibration.json", help="path to save the calibration to")
+    parser.add_argument("--width", type=int, default=1280, help="camera input width")
+    parser.add_argument("--height", type=int, default=720, help="camera input height")
+    parser.add_argument("--degree", type=int, default=2, help="degree of the polynomial correction (0 for homography only)")
+
+    args = parser.parse_args(argv)
+
+    camera_points, laser_points = load_pairs(args.pairs)
+    calibration = Calibration.fit(camera_points, laser_points, args.width, args.height, degree=args.degree)
+
+    error = np.linalg.norm(calibration.project(camera_points, clip=False) - laser_points, axis=1)
+
+    for (camera, laser, err) in zip(camera_points, laser_points, error):
+        print(f"camera ({camera[0]:7.1f}, {camera[1]:7.1f})  ->  laser ({laser[0]:6.0f}, {laser[1]:6.0f})  error {err:6.1f}")
+
+    print(f"residual error over {calibration.residuals['points']} points:  rms {calibration.residuals['rms']:.2f}  "
+          f"mean {calibration.residuals['mean']:.2f}  max {calibration.residuals['max']:.2f}  (DAC units)")
+
+    calibration.save(args.output)
+    print(f"saved calibration to {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
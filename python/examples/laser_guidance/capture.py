@@ -0,0 +1,188 @@
+#
+# Camera capture prefetching.
+#
+# The guidance loop calls input.Capture(), net.Detect() and output.Render() in
+# sequence, so the time spent waiting for the next camera frame adds directly
+# to the loop time and to the capture->laser latency.  CapturePrefetcher runs
+# Capture() on a background thread, so frame N+1 is being captured while frame
+# N is in detection, and Capture() on the prefetcher returns immediately with
+# the newest frame when one is already waiting.
+#
+# Frames are handed over through two slots:  one held by the consumer (valid
+# until its next Capture(), like with videoSource) and one that the capture
+# thread fills with the newest frame.  If that frame wasn't taken by the time
+# the next one arrives it is replaced and counted as dropped, so the consumer
+# never works through a backlog of stale frames.  By default each capture is
+# copied into the slot's own image, so the source's ring buffer can't reuse
+# the memory of a frame that's still being detected or rendered.
+#
+# It wraps anything with the videoSource Capture()/IsStreaming() interface, and
+# forwards the other videoSource methods (GetWidth(), GetFrameRate(), Close() ...)
+# The flask and html apps under python/www import this module directly rather
+# than through the package, so it must not use relative imports.
+#
+#   input = CapturePrefetcher(videoSource(args.input, argv=sys.argv))
+#   img = input.Capture()
+#
+import time
+import threading
+
+
+def cuda_copy(src, dst=None):
+    """
+    Copy a cudaImage into dst, (re)allocating dst if it doesn't match the size and format of src.
+    Returns the copy.
+    """
+    from jetson_utils import cudaAllocMapped, cudaMemcpy
+
+    if dst is None or dst.width != src.width or dst.height != src.height or dst.format != src.format:
+        dst = cudaAllocMapped(like=src)
+
+    cudaMemcpy(dst, src)
+    return dst
+
+
+class CapturePrefetcher(threading.Thread):
+    """
+    Captures frames from a video source on a background thread, handing the newest one
+    over to Capture() and dropping any frame that was replaced before it was taken.
+
+    Usage:
+        input = CapturePrefetcher(videoSource('/dev/video0'))
+
+        while input.IsStreaming():
+            img = input.Capture()
+            capture_time = input.timestamp
+    """
+    def __init__(self, source, copy=cuda_copy, timeout=1000, start=True, name='capture'):
+        """
+        Parameters:
+            source (videoSource) -- the source to capture from
+            copy (callable) -- copy(src, dst) that copies a frame into a slot image and returns it,
+                               or None to hand over the source's images without copying
+            timeout (int) -- timeout of the source's Capture() (milliseconds)
+            start (bool) -- start the capture thread
+            name (str) -- name of the capture thread
+        """
+        super().__init__(name=name, daemon=True)
+
+        self.source = source
+        self.copy = copy
+        self.capture_timeout = timeout
+
+        self.condition = threading.Condition()
+        self.slots = [None, None]   # slot images (or the source's images without copying)
+        self.times = [0.0, 0.0]     # perf_counter() when each slot's frame was captured
+        self.pending = None         # slot with the newest frame that hasn't been taken
+        self.held = None            # slot handed over to the consumer by the last Capture()
+        self.streaming = True
+        self.error = None
+        self.timestamp = None       # capture time of the frame returned by the last Capture()
+
+        self.captured = 0           # number of frames captured from the source
+        self.delivered = 0          # number of frames returned by Capture()
+        self.dropped = 0            # number of frames replaced before they were taken
+        self.wait_time = 0.0        # total seconds Capture() waited for a frame
+
+        if start:
+            self.start()
+
+    def run(self):
+        try:
+            while self.streaming:
+                img = self.source.Capture(timeout=self.capture_timeout)
+
+                if img is None:
+                    if not self.source.IsStreaming():
+                        break
+                    continue
+
+                timestamp = time.perf_counter()
+
+                with self.condition:
+                    self.captured += 1
+
+                    # fill the slot the consumer isn't holding - if it has a frame that
+                    # wasn't taken, that frame is dropped (it's out of reach while copying)
+                    if self.held is not None:
+                        slot = 1 - self.held
+                    else:
+                        slot = self.pending if self.pending is not None else 0
+
+                    if self.pending == slot:
+                        self.pending = None
+                        self.dropped += 1
+
+                if self.copy is not None:
+                    img = self.copy(img, self.slots[slot])
+
+                with self.condition:
+                    self.slots[slot] = img
+                    self.times[slot] = timestamp
+                    self.pending = slot
+                    self.condition.notify()
+        except Exception as error:
+            self.error = error
+        finally:
+            with self.condition:
+                self.streaming = False
+                self.condition.notify_all()
+
+    def Capture(self, timeout=None):
+        """
+        Return the newest captured frame, waiting for one if it hasn't arrived yet.
+        The previous frame returned by Capture() becomes invalid.
+
+        Parameters:
+            timeout (int) -- milliseconds to wait for a frame (defaults to the source timeout, -1 to wait forever)
+
+        Returns the image, or None if the timeout expired or the stream ended.
+        """
+        timeout = self.capture_timeout if timeout is None else timeout
+        time_begin = time.perf_counter()
+
+        with self.condition:
+            self.held = None
+
+            if self.pending is None:
+                self.condition.wait_for(lambda: self.pending is not None or not self.streaming,
+                                        timeout=None if timeout < 0 else timeout / 1000.0)
+
+            self.wait_time += time.perf_counter() - time_begin
+
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise error
+
+            if self.pending is None:
+                return None
+
+            self.held, self.pending = self.pending, None
+            self.timestamp = self.times[self.held]
+            self.delivered += 1
+
+            return self.slots[self.held]
+
+    def IsStreaming(self):
+        """
+        True until the source has ended and its last frame was taken.
+        """
+        return self.streaming or self.pending is not None
+
+    def Close(self):
+        """
+        Stop the capture thread and close the source.
+        """
+        self.streaming = False
+
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join()
+
+        self.source.Close()
+
+    def __getattr__(self, name):
+        # forward the rest of the videoSource interface (GetWidth(), GetFrameRate(), ...)
+        if name == 'source':
+            raise AttributeError(name)
+
+        return getattr(self.source, name)
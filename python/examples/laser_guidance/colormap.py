@@ -0,0 +1,97 @@
+#
+# Confidence -> laser color lookup tables.
+#
+# detectnet_balloon.py picked r/g/b per detection with an if/elif chain on
+# the confidence, which left gaps at the exact thresholds (a confidence of
+# exactly 0.7 or 0.8 kept the previous detection's color).  A ColorLUT bakes
+# the confidence -> (r, g, b, i) mapping into a 256-entry table, so a whole
+# array of confidences is colored with one gather, and every entry is capped
+# to a maximum output level for eye/skin safety.
+#
+import numpy as np
+
+LUT_SIZE = 256
+
+
+def quantize(confidence):
+    """
+    Quantize confidences in [0,1] to the nearest of the LUT_SIZE table indices.
+    """
+    index = np.asarray(confidence, dtype=np.float64) * (LUT_SIZE - 1)
+    return np.clip(np.rint(index), 0, LUT_SIZE - 1).astype(np.intp)
+
+
+class ColorLUT:
+    """
+    256-entry lookup table from detection confidence [0,1] to (r, g, b, i).
+
+    Usage:
+        lut = ColorLUT.gradient([(0.5, (10, 0, 0, 10)), (1.0, (0, 10, 0, 10))], max_intensity=20)
+        colors = lut(confidence)     # (N,4) uint8
+    """
+    def __init__(self, table, max_intensity=255):
+        """
+        Parameters:
+            table (array) -- (256,4) colors for the confidences 0/255 ... 255/255
+            max_intensity (int) -- cap applied to every channel of every entry
+        """
+        table = np.asarray(table, dtype=np.float64).reshape(LUT_SIZE, 4)
+
+        self.max_intensity = int(max_intensity)
+        self.table = np.clip(np.rint(table), 0, min(self.max_intensity, 255)).astype(np.uint8)
+
+    @staticmethod
+    def steps(thresholds=(0.7, 0.8), colors=((10, 0, 0, 10), (0, 0, 10, 10), (0, 10, 0, 10)), max_intensity=255):
+        """
+        Piecewise-constant table:  colors[0] below thresholds[0], colors[1] from thresholds[0]
+        up to thresholds[1], and so on - every confidence gets a color, including the thresholds.
+        The thresholds are quantized like the confidences, so they're resolved to 1/255.
+        """
+        colors = np.asarray(colors, dtype=np.float64).reshape(-1, 4)
+
+        if len(colors) != len(thresholds) + 1:
+            raise ValueError(f"expected {len(thresholds) + 1} colors for {len(thresholds)} thresholds")
+
+        bins = np.searchsorted(quantize(np.sort(thresholds)), np.arange(LUT_SIZE), side='right')
+        return ColorLUT(colors[bins], max_intensity)
+
+    @staticmethod
+    def gradient(stops, max_intensity=255):
+        """
+        Table that linearly interpolates between (confidence, (r, g, b, i)) stops,
+        holding the first and last colors outside of the stops.
+        """
+        stops = sorted(stops, key=lambda stop: stop[0])
+        positions = np.array([stop[0] for stop in stops], dtype=np.float64)
+        colors = np.array([stop[1] for stop in stops], dtype=np.float64).reshape(-1, 4)
+
+        confidence = np.arange(LUT_SIZE) / (LUT_SIZE - 1)
+        table = np.stack([np.interp(confidence, positions, colors[:, n]) for n in range(4)], axis=1)
+
+        return ColorLUT(table, max_intensity)
+
+    def __call__(self, confidence):
+        """
+        Look up the (N,4) uint8 colors of an (N,) array of confidences.
+        """
+        return self.table[quantize(confidence)]
+
+
+# named tables for the runner's --colormap option
+COLORMAPS = {
+    # the thresholds and colors of detectnet_balloon.py:  red, blue, then green as the confidence rises
+    'steps': lambda max_intensity: ColorLUT.steps(max_intensity=max_intensity),
+    # red through yellow to green, brighter with the confidence
+    'gradient': lambda max_intensity: ColorLUT.gradient([(0.5, (10, 0, 0, 4)), (0.75, (10, 10, 0, 8)), (1.0, (0, 10, 0, 12))],
+                                                        max_intensity=max_intensity),
+}
+
+
+def create_colormap(name, max_intensity=255):
+    """
+    Create one of the named COLORMAPS ('steps' or 'gradient') with an intensity cap.
+    """
+    if name not in COLORMAPS:
+        raise ValueError(f"unknown colormap '{name}' (valid colormaps are: {', '.join(COLORMAPS)})")
+
+    return COLORMAPS[name](max_intensity)
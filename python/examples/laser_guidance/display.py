@@ -0,0 +1,88 @@
+#
+# Low-rate display and logging side channel for the guidance loop.
+#
+# Drawing the detection overlay, rendering to the output stream, updating its
+# status and printing the network profiler times costs the camera thread time
+# on every frame - which on the deployed projector rigs nobody is watching.
+# In production mode (runner.py --production) the network doesn't draw its
+# overlay, and the SideChannel only overlays, renders and logs every Nth frame
+# (or never), so the rest of the frames go straight from Detect to the laser.
+#
+def draw_boxes(img, detections, color=(0, 255, 0, 80)):
+    """
+    Overlay the detection boxes on a cudaImage.  Unlike detectNet.Overlay() this works with any
+    objects that have Left/Top/Right/Bottom (like the Detections from ROIDetector crops).
+    """
+    from jetson_utils import cudaDrawRect
+
+    for detection in detections:
+        cudaDrawRect(img, (detection.Left, detection.Top, detection.Right, detection.Bottom), color)
+
+
+class SideChannel:
+    """
+    Shows and logs every Nth frame of the guidance loop.
+
+    Usage:
+        display = SideChannel(output, interval=30, overlay=draw_boxes,
+                              status=lambda: f"{net.GetNetworkFPS():.0f} FPS",
+                              log=lambda detections: net.PrintProfilerTimes())
+
+        while display.IsStreaming():
+            ...
+            display(img, detections)
+    """
+    def __init__(self, output=None, interval=1, overlay=None, status=None, log=None):
+        """
+        Parameters:
+            output (videoOutput) -- the stream to render the frames to (or None)
+            interval (int) -- handle every Nth frame (0 to never handle any)
+            overlay (callable) -- overlay(img, detections) drawing the detections before rendering
+            status (callable) -- status() returning the output's status text
+            log (callable) -- log(detections) printing information about the frame
+        """
+        self.output = output
+        self.interval = interval
+        self.overlay = overlay
+        self.status = status
+        self.log = log
+
+        self.frames = 0   # number of frames passed to the side channel
+        self.shown = 0    # number of frames that were rendered and logged
+
+    def due(self):
+        """
+        True if the next frame will be handled.
+        """
+        return self.interval > 0 and self.frames % self.interval == 0
+
+    def __call__(self, img, detections):
+        """
+        Overlay, render and log the frame if it's due.  Returns True if it was.
+        """
+        due = self.due()
+        self.frames += 1
+
+        if not due:
+            return False
+
+        if self.overlay is not None:
+            self.overlay(img, detections)
+
+        if self.output is not None:
+            self.output.Render(img)
+
+            if self.status is not None:
+                self.output.SetStatus(self.status())
+
+        if self.log is not None:
+            self.log(detections)
+
+        self.shown += 1
+        return True
+
+    def IsStreaming(self):
+        """
+        False once the output stream was closed (always True without an output).
+        """
+        return self.output is None or self.output.IsStreaming()
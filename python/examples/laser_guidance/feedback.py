@@ -0,0 +1,297 @@
+#
+# Closed-loop beam correction from the camera.
+#
+# The camera->laser mappings are open-loop:  when the projector or camera gets
+# bumped, or the calibration drifts, the offsets have to be retuned by hand
+# (the scripts' "+ 100", "- 400  # was -800").  BeamFeedback closes the loop
+# by looking for the laser dot in the captured frame - a thresholded blob
+# search in a small window around where the beam was aimed, so only about
+# ten thousand pixels are looked at per dot - and feeding the miss back into a
+# CorrectionGrid of per-cell laser offsets over the camera image.
+# FeedbackMapping adds the grid's offsets to any mapping (the calibration LUT
+# or the hand-tuned ones), so the correction follows the beam across the image.
+#
+#   $ python3 -m laser_guidance.runner --calibration=laser.json --feedback=correction.json /dev/video0
+#
+# The miss is measured in camera pixels and turned into a laser offset with
+# the local Jacobian of the mapping, and each observation moves the offsets
+# by a fraction (the gain) of it, so noise and the odd false detection
+# average out.  The grid is saved on exit and loaded on start.
+#
+# The dot in a camera frame is where the beam was pointed when that frame was
+# exposed, which is some frames behind the detections (the capture to DAC
+# write latency) - and the targets move in the meantime.  So BeamFeedback
+# keeps a short history of the aim points keyed by the time their laser frame
+# was written, and compares each captured frame with the aim points that were
+# lit when it was captured, not with the latest ones.
+#
+import os
+import json
+import collections
+
+import numpy as np
+
+from .helios import HELIOS_MAX_COORD
+from .mapping import Mapping
+
+
+def find_dot(image, expected, window=48, channel=0, threshold=60, min_pixels=2, max_pixels=400):
+    """
+    Find the laser dot near an expected position with a thresholded blob search in a
+    window around it.  The dot's brightness is how much the given color channel exceeds
+    the mean of the others, so white highlights don't count.
+
+    Parameters:
+        image (ndarray) -- (H,W,C) image (e.g. from cudaToNumpy())
+        expected (tuple) -- (x, y) camera pixel the beam was aimed at
+        window (int) -- half size of the search window in pixels
+        channel (int) -- color channel of the laser (0 for red in RGB)
+        threshold (int) -- minimum brightness of a dot pixel
+        min_pixels, max_pixels (int) -- the size range of a dot (larger blobs are rejected)
+
+    Returns the (x, y) sub-pixel centroid of the dot, or None if it wasn't found.
+    """
+    height, width = image.shape[:2]
+    x, y = int(round(expected[0])), int(round(expected[1]))
+
+    left, top = max(x - window, 0), max(y - window, 0)
+    right, bottom = min(x + window + 1, width), min(y + window + 1, height)
+
+    if right <= left or bottom <= top:
+        return None
+
+    patch = image[top:bottom, left:right].astype(np.int16)
+    brightness = patch[..., channel] * 1.5 - patch.sum(axis=2) * 0.5   # channel - mean of the others
+
+    # threshold relative to the peak, so a bright dot's halo isn't included
+    peak = brightness.max()
+
+    if peak < threshold:
+        return None
+
+    mask = brightness >= max(threshold, peak * 0.5)
+    count = np.count_nonzero(mask)
+
+    if count < min_pixels or count > max_pixels:
+        return None
+
+    weights = np.where(mask, brightness, 0.0)
+    total = weights.sum()
+    ys, xs = np.nonzero(mask)
+
+    return (left + (xs * weights[ys, xs]).sum() / total,
+            top + (ys * weights[ys, xs]).sum() / total)
+
+
+class CorrectionGrid:
+    """
+    Grid of (dx, dy) laser offsets over the camera image, bilinearly interpolated.
+    """
+    def __init__(self, width, height, cell=128, max_offset=400.0, offsets=None):
+        """
+        Parameters:
+            width, height (int) -- camera resolution in pixels
+            cell (int) -- grid spacing in pixels
+            max_offset (float) -- limit on each offset, in DAC units
+            offsets (array) -- initial (rows, columns, 2) offsets
+        """
+        self.width = width
+        self.height = height
+        self.cell = cell
+        self.max_offset = max_offset
+
+        shape = (int(np.ceil(height / cell)) + 1, int(np.ceil(width / cell)) + 1, 2)
+        self.offsets = np.zeros(shape) if offsets is None else np.asarray(offsets, dtype=np.float64).reshape(shape)
+
+    def weights(self, points):
+        """
+        Return the (N,4) grid cell indices (flattened) and bilinear weights of the camera points.
+        """
+        rows, columns = self.offsets.shape[:2]
+        grid = np.asarray(points, dtype=np.float64).reshape(-1, 2) / self.cell
+        grid = np.clip(grid, 0, [columns - 1.001, rows - 1.001])
+
+        cell = grid.astype(np.intp)
+        fx, fy = (grid - cell).T
+        index = cell[:,1] * columns + cell[:,0]
+
+        indices = np.stack([index, index + 1, index + columns, index + columns + 1], axis=1)
+        weights = np.stack([(1 - fx) * (1 - fy), fx * (1 - fy), (1 - fx) * fy, fx * fy], axis=1)
+        return indices, weights
+
+    def __call__(self, points):
+        """
+        Interpolate the (N,2) laser offsets at the (N,2) camera points.
+        """
+        indices, weights = self.weights(points)
+        return (self.offsets.reshape(-1, 2)[indices] * weights[..., None]).sum(axis=1)
+
+    def update(self, points, corrections, gain=0.2):
+        """
+        Move the interpolated offsets at the camera points by gain times the (N,2) laser corrections,
+        spreading each correction over the surrounding grid nodes in proportion to their bilinear weights.
+        """
+        indices, weights = self.weights(points)
+        offsets = self.offsets.reshape(-1, 2)
+
+        # normalized so that the offset interpolated at the point moves by exactly gain * correction
+        scale = weights * (gain / (weights ** 2).sum(axis=1, keepdims=True))
+
+        np.add.at(offsets, indices.ravel(), (scale[..., None] * np.asarray(corrections)[:, None, :]).reshape(-1, 2))
+        np.clip(self.offsets, -self.max_offset, self.max_offset, out=self.offsets)
+
+    def save(self, path):
+        """
+        Save the grid to a JSON file (replaced atomically, like Calibration.save()).
+        """
+        tmp_path = path + '.tmp'
+
+        with open(tmp_path, 'w') as file:
+            json.dump({'width': self.width, 'height': self.height, 'cell': self.cell,
+                       'max_offset': self.max_offset, 'offsets': self.offsets.round(2).tolist()}, file)
+
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path) as file:
+            config = json.load(file)
+
+        return CorrectionGrid(config['width'], config['height'], config['cell'],
+                              config.get('max_offset', 400.0), config['offsets'])
+
+
+class FeedbackMapping(Mapping):
+    """
+    Wraps a camera->laser mapping and adds the offsets of a CorrectionGrid to it.
+    """
+    def __init__(self, mapping, grid, laser_max=HELIOS_MAX_COORD):
+        """
+        Parameters:
+            mapping (Mapping) -- the open-loop mapping
+            grid (CorrectionGrid) -- the correction learned by BeamFeedback
+            laser_max (int) -- maximum DAC coordinate
+        """
+        self.mapping = mapping
+        self.grid = grid
+        self.laser_max = laser_max
+
+    def poll(self):
+        return self.mapping.poll()
+
+    def __call__(self, points):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        coords = self.mapping(points) + self.grid(points)
+        return np.clip(np.rint(coords), 0, self.laser_max).astype(np.uint16)
+
+
+class BeamFeedback:
+    """
+    Finds the laser dots in the captured frames and corrects a FeedbackMapping's grid.
+
+    Usage:
+        feedback = BeamFeedback(mapping, width, height)
+        runner = GuidanceRunner(strategy, feedback.mapping, writer)
+
+        img = input.Capture()
+        feedback.observe(cudaToNumpy(img), capture_time)   # before anything is drawn on it
+        ...
+        runner.process(detections, capture_time)
+        feedback.aimed(runner.aim_points, capture_time + writer.latency.value)
+    """
+    def __init__(self, mapping, width, height, grid=None, window=48, gain=0.2, max_dots=4,
+                 history=16, settle=0.002, **find_args):
+        """
+        Parameters:
+            mapping (Mapping) -- the open-loop mapping to correct
+            width, height (int) -- camera resolution in pixels
+            grid (CorrectionGrid) -- correction to continue from (a new one is created if not given)
+            window (int) -- half size of the search window around each aim point, in pixels
+            gain (float) -- fraction of each observed miss that is corrected
+            max_dots (int) -- maximum number of aim points searched per frame
+            history (int) -- number of laser frames whose aim points are kept
+            settle (float) -- seconds after a write before the beam is looked for in the camera
+                              (a frame captured sooner may have been exposed partly before it)
+            find_args -- threshold, channel, min_pixels and max_pixels passed to find_dot()
+        """
+        self.grid = grid if grid is not None else CorrectionGrid(width, height)
+        self.mapping = FeedbackMapping(mapping, self.grid)
+        self.window = window
+        self.gain = gain
+        self.max_dots = max_dots
+        self.settle = settle
+        self.find_args = find_args
+        self.history = collections.deque(maxlen=history)   # (write time, aim points) of the recent laser frames
+
+        self.observations = 0   # number of dots found
+        self.misses = 0         # number of aim points where no dot was found
+        self.error = None       # running average of the miss distance, in pixels
+
+    def jacobian(self, points, delta=4.0):
+        """
+        Return the (N,2,2) derivatives of the open-loop mapping (DAC units per pixel) at the camera points.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        base = self.mapping.mapping
+        steps = np.array([[delta, 0.0], [0.0, delta]])
+
+        columns = [(base(points + step).astype(np.float64) - base(points - step)) / (2 * delta) for step in steps]
+        return np.stack(columns, axis=2)
+
+    def aimed(self, aim_points, write_time):
+        """
+        Record the (N,2) camera points that a laser frame aimed at, and the time.perf_counter()
+        time it was (or is expected to be) written to the DAC.
+        """
+        self.history.append((write_time, np.asarray(aim_points, dtype=np.float64).reshape(-1, 2)))
+
+    def lit(self, capture_time):
+        """
+        Return the aim points of the last laser frame written before a camera frame was captured,
+        or None if it isn't known (nothing was written yet, or the write was within the settle time).
+        """
+        for write_time, aim_points in reversed(self.history):
+            if write_time <= capture_time:
+                return aim_points if capture_time - write_time >= self.settle else None
+
+        return None
+
+    def observe(self, image, capture_time):
+        """
+        Look for the dot around each of the camera points the beam was aimed at when the image
+        was captured, and update the correction with the misses.  Returns the number of dots found.
+        """
+        aim_points = self.lit(capture_time)
+
+        if aim_points is None:
+            return 0
+
+        aim_points = aim_points[:self.max_dots]
+
+        found = []
+        dots = []
+
+        for n, point in enumerate(aim_points):
+            dot = find_dot(image, point, self.window, **self.find_args)
+
+            if dot is None:
+                self.misses += 1
+            else:
+                found.append(n)
+                dots.append(dot)
+
+        if not found:
+            return 0
+
+        points = aim_points[found]
+        misses = points - np.asarray(dots)   # move the beam by this many pixels
+
+        # pixels -> DAC units through the local slope of the mapping
+        corrections = np.einsum('nij,nj->ni', self.jacobian(points), misses)
+        self.grid.update(points, corrections, self.gain)
+
+        distance = float(np.linalg.norm(misses, axis=1).mean())
+        self.error = distance if self.error is None else self.error + 0.1 * (distance - self.error)
+        self.observations += len(found)
+
+        return len(found)
@@ -0,0 +1,191 @@
+#
+# Fixed-rate DAC refresh, independent of the camera frame rate.
+#
+# Without it, a laser frame is only built when a detection arrives:  between
+# detections the galvos sit still (or the beam is blanked, like the
+# HeliosPoint(100,100,0,0,0,0) write of detectnet_balloon.py), so the beam
+# moves in steps at the inference rate.  With a FrameGovernor the runner only
+# hands it the targets of each camera frame, and the governor's own thread
+# builds and submits a laser frame at a fixed rate (e.g. 60 Hz).  Each target
+# glides from where the beam was drawing it to its newest (predicted) position
+# over one detection interval, so consecutive laser frames only move the
+# beam a little.  Targets are matched between updates by their track ID (or
+# by order when there's no tracker).  If no targets were seen for the blank
+# timeout, the governor blanks the laser instead of freezing on stale targets.
+#
+#   $ python3 -m laser_guidance.runner --predict --refresh-rate=60 --blank-timeout=0.5 /dev/video0
+#
+import time
+import threading
+import traceback
+
+import numpy as np
+
+from .writer import Mailbox
+
+
+class FrameGovernor(threading.Thread):
+    """
+    Thread that renders the latest targets to the LaserWriter at a fixed rate.
+
+    Usage:
+        governor = FrameGovernor(writer, create_strategy('center'), mapping, rate=60)
+        governor.start()
+        runner = GuidanceRunner(strategy, mapping, writer, governor=governor)
+        ...
+        governor.stop()
+    """
+    def __init__(self, writer, strategy, mapping, rate=60.0, timeout=0.5, blank=False, name='frame-governor'):
+        """
+        Parameters:
+            writer (LaserWriter) -- the started writer thread the frames are posted to
+            strategy (TargetingStrategy) -- what to draw for the targets (only used from this thread)
+            mapping (Mapping) -- camera->laser coordinate mapping
+            rate (float) -- laser frames per second
+            timeout (float) -- seconds without any targets after which the laser is blanked
+            blank (bool) -- if true, also blank the laser as soon as a camera frame has no targets
+                            (otherwise the last targets are held until the timeout)
+        """
+        super().__init__(name=name, daemon=True)
+
+        self.writer = writer
+        self.strategy = strategy
+        self.mapping = mapping
+        self.period = 1.0 / rate
+        self.timeout = timeout
+        self.blank = blank
+        self.mailbox = Mailbox()
+        self.run_flag = False
+
+        # the targets being drawn (only touched by the governor thread)
+        self.ids = None
+        self.start_boxes = np.zeros((0, 4))
+        self.end_boxes = np.zeros((0, 4))
+        self.confidence = np.zeros(0)
+        self.glide_begin = 0.0      # time the targets started gliding to end_boxes
+        self.interval = None        # running average of the time between updates
+        self.last_update = None     # time of the last update
+        self.last_seen = None       # time of the last update that had targets
+        self.timestamp = None       # capture time of the update not written yet (for the latency)
+
+        self.frames = 0          # number of laser frames submitted
+        self.blanked = 0         # number of blanked frames submitted
+        self.late = 0            # number of ticks that were skipped because the thread fell behind
+
+    def update(self, boxes, confidence, ids=None, timestamp=None):
+        """
+        Hand the governor the (N,4) boxes and (N,) confidences of the newest camera frame,
+        with their (N,) track IDs (or None).  This never blocks and is called from the camera
+        thread - updates that the governor didn't get to yet are replaced.
+        """
+        self.mailbox.post((time.perf_counter(), np.array(boxes, dtype=np.float64).reshape(-1, 4),
+                           np.array(confidence, dtype=np.float64).reshape(-1),
+                           None if ids is None else np.array(ids), timestamp))
+
+    def boxes(self, now):
+        """
+        The (N,4) boxes to draw at time now, part way along their glide.
+        """
+        if self.interval is None or len(self.end_boxes) == 0:
+            return self.end_boxes
+
+        fraction = min(max((now - self.glide_begin) / self.interval, 0.0), 1.0)
+        return self.start_boxes + (self.end_boxes - self.start_boxes) * fraction
+
+    def receive(self, now):
+        """
+        Start gliding to the targets of the newest update (if there is one).
+        """
+        update = self.mailbox.take(timeout=0)
+
+        if update is None:
+            return
+
+        received, boxes, confidence, ids, timestamp = update
+
+        if self.last_update is not None:
+            interval = received - self.last_update
+            self.interval = interval if self.interval is None else self.interval + 0.2 * (interval - self.interval)
+
+        self.last_update = received
+        self.timestamp = timestamp
+
+        if len(boxes) == 0:
+            if self.blank:
+                self.ids, self.start_boxes, self.end_boxes, self.confidence = None, boxes, boxes, confidence
+            return
+
+        # start each target from where it's drawn now (new ones start at their position)
+        current = self.boxes(now)
+        start = boxes.copy()
+
+        if ids is not None and self.ids is not None and len(self.ids) > 0:
+            order = np.argsort(self.ids)
+            index = np.minimum(np.searchsorted(self.ids, ids, sorter=order), len(order) - 1)
+            matched = self.ids[order[index]] == ids
+            start[matched] = current[order[index[matched]]]
+        elif ids is None and self.ids is None and len(current) == len(boxes):
+            start[:] = current
+
+        self.ids, self.start_boxes, self.end_boxes, self.confidence = ids, start, boxes, confidence
+        self.glide_begin = now
+        self.last_seen = received
+
+    def tick(self):
+        """
+        Build and submit the laser frame for the current time.
+        """
+        now = time.perf_counter()
+        self.receive(now)
+
+        if self.last_seen is None:
+            return
+
+        frame = self.writer.acquire()
+        frame.timestamp, self.timestamp = self.timestamp, None
+
+        if now - self.last_seen < self.timeout and len(self.end_boxes) > 0:
+            self.strategy(self.boxes(now), self.confidence, self.mapping, frame)
+        else:
+            frame.clear()
+
+        if frame.count == 0:
+            frame.view[0] = (100, 100, 0, 0, 0, 0)   # blanked point (like detectnet_balloon.py wrote)
+            frame.count = 1
+            self.blanked += 1
+
+        self.writer.submit(frame)
+        self.frames += 1
+
+    def start(self):
+        self.run_flag = True
+        super().start()
+
+    def stop(self, timeout=1.0):
+        """
+        Signal the thread to exit and wait for it.
+        """
+        self.run_flag = False
+
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        deadline = time.perf_counter()
+
+        while self.run_flag:
+            try:
+                self.tick()
+            except Exception:
+                traceback.print_exc()
+
+            # sleep until the next tick, skipping the ones that were missed
+            deadline += self.period
+            now = time.perf_counter()
+
+            if now > deadline:
+                missed = int((now - deadline) / self.period) + 1
+                self.late += missed
+                deadline += missed * self.period
+
+            time.sleep(max(deadline - time.perf_counter(), 0))
@@ -0,0 +1,129 @@
+#
+# Helios laser DAC bindings shared by the laser guidance scripts.
+#
+# The Helios SDK ships as a shared library (libHeliosDacAPI.so) that is
+# loaded with ctypes.  All of the calls used here release the GIL while
+# they run (ctypes.CDLL does that by default), so they can be issued
+# from a background thread without stalling the inference loop.
+#
+import ctypes
+
+import numpy as np
+
+# limits from HeliosDac.h
+HELIOS_MAX_POINTS = 0x1000
+HELIOS_MAX_PPS = 0xFFFF
+HELIOS_MIN_PPS = 7
+HELIOS_MAX_COORD = 4095
+
+# status codes returned by GetStatus()
+HELIOS_READY = 1
+HELIOS_NOT_READY = 0
+
+# default output settings used by the detectnet laser scripts
+DEFAULT_PPS = 64000
+DEFAULT_FLAGS = 64
+DEFAULT_COLOR = (50, 0, 0, 63)   # (r, g, b, i)
+DEFAULT_LIBRARY = "./libHeliosDacAPI.so"
+
+
+class HeliosPoint(ctypes.Structure):
+    """
+    One output point in the Helios 12-bit format:  x, y are 0-4095,
+    r, g, b, i are 0-255.
+    """
+    _fields_ = [('x', ctypes.c_uint16),
+                ('y', ctypes.c_uint16),
+                ('r', ctypes.c_uint8),
+                ('g', ctypes.c_uint8),
+                ('b', ctypes.c_uint8),
+                ('i', ctypes.c_uint8)]
+
+
+# numpy equivalent of HeliosPoint, for viewing ctypes point arrays as structured arrays
+HELIOS_POINT_DTYPE = np.dtype([('x', '<u2'),
+                               ('y', '<u2'),
+                               ('r', 'u1'),
+                               ('g', 'u1'),
+                               ('b', 'u1'),
+                               ('i', 'u1')])
+
+assert HELIOS_POINT_DTYPE.itemsize == ctypes.sizeof(HeliosPoint)
+
+
+def load_helios(path=DEFAULT_LIBRARY):
+    """
+    Load the Helios DAC library and open the connected devices.
+    Returns a (lib, num_devices) tuple, and raises if no DAC was found.
+    """
+    lib = ctypes.cdll.LoadLibrary(path)
+    num_devices = lib.OpenDevices()
+
+    if num_devices < 1:
+        raise Exception("No Helios DAC devices found")
+
+    print(f"Found {num_devices} Helios DAC(s)")
+    return lib, num_devices
+
+
+def clamp_coord(value):
+    """
+    Truncate a laser coordinate to an integer within the DAC range [0, 4095].
+    """
+    return min(max(int(value), 0), HELIOS_MAX_COORD)
+
+
+def make_frame(points, color=DEFAULT_COLOR):
+    """
+    Build a ctypes HeliosPoint array from a sequence of (x, y) laser coordinates.
+    """
+    frame = (HeliosPoint * len(points))()
+
+    for n, (x, y) in enumerate(points):
+        frame[n] = HeliosPoint(int(x), int(y), *color)
+
+    return frame
+
+
+def point_view(frame):
+    """
+    Return a writable numpy structured array (HELIOS_POINT_DTYPE) that shares
+    memory with a ctypes HeliosPoint array, so it can be filled without copies.
+    """
+    return np.frombuffer(frame, dtype=HELIOS_POINT_DTYPE)
+
+
+def write_points(view, coords, color=DEFAULT_COLOR, start=0):
+    """
+    Write an (N,2) array of laser coordinates and their colors into a HELIOS_POINT_DTYPE
+    array (e.g. from point_view()), starting at the given index.  The color is either one
+    (r, g, b, i) tuple for all of the points, or an (N,4) array with a color per point.
+    Returns the index after the last point written.
+    """
+    end = start + len(coords)
+
+    if end > len(view):
+        raise ValueError(f"frame has room for {len(view)} points, but {end} were needed")
+
+    points = view[start:end]
+
+    points['x'] = coords[:,0]
+    points['y'] = coords[:,1]
+    if np.ndim(color) == 2:
+        color = np.asarray(color).T
+
+    points['r'], points['g'], points['b'], points['i'] = color
+
+    return end
+
+
+def wait_ready(lib, device, attempts=512):
+    """
+    Poll GetStatus() until the device is ready for the next frame.
+    After the given number of attempts, give up and let the caller write anyway.
+    Returns true if the device reported ready.
+    """
+    for _ in range(attempts):
+        if lib.GetStatus(device) == HELIOS_READY:
+            return True
+    return False
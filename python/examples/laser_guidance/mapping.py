@@ -0,0 +1,182 @@
+#
+# Vectorized camera pixel -> laser DAC coordinate mapping.
+#
+# The detectnet_* scripts used to call calculate_laser_coords() once per
+# detection (or once per box corner), doing np.power/np.clip on Python
+# scalars each time.  LaserMapping maps an (N,2) array of pixel coordinates
+# in one numpy pass, and can write the result straight into a preallocated
+# HeliosPoint array via its numpy view.
+#
+import numpy as np
+
+from .helios import HELIOS_MAX_COORD, DEFAULT_COLOR, point_view, write_points
+
+
+class Mapping:
+    """
+    Base class for camera-to-laser mappings.  Subclasses implement __call__(),
+    which maps an (N,2) array of camera pixel coordinates to an (N,2) uint16
+    array of DAC coordinates.
+    """
+    def __call__(self, points):
+        raise NotImplementedError(f"{type(self).__name__} must implement __call__()")
+
+    def poll(self):
+        """
+        Give the mapping a chance to reload itself (e.g. if its calibration changed).
+        This gets called once per frame, and returns true if the mapping changed.
+        """
+        return False
+
+    def fill(self, frame, points, color=DEFAULT_COLOR, start=0):
+        """
+        Map the camera pixel coordinates and write them into a preallocated
+        ctypes HeliosPoint array (or a HELIOS_POINT_DTYPE numpy array).
+
+        Parameters:
+            frame (ctypes array or ndarray) -- the destination point buffer
+            points (array-like) -- (N,2) camera pixel coordinates
+            color (tuple) -- (r, g, b, i) written to each point
+            start (int) -- index of the first point in the frame to write
+
+        Returns the index after the last point written.
+        """
+        if not isinstance(frame, np.ndarray):
+            frame = point_view(frame)
+
+        return write_points(frame, self(points), color, start)
+
+
+class LaserMapping(Mapping):
+    """
+    Exponential camera-to-laser mapping, equivalent to the calculate_laser_coords()
+    functions from the scripts:
+
+        laser = laser_max * (pixel / camera_size) ** exponent + offset
+
+    clipped to [0, laser_max] and truncated to integers, with y optionally flipped
+    (the camera origin is top-left and the laser origin is bottom-left).
+    """
+    def __init__(self, camera_width=800, camera_height=600, laser_max=HELIOS_MAX_COORD,
+                 exponent=(0.93, 0.5), offset=(100, -400), flip_y=True):
+        """
+        Parameters:
+            camera_width (int) -- width of the camera image (in pixels)
+            camera_height (int) -- height of the camera image (in pixels)
+            laser_max (int) -- maximum DAC coordinate
+            exponent (tuple) -- (x, y) exponents applied to the normalized coordinates
+            offset (tuple) -- (x, y) offsets added after scaling, in DAC units
+            flip_y (bool) -- if true, y is inverted after clipping
+        """
+        self.camera_width = camera_width
+        self.camera_height = camera_height
+        self.laser_max = laser_max
+        self.flip_y = flip_y
+
+        self.scale = np.array([1.0 / camera_width, 1.0 / camera_height], dtype=np.float64)
+        self.exponent = np.array(exponent, dtype=np.float64)
+        self.offset = np.array(offset, dtype=np.float64)
+
+    def __call__(self, points):
+        """
+        Map an (N,2) array of camera pixel coordinates to an (N,2) uint16 array of DAC coordinates.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+
+        coords = np.maximum(points * self.scale, 0.0)
+        np.power(coords, self.exponent, out=coords)
+        coords *= self.laser_max
+        coords += self.offset
+
+        np.clip(coords, 0, self.laser_max, out=coords)
+        np.floor(coords, out=coords)
+
+        if self.flip_y:
+            coords[:,1] = self.laser_max - coords[:,1]
+
+        return coords.astype(np.uint16)
+
+
+class LinearMapping(Mapping):
+    """
+    Linear camera-to-laser mapping, like the hand-tuned gains in the scripts
+    (e.g. x = 5.4 * center_x - 1300):
+
+        laser = pixel * scale + offset
+
+    clipped to [0, laser_max] and truncated to integers.  A negative y scale
+    flips the image vertically.
+    """
+    def __init__(self, scale=(3.2, -5.7), offset=(0, 4095), laser_max=HELIOS_MAX_COORD):
+        """
+        Parameters:
+            scale (tuple) -- (x, y) gains, in DAC units per pixel
+            offset (tuple) -- (x, y) offsets added after scaling, in DAC units
+            laser_max (int) -- maximum DAC coordinate
+        """
+        self.laser_max = laser_max
+        self.scale = np.array(scale, dtype=np.float64)
+        self.offset = np.array(offset, dtype=np.float64)
+
+    def __call__(self, points):
+        """
+        Map an (N,2) array of camera pixel coordinates to an (N,2) uint16 array of DAC coordinates.
+        """
+        coords = np.asarray(points, dtype=np.float64).reshape(-1, 2) * self.scale
+        coords += self.offset
+
+        np.clip(coords, 0, self.laser_max, out=coords)
+        return coords.astype(np.uint16)
+
+
+class Detection:
+    """
+    Stand-in for detectNet.Detection with the box coordinates and confidence, for
+    detections that didn't come straight from detectNet (e.g. simulated, replayed,
+    or moved from the coordinates of an image crop).
+    """
+    __slots__ = ('Left', 'Top', 'Right', 'Bottom', 'Confidence', 'ClassID')
+
+    def __init__(self, box, confidence=1.0, class_id=0):
+        self.Left, self.Top, self.Right, self.Bottom = (float(v) for v in box)
+        self.Confidence = float(confidence)
+        self.ClassID = class_id
+
+    @property
+    def Center(self):
+        return ((self.Left + self.Right) * 0.5, (self.Top + self.Bottom) * 0.5)
+
+    @property
+    def Width(self):
+        return self.Right - self.Left
+
+    @property
+    def Height(self):
+        return self.Bottom - self.Top
+
+
+def detection_centers(detections):
+    """
+    Gather the centers of a list of detectNet.Detection objects into an (N,2) array.
+    """
+    return np.array([detection.Center for detection in detections], dtype=np.float64).reshape(-1, 2)
+
+
+def detection_boxes(detections):
+    """
+    Gather the bounding boxes of a list of detectNet.Detection objects
+    into an (N,4) array of (left, top, right, bottom) coordinates.
+    """
+    return np.array([(detection.Left, detection.Top, detection.Right, detection.Bottom)
+                     for detection in detections], dtype=np.float64).reshape(-1, 4)
+
+
+def box_corners(boxes, order=('tl', 'tr', 'br', 'bl')):
+    """
+    Expand an (N,4) array of (left, top, right, bottom) boxes into an (N,len(order),2)
+    array of corner points, in the given order of 'tl', 'tr', 'br', 'bl' corners.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    columns = {'tl': (0, 1), 'tr': (2, 1), 'br': (2, 3), 'bl': (0, 3)}
+    index = np.array([columns[corner] for corner in order]).reshape(-1)
+    return boxes[:, index].reshape(len(boxes), len(order), 2)
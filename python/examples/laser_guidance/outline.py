@@ -0,0 +1,197 @@
+#
+# Box outline rasterization.
+#
+# Tracing a detection box with only its 5 corner points leaves the galvos to
+# slew freely between them:  at 64 kpps the corners come out bright (the beam
+# sits there) while the edges are dim and bowed (the mirrors overshoot and lag
+# on the long jumps), so the outline needs many repeats to be readable.
+#
+# OutlineRasterizer instead resamples every edge to a uniform point spacing
+# for the drawing speed, holds each corner for a few points so the mirrors
+# settle before turning, and moves between boxes with blanked transit points
+# (plus blanked dwell at both ends so the beam isn't lit while it's still
+# moving).  Only the corners go through the camera->laser mapping - the edges
+# are resampled by arc length between the mapped corners, so the spacing is
+# even in laser coordinates however the mapping stretches the image.  All of
+# the boxes of a frame are rasterized together with array ops, and the point
+# count is capped
+# (first by lowering the point density, then by dropping boxes) so that the
+# frame rate stays predictable.
+#
+import numpy as np
+
+from .helios import HELIOS_MAX_POINTS, DEFAULT_PPS, DEFAULT_COLOR
+from .mapping import box_corners
+from .planner import plan_order
+
+
+class OutlineRasterizer:
+    """
+    Draws the outlines of detection boxes into a FrameBuffer.
+
+    Usage:
+        rasterizer = OutlineRasterizer(pps=64000)
+        rasterizer.draw(boxes, mapping, buffer)
+    """
+    def __init__(self, pps=DEFAULT_PPS, draw_speed=1.0e6, galvo_speed=4.0e6, corner_dwell=0.0001,
+                 blank_dwell=0.00005, min_refresh=30.0, max_points=HELIOS_MAX_POINTS):
+        """
+        Parameters:
+            pps (int) -- output rate in points per second
+            draw_speed (float) -- beam speed along the lit edges, in DAC units per second
+            galvo_speed (float) -- maximum blanked travel speed between boxes, in DAC units per second
+            corner_dwell (float) -- seconds the beam holds at each corner
+            blank_dwell (float) -- seconds of blanked points at each end of a transit between boxes
+            min_refresh (float) -- minimum frame rate (Hz) - caps the frame at pps / min_refresh points
+            max_points (int) -- maximum number of points in the frame
+        """
+        self.pps = pps
+        self.draw_speed = draw_speed
+        self.galvo_speed = galvo_speed
+        self.corner_dwell = corner_dwell
+        self.blank_dwell = blank_dwell
+        self.min_refresh = min_refresh
+        self.max_points = max_points
+        self.position = None   # where the previous frame left the beam
+
+        self.reduced = 0       # number of frames drawn at a lower point density to fit the budget
+        self.truncated = 0     # number of frames where boxes had to be dropped
+
+    @property
+    def budget(self):
+        """
+        Maximum number of points per frame.
+        """
+        return max(1, min(self.max_points, int(self.pps / self.min_refresh)))
+
+    def points_for(self, seconds):
+        return max(1, int(round(seconds * self.pps)))
+
+    def cost(self, corners):
+        """
+        Number of points each box outline takes at the full point density,
+        from the (N,4,2) laser coordinates of its corners (not counting the transits).
+        """
+        corners = np.asarray(corners, dtype=np.float64).reshape(-1, 4, 2)
+        edges = np.linalg.norm(np.roll(corners, -1, axis=1) - corners, axis=2)
+        step = max(self.draw_speed / self.pps, 1.0)
+        return np.maximum(np.ceil(edges / step), 1).sum(axis=1).astype(np.intp) + 4 * self.points_for(self.corner_dwell) + 1
+
+    def layout(self, corners, budget):
+        """
+        Work out the points per edge, corner dwell and transits for the (N,4,2) laser corners
+        (already in drawing order), reducing the density until it fits in the budget.
+        Returns (edge_points, dwell, transit_points, blank) or None if even the sparsest layout doesn't fit.
+        """
+        edges = np.linalg.norm(np.roll(corners, -1, axis=1) - corners, axis=2)   # (N,4) edge lengths
+        starts = corners[:, 0]
+        transit = np.linalg.norm(starts - np.roll(starts, 1, axis=0), axis=1)   # from the previous box
+        transit_step = max(self.galvo_speed / self.pps, 1.0)
+
+        blank = self.points_for(self.blank_dwell)
+        dwell = self.points_for(self.corner_dwell)
+        transit_points = np.ceil(transit / transit_step).astype(np.intp) + 2 * blank
+
+        step = max(self.draw_speed / self.pps, 1.0)
+        edge_points = np.maximum(np.ceil(edges / step), 1).astype(np.intp)
+
+        def total(edge_points, dwell):
+            return int(edge_points.sum() + (4 * dwell + 1) * len(corners) + transit_points.sum())
+
+        if total(edge_points, dwell) <= budget:
+            return edge_points, dwell, transit_points, blank
+
+        self.reduced += 1
+
+        # spread what's left after the corners and transits over the edges
+        dwell = 1
+        fixed = total(np.zeros_like(edge_points), dwell)
+
+        if fixed + edge_points.size > budget:
+            return None
+
+        edge_points = np.maximum(np.floor(edge_points * (budget - fixed) / edge_points.sum()), 1).astype(np.intp)
+        return edge_points, dwell, transit_points, blank
+
+    def draw(self, boxes, mapping, buffer, color=DEFAULT_COLOR):
+        """
+        Rasterize the outlines of (N,4) camera-space boxes (left, top, right, bottom)
+        into the buffer (replacing its contents).
+
+        Returns the (N,4,2) laser coordinates of the box corners, in drawing order.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        buffer.count = 0
+
+        if len(boxes) == 0:
+            return np.zeros((0, 4, 2), dtype=np.uint16)
+
+        corners = mapping(box_corners(boxes).reshape(-1, 2)).reshape(-1, 4, 2).astype(np.float64)   # tl, tr, br, bl
+
+        # draw the boxes in a short tour, starting near where the beam was left
+        order = plan_order(corners[:, 0], start=self.position)
+        corners = corners[order]
+
+        budget = min(self.budget, buffer.capacity)
+        layout = self.layout(corners, budget)
+
+        while layout is None and len(corners) > 1:
+            corners = corners[:-1]
+            layout = self.layout(corners, budget)
+
+        if len(corners) < len(order):
+            self.truncated += 1
+
+        if layout is None:
+            return np.zeros((0, 4, 2), dtype=np.uint16)
+
+        edge_points, dwell, transit_points, blank = layout
+        N = len(corners)
+
+        # lit points:  per box, 4 edges of (dwell + edge_points) samples and the closing corner
+        counts = np.concatenate([edge_points + dwell, np.ones((N, 1), dtype=np.intp)], axis=1).reshape(-1)
+        segment = np.repeat(np.arange(counts.size), counts)
+        index = np.arange(segment.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        box = segment // 5
+        edge = segment % 5
+        last = edge == 4
+        edge[last] = 0   # the closing point is the start of the first edge again
+
+        samples = np.concatenate([edge_points, np.ones((N, 1), dtype=np.intp)], axis=1).reshape(-1)[segment]
+        t = np.clip((index - dwell) / samples, 0.0, 1.0)
+        t[last] = 0.0
+
+        start = corners[box, edge]
+        end = corners[box, (edge + 1) % 4]
+        lit = start + (end - start) * t[:, None]
+
+        # blanked transit into each box from the end of the previous one (wrapping around)
+        origin = np.roll(corners[:, 0], 1, axis=0)
+        blank_segment = np.repeat(np.arange(N), transit_points)
+        blank_index = np.arange(blank_segment.size) - np.repeat(np.cumsum(transit_points) - transit_points, transit_points)
+        moving = np.maximum(transit_points - 2 * blank, 1)[blank_segment]
+        fraction = np.clip((blank_index - blank + 1) / moving, 0.0, 1.0)
+        transit = origin[blank_segment] + (corners[blank_segment, 0] - origin[blank_segment]) * fraction[:, None]
+
+        # interleave [transit 0, box 0, transit 1, box 1, ...]
+        lit_counts = np.bincount(box, minlength=N)
+        lit_position = np.arange(box.size) + np.cumsum(transit_points)[box]
+        blank_position = np.arange(blank_segment.size) + (np.cumsum(lit_counts) - lit_counts)[blank_segment]
+
+        total = box.size + blank_segment.size
+        view = buffer.view[:total]
+
+        view['x'][lit_position] = np.rint(lit[:,0])
+        view['y'][lit_position] = np.rint(lit[:,1])
+        view['x'][blank_position] = np.rint(transit[:,0])
+        view['y'][blank_position] = np.rint(transit[:,1])
+
+        for n, channel in enumerate(('r', 'g', 'b', 'i')):
+            view[channel][lit_position] = color[n]
+            view[channel][blank_position] = 0
+
+        buffer.count = total
+        self.position = corners[-1, 0]
+
+        return corners.astype(np.uint16)
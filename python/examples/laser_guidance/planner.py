@@ -0,0 +1,220 @@
+#
+# Multi-target scan path planning.
+#
+# Rather than sending a separate frame per target (which makes the DAC flicker
+# between single-point writes), all of the targets for a camera frame are drawn
+# in one combined frame that the DAC loops over.  The targets are ordered to
+# minimize galvo travel (nearest-neighbour tour improved with 2-opt), and the
+# frame is built from:
+#
+#   - blanked transit points, spaced so the galvos can keep up at the given pps
+#   - lit dwell points at each target, sized so it stays lit for dwell_time
+#
+# The frame is written straight into a FrameBuffer with vectorized numpy ops.
+#
+import numpy as np
+
+from .helios import HELIOS_MAX_POINTS, DEFAULT_PPS, DEFAULT_COLOR
+
+
+def tour_length(points, order):
+    """
+    Length of the closed tour visiting the (N,2) points in the given order.
+    """
+    path = points[order]
+    return float(np.linalg.norm(path - np.roll(path, 1, axis=0), axis=1).sum())
+
+
+def nearest_neighbour(distances, start=0):
+    """
+    Greedy tour from the start index, always visiting the closest unvisited point next.
+    """
+    N = len(distances)
+    order = np.empty(N, dtype=np.intp)
+    visited = np.zeros(N, dtype=bool)
+
+    current = start
+
+    for n in range(N):
+        order[n] = current
+        visited[current] = True
+
+        if n < N - 1:
+            remaining = np.where(visited, np.inf, distances[current])
+            current = int(np.argmin(remaining))
+
+    return order
+
+
+def two_opt(distances, order, max_passes=8):
+    """
+    Improve a closed tour by reversing segments while that shortens it.
+    Each pass evaluates all of the candidate reversals for a segment start at once.
+    """
+    order = order.copy()
+    N = len(order)
+
+    if N < 4:
+        return order
+
+    for _ in range(max_passes):
+        improved = False
+
+        for i in range(N - 2):
+            a = order[i]
+            b = order[i + 1]
+            j = np.arange(i + 2, N if i > 0 else N - 1)
+            c = order[j]
+            d = order[(j + 1) % N]
+
+            delta = distances[a, c] + distances[b, d] - distances[a, b] - distances[c, d]
+            best = int(np.argmin(delta))
+
+            if delta[best] < -1e-9:
+                j = j[best]
+                order[i + 1:j + 1] = order[i + 1:j + 1][::-1]
+                improved = True
+
+        if not improved:
+            break
+
+    return order
+
+
+def plan_order(targets, start=None, max_passes=8):
+    """
+    Order the (N,2) targets into a short closed tour.
+
+    Parameters:
+        targets (array) -- (N,2) laser coordinates
+        start (tuple) -- current beam position, the tour starts at the target closest to it
+        max_passes (int) -- maximum number of 2-opt passes
+
+    Returns an array of N indices into targets.
+    """
+    targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+
+    if len(targets) <= 2:
+        order = np.arange(len(targets))
+    else:
+        distances = np.linalg.norm(targets[:, None, :] - targets[None, :, :], axis=-1)
+        order = two_opt(distances, nearest_neighbour(distances), max_passes)
+
+    if start is not None and len(targets) > 1:
+        first = int(np.argmin(np.linalg.norm(targets[order] - np.asarray(start, dtype=np.float64), axis=1)))
+        order = np.roll(order, -first)
+
+    return order
+
+
+class ScanPlanner:
+    """
+    Builds one combined frame that visits all of the targets.
+
+    Usage:
+        planner = ScanPlanner(pps=64000)
+        buffer = writer.acquire()
+        planner.plan(targets, buffer)
+        writer.submit(buffer)
+    """
+    def __init__(self, pps=DEFAULT_PPS, dwell_time=0.0005, galvo_speed=4.0e6,
+                 max_points=HELIOS_MAX_POINTS, max_passes=8):
+        """
+        Parameters:
+            pps (int) -- output rate in points per second
+            dwell_time (float) -- seconds the beam stays lit on each target per frame
+            galvo_speed (float) -- maximum blanked travel speed, in DAC units per second
+            max_points (int) -- maximum number of points in the frame
+            max_passes (int) -- maximum number of 2-opt passes when ordering the targets
+        """
+        self.pps = pps
+        self.dwell_time = dwell_time
+        self.galvo_speed = galvo_speed
+        self.max_points = max_points
+        self.max_passes = max_passes
+        self.position = None   # the last target of the previous frame (where the beam is left)
+
+        self.truncated = 0     # number of frames that didn't fit in max_points
+
+    @property
+    def dwell_points(self):
+        """
+        Number of lit points per target for the dwell time at the current pps.
+        """
+        return max(1, int(round(self.dwell_time * self.pps)))
+
+    @property
+    def step(self):
+        """
+        Maximum distance (in DAC units) between consecutive transit points.
+        """
+        return max(self.galvo_speed / self.pps, 1.0)
+
+    def plan(self, targets, buffer, colors=DEFAULT_COLOR):
+        """
+        Order the targets and write the combined frame into a FrameBuffer.
+
+        Parameters:
+            targets (array) -- (N,2) laser coordinates
+            buffer (FrameBuffer) -- the destination (its contents are replaced)
+            colors (tuple or array) -- (r, g, b, i) for all targets, or an (N,4) array
+
+        Returns the order the targets were visited in.
+        """
+        targets = np.asarray(targets, dtype=np.float64).reshape(-1, 2)
+        buffer.count = 0
+
+        if len(targets) == 0:
+            return np.zeros(0, dtype=np.intp)
+
+        order = plan_order(targets, max_passes=self.max_passes)
+
+        # the frame starts with the transit from its last target to the first, so rotate
+        # the tour to end on the target closest to where the previous frame left the beam
+        if self.position is not None:
+            last = int(np.argmin(np.linalg.norm(targets[order] - self.position, axis=1)))
+            order = np.roll(order, -(last + 1))
+
+        path = targets[order]
+        colors = np.broadcast_to(np.asarray(colors, dtype=np.uint8).reshape(-1, 4), (len(targets), 4))[order]
+
+        # blanked transit from the previous target (wrapping around from the last one)
+        previous = np.roll(path, 1, axis=0)
+        delta = path - previous
+        transit = np.ceil(np.linalg.norm(delta, axis=1) / self.step).astype(np.intp)
+
+        # fit within the point budget by shortening the dwell, then by dropping points
+        capacity = min(self.max_points, buffer.capacity)
+        dwell = self.dwell_points
+
+        if transit.sum() + dwell * len(path) > capacity:
+            dwell = max(1, (capacity - int(transit.sum())) // len(path))
+
+        counts = transit + dwell
+        total = int(counts.sum())
+
+        if total > capacity:
+            self.truncated += 1
+
+        segment = np.repeat(np.arange(len(path)), counts)[:capacity]
+        index = np.arange(len(segment)) - np.repeat(np.cumsum(counts) - counts, counts)[:capacity]
+        is_transit = index < transit[segment]
+
+        fraction = np.ones(len(segment))
+        fraction[is_transit] = (index[is_transit] + 1) / transit[segment[is_transit]]
+
+        points = previous[segment] + delta[segment] * fraction[:, None]
+        np.rint(points, out=points)
+
+        view = buffer.view[:len(segment)]
+
+        view['x'] = points[:,0]
+        view['y'] = points[:,1]
+
+        for n, channel in enumerate(('r', 'g', 'b', 'i')):
+            view[channel] = np.where(is_transit, 0, colors[segment, n])
+
+        buffer.count = len(segment)
+        self.position = path[-1]
+
+        return order
@@ -0,0 +1,177 @@
+#
+# End-to-end latency instrumentation for the guidance loop.
+#
+# net.PrintProfilerTimes() only covers the network, so a SpanRecorder times
+# the rest of the pipeline too:  Capture, Detect, the camera->laser mapping,
+# and on the writer thread the DAC status wait and WriteFrame.  Every span is
+# timed with perf_counter_ns() and kept in a fixed-size ring buffer per stage,
+# from which the p50/p95/p99 are reported periodically.  Optionally the spans
+# are also kept as Chrome trace events, which can be dumped to a JSON file and
+# opened in chrome://tracing or https://ui.perfetto.dev to see where the frame
+# budget goes under load.
+#
+import os
+import json
+import time
+import itertools
+import threading
+import collections
+import contextlib
+
+import numpy as np
+
+
+class SpanHistogram:
+    """
+    Ring buffer of the most recent span durations (in nanoseconds) for one stage.
+    """
+    def __init__(self, capacity=1024):
+        self.samples = np.zeros(capacity, dtype=np.int64)
+        self.counter = itertools.count()   # next() is atomic, so any thread can record
+        self.count = 0
+
+    def add(self, duration):
+        index = next(self.counter)
+        self.samples[index % len(self.samples)] = duration
+        self.count = index + 1
+
+    def percentiles(self, q=(50, 95, 99)):
+        """
+        Return the given percentiles of the recorded durations in milliseconds.
+        """
+        samples = self.samples[:min(self.count, len(self.samples))]
+
+        if len(samples) == 0:
+            return [float('nan')] * len(q)
+
+        return list(np.percentile(samples, q) / 1e6)
+
+
+class SpanRecorder:
+    """
+    Records the durations of the stages of the guidance loop.
+
+    Usage:
+        profiler = SpanRecorder(report_interval=5.0)
+
+        with profiler.span('capture'):
+            img = input.Capture()
+
+        profiler.report()                  # prints the stats every report_interval seconds
+        profiler.dump_trace('trace.json')  # if it was created with trace=True
+    """
+    def __init__(self, capacity=1024, report_interval=5.0, trace=False, max_trace_events=100000):
+        """
+        Parameters:
+            capacity (int) -- number of recent samples kept per stage
+            report_interval (float) -- seconds between the reports printed by report()
+            trace (bool) -- if true, keep the spans as Chrome trace events for dump_trace()
+            max_trace_events (int) -- maximum number of trace events kept (the oldest are dropped)
+        """
+        self.capacity = capacity
+        self.report_interval = report_interval
+        self.stages = {}
+        self.lock = threading.Lock()
+        self.events = collections.deque(maxlen=max_trace_events) if trace else None
+        self.thread_names = {}
+        self.last_report = time.perf_counter()
+
+    def stage(self, name):
+        """
+        Get the histogram for a stage, creating it the first time.
+        """
+        histogram = self.stages.get(name)
+
+        if histogram is None:
+            with self.lock:
+                histogram = self.stages.setdefault(name, SpanHistogram(self.capacity))
+
+        return histogram
+
+    def record(self, name, begin, end=None):
+        """
+        Record a span from its begin and end times (from time.perf_counter_ns()).
+        If end isn't given, the span ends now.
+        """
+        if end is None:
+            end = time.perf_counter_ns()
+
+        self.stage(name).add(end - begin)
+
+        if self.events is not None:
+            tid = threading.get_ident()
+
+            if tid not in self.thread_names:
+                self.thread_names[tid] = threading.current_thread().name
+
+            self.events.append((name, tid, begin, end - begin))
+
+    @contextlib.contextmanager
+    def span(self, name):
+        """
+        Context manager that records the time spent in its block.
+        """
+        begin = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, begin)
+
+    def stats(self):
+        """
+        Return {stage: (count, p50, p95, p99)} with the percentiles in milliseconds.
+        """
+        return {name: (histogram.count, *histogram.percentiles()) for name, histogram in list(self.stages.items())}
+
+    def format(self):
+        lines = [f"{'stage':<16} {'count':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"]
+
+        for name, (count, p50, p95, p99) in self.stats().items():
+            lines.append(f"{name:<16} {count:>8} {p50:>9.3f} {p95:>9.3f} {p99:>9.3f}")
+
+        return '\n'.join(lines)
+
+    def report(self, force=False):
+        """
+        Print the per-stage percentiles if report_interval has elapsed since the last report.
+        Returns true if the report was printed.
+        """
+        now = time.perf_counter()
+
+        if not force and (self.report_interval is None or now - self.last_report < self.report_interval):
+            return False
+
+        self.last_report = now
+        print(self.format())
+        return True
+
+    def trace_events(self):
+        """
+        Return the recorded spans as a list of Chrome trace events (complete 'X' events).
+        """
+        if self.events is None:
+            return []
+
+        pid = os.getpid()
+        events = []
+        threads = set()
+
+        for name, tid, begin, duration in list(self.events):
+            events.append({'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                           'ts': begin / 1000.0, 'dur': duration / 1000.0})
+            threads.add(tid)
+
+        for tid in threads:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                           'args': {'name': self.thread_names.get(tid, str(tid))}})
+
+        return events
+
+    def dump_trace(self, path):
+        """
+        Write the recorded spans to a Chrome trace JSON file.
+        """
+        with open(path, 'w') as file:
+            json.dump({'traceEvents': self.trace_events(), 'displayTimeUnit': 'ms'}, file)
+
+        print(f"wrote {len(self.events or [])} trace events to {path}")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+#
+# Record and replay the guidance loop.
+#
+# A Recorder logs the timestamped detections of every frame, and the points
+# written to each DAC, to a compact binary file.  Replaying it feeds the
+# detections back through the mapping, tracking, targeting and DAC stages
+# (against the simulated DAC), either at the recorded pace or as fast as
+# possible - so every stage after the network can be benchmarked on a PC
+# without a camera, Jetson or laser attached.  The tracker runs on the
+# recorded timestamps, so a replay is deterministic apart from the DAC timing.
+#
+#   $ python3 -m laser_guidance.runner --record=session.lgr /dev/video0
+#   $ python3 -m laser_guidance.recording info session.lgr
+#   $ python3 -m laser_guidance.recording replay session.lgr --speed=0 --mode=corners
+#   $ python3 -m laser_guidance.recording synthesize synthetic.lgr --frames=1000
+#
+# The file starts with the magic 'LGRC' and a uint16 version, followed by
+# records that each have a header of (kind uint8, device uint8, count uint32,
+# timestamp float64) and count rows of DETECTION_DTYPE (kind 'D') or
+# HELIOS_POINT_DTYPE (kind 'P'), all little-endian.
+#
+import sys
+import time
+import struct
+import argparse
+import threading
+import collections
+
+import numpy as np
+
+from .helios import HELIOS_POINT_DTYPE, point_view
+from .mapping import Detection
+
+MAGIC = b'LGRC'
+VERSION = 1
+
+FILE_HEADER = struct.Struct('<4sH')
+RECORD_HEADER = struct.Struct('<BBId')
+
+DETECTIONS = ord('D')
+POINTS = ord('P')
+
+DETECTION_DTYPE = np.dtype([('left', '<f4'),
+                            ('top', '<f4'),
+                            ('right', '<f4'),
+                            ('bottom', '<f4'),
+                            ('confidence', '<f4'),
+                            ('class_id', '<u2')])
+
+Record = collections.namedtuple('Record', ['kind', 'device', 'timestamp', 'data'])
+
+
+class Recorder:
+    """
+    Writes detections and DAC points to a recording file.  It's safe to record
+    from several threads (e.g. the camera loop and the DAC workers).
+
+    Usage:
+        recorder = Recorder('session.lgr')
+        recorder.detections(capture_time, detections)
+        recorder.points(time.perf_counter(), device, points, num_points)
+        recorder.close()
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.lock = threading.Lock()
+
+        self.records = 0   # number of records written
+        self.bytes = FILE_HEADER.size
+
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION))
+
+    def write(self, kind, device, timestamp, data):
+        data = memoryview(np.ascontiguousarray(data)).cast('B')
+        header = RECORD_HEADER.pack(kind, device, len(data) // self.itemsize(kind), timestamp)
+
+        with self.lock:
+            if self.file is None:
+                return
+
+            self.file.write(header)
+            self.file.write(data)
+            self.records += 1
+            self.bytes += len(header) + len(data)
+
+    @staticmethod
+    def itemsize(kind):
+        return DETECTION_DTYPE.itemsize if kind == DETECTIONS else HELIOS_POINT_DTYPE.itemsize
+
+    def detections(self, timestamp, detections):
+        """
+        Record the detectNet detections of a frame captured at the given time.
+        """
+        rows = np.empty(len(detections), dtype=DETECTION_DTYPE)
+
+        for n, detection in enumerate(detections):
+            rows[n] = (detection.Left, detection.Top, detection.Right, detection.Bottom,
+                       detection.Confidence, detection.ClassID)
+
+        self.write(DETECTIONS, 0, timestamp, rows)
+
+    def points(self, timestamp, device, points, num_points):
+        """
+        Record the first num_points of a ctypes HeliosPoint array written to a device.
+        """
+        self.write(POINTS, device, timestamp, point_view(points)[:num_points])
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def read_recording(path):
+    """
+    Read a recording file, returning a list of Records whose data are numpy arrays
+    of DETECTION_DTYPE or HELIOS_POINT_DTYPE.
+    """
+    with open(path, 'rb') as file:
+        buffer = file.read()
+
+    magic, version = FILE_HEADER.unpack_from(buffer, 0)
+
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a laser guidance recording")
+
+    if version != VERSION:
+        raise ValueError(f"{path} has unsupported recording version {version}")
+
+    offset = FILE_HEADER.size
+    records = []
+
+    while offset + RECORD_HEADER.size <= len(buffer):
+        kind, device, count, timestamp = RECORD_HEADER.unpack_from(buffer, offset)
+        offset += RECORD_HEADER.size
+
+        dtype = DETECTION_DTYPE if kind == DETECTIONS else HELIOS_POINT_DTYPE
+        data = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        offset += count * dtype.itemsize
+
+        records.append(Record(kind, device, timestamp, data))
+
+    return records
+
+
+def to_detections(rows):
+    """
+    Convert DETECTION_DTYPE rows back to Detection objects.
+    """
+    return [Detection((row['left'], row['top'], row['right'], row['bottom']), row['confidence'], int(row['class_id']))
+            for row in rows]
+
+
+def replay(records, runner, speed=1.0):
+    """
+    Feed the recorded detections through a GuidanceRunner.
+
+    Parameters:
+        records (list) -- the Records from read_recording()
+        runner (GuidanceRunner) -- the runner to process the detections with
+        speed (float) -- playback speed relative to the recording (0 for as fast as possible)
+
+    Returns the number of frames replayed.
+    """
+    frames = [record for record in records if record.kind == DETECTIONS]
+
+    if not frames:
+        return 0
+
+    start_time = time.perf_counter()
+    first = frames[0].timestamp
+
+    for record in frames:
+        if speed > 0:
+            delay = start_time + (record.timestamp - first) / speed - time.perf_counter()
+
+            if delay > 0:
+                time.sleep(delay)
+
+        runner.process(to_detections(record.data), capture_time=record.timestamp, timestamp=time.perf_counter())
+
+    return len(frames)
+
+
+def summarize(records):
+    """
+    Return a dict with the frame/detection/point counts and duration of a recording.
+    """
+    frames = [record for record in records if record.kind == DETECTIONS]
+    points = [record for record in records if record.kind == POINTS]
+    timestamps = [record.timestamp for record in frames]
+
+    return {'frames': len(frames),
+            'detections': sum(len(record.data) for record in frames),
+            'dac_frames': len(points),
+            'dac_points': sum(len(record.data) for record in points),
+            'devices': len({record.device for record in points}),
+            'duration': (max(timestamps) - min(timestamps)) if timestamps else 0.0}
+
+
+def main(argv=None):
+    from .runner import GuidanceRunner, MAPPINGS, create_mapping
+    from .targeting import STRATEGIES, create_strategy
+    from .tracker import TargetTracker
+    from .profiler import SpanRecorder
+    from .writer import LaserWriter
+    from .safety import ExclusionMask
+    from .simulator import FakeHeliosDAC, SyntheticScene
+
+    parser = argparse.ArgumentParser(description="Inspect, replay or synthesize laser guidance recordings.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    info = subparsers.add_parser("info", help="print the contents of a recording")
+    info.add_argument("recording", type=str, help="path to the recording")
+
+    # options for running the pipeline on the replayed or synthesized detections
+    pipeline = argparse.ArgumentParser(add_help=False)
+
+    pipeline.add_argument("--mode", type=str, default="center", choices=list(STRATEGIES), help="targeting mode")
+    pipeline.add_argument("--mapping", type=str, default="exponential", choices=list(MAPPINGS), help="camera->laser mapping")
+    pipeline.add_argument("--width", type=int, default=800, help="camera width used by the exponential mappings")
+    pipeline.add_argument("--height", type=int, default=600, help="camera height used by the exponential mappings")
+    pipeline.add_argument("--calibration", type=str, default=None, help="camera->laser calibration file")
+    pipeline.add_argument("--predict", action="store_true", help="aim at the tracker's predictions")
+    pipeline.add_argument("--latency", type=float, default=None, help="fixed prediction latency (seconds), for deterministic replays")
+    pipeline.add_argument("--exclusion", type=str, default=None, help="JSON file of audience-safety zones to blank")
+    pipeline.add_argument("--devices", type=int, default=1, help="number of simulated DACs")
+    pipeline.add_argument("--transfer-latency", type=float, default=0.002, help="time the simulated DAC stays busy after a write (seconds)")
+
+    play = subparsers.add_parser("replay", parents=[pipeline], formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                 help="replay the detections through the pipeline against simulated DACs")
+    play.add_argument("recording", type=str, help="path to the recording")
+    play.add_argument("--speed", type=float, default=1.0, help="playback speed (0 for as fast as possible)")
+
+    synthesize = subparsers.add_parser("synthesize", parents=[pipeline], formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+                                       help="record synthetic moving targets run through the pipeline")
+    synthesize.add_argument("recording", type=str, help="path to write the recording to")
+    synthesize.add_argument("--frames", type=int, default=600, help="number of frames")
+    synthesize.add_argument("--targets", type=int, default=3, help="number of moving targets")
+    synthesize.add_argument("--fps", type=float, default=30.0, help="camera frame rate")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        for key, value in summarize(read_recording(args.recording)).items():
+            print(f"{key:>12}:  {value:.3f}" if isinstance(value, float) else f"{key:>12}:  {value}")
+        return
+
+    profiler = SpanRecorder(report_interval=None)
+    recorder = Recorder(args.recording) if args.command == "synthesize" else None
+
+    mapping = create_mapping(args.mapping, args.width, args.height, args.calibration)
+    mask = ExclusionMask.load(args.exclusion, mapping) if args.exclusion else None
+
+    writer = LaserWriter(FakeHeliosDAC(num_devices=args.devices, transfer_latency=args.transfer_latency),
+                         profiler=profiler, recorder=recorder, mask=mask)
+    writer.start()
+
+    runner = GuidanceRunner(strategy=create_strategy(args.mode),
+                            mapping=mapping,
+                            writer=writer,
+                            tracker=TargetTracker() if args.predict else None,
+                            latency=args.latency,
+                            profiler=profiler,
+                            recorder=recorder)
+
+    time_begin = time.perf_counter()
+
+    if args.command == "replay":
+        records = read_recording(args.recording)
+        frames = replay(records, runner, args.speed)
+    else:
+        scene = SyntheticScene(num_targets=args.targets, width=args.width, height=args.height)
+        frames = args.frames
+
+        for frame in range(frames):
+            capture_time = time.perf_counter()
+            runner.process(scene.detections(frame / args.fps), capture_time)
+            time.sleep(max(1.0 / args.fps - (time.perf_counter() - capture_time), 0))
+
+    elapsed = time.perf_counter() - time_begin
+    time.sleep(0.05)   # let the DAC workers finish the last frame
+    writer.stop()
+
+    print(profiler.format())
+    print(f"{frames} frames in {elapsed:.2f} s ({frames / elapsed:.0f} FPS), {writer.frames_written} laser frames written, "
+          f"{writer.frames_dropped} dropped")
+
+    if mask is not None:
+        print(f"blanked {mask.blanked} points in exclusion zones, in {mask.frames_blanked} of {mask.frames} frames")
+
+    if recorder is not None:
+        recorder.close()
+        print(f"recorded {recorder.records} records ({recorder.bytes} bytes) to {args.recording}")
+    else:
+        recorded = summarize(records)
+        print(f"recording had {recorded['frames']} frames over {recorded['duration']:.2f} s, "
+              f"{recorded['dac_frames']} laser frames written")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#
+# Region-of-interest detection around the active tracks.
+#
+# Once the targets are being tracked, most of each camera frame is background
+# that net.Detect() doesn't need to look at.  ROIDetector runs the detector on
+# the full frame every N frames, and in between only on padded windows around
+# the tracks' predicted boxes, mapping the detections in those crops back to
+# frame coordinates.  It falls back to the full frame whenever a track is lost,
+# there are no established tracks, or the windows would cover most of the frame.
+#
+# The detector is any callable detector(image, roi) that returns detections in
+# the coordinates of the (left, top, right, bottom) roi, or of the full image
+# when roi is None.  CropDetector does that for a detectNet with cudaCrop().
+#
+import numpy as np
+
+from .mapping import Detection
+
+
+def pad_regions(boxes, padding, min_size, width, height):
+    """
+    Grow (N,4) boxes by padding times their size on each side (and to at least min_size),
+    clip them to the image, and round them out to integer (left, top, right, bottom).
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    center = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+    size = np.maximum((boxes[:, 2:] - boxes[:, :2]) * (1 + 2 * padding), min_size)
+
+    regions = np.concatenate([center - size * 0.5, center + size * 0.5], axis=1)
+    regions = np.concatenate([np.floor(regions[:, :2]), np.ceil(regions[:, 2:])], axis=1)
+
+    return np.clip(regions, 0, [width, height, width, height]).astype(np.int64)
+
+
+def merge_regions(regions):
+    """
+    Replace overlapping (N,4) regions with their bounding boxes until none overlap,
+    so that no part of the image is detected twice.
+    """
+    regions = [tuple(region) for region in np.asarray(regions).reshape(-1, 4)]
+    merged = True
+
+    while merged and len(regions) > 1:
+        merged = False
+
+        for i in range(len(regions)):
+            for j in range(i + 1, len(regions)):
+                a, b = regions[i], regions[j]
+
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    regions[i] = (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+                    del regions[j]
+                    merged = True
+                    break
+
+            if merged:
+                break
+
+    return np.array(regions, dtype=np.int64).reshape(-1, 4)
+
+
+class ROIDetector:
+    """
+    Runs a detector on crops around the tracked targets, with periodic full-frame passes.
+
+    Usage:
+        tracker = TargetTracker()
+        detect = ROIDetector(CropDetector(net), tracker, full_frame_interval=10)
+
+        detections = detect(img, capture_time)
+        tracker.update(detection_boxes(detections), timestamp=capture_time)
+    """
+    def __init__(self, detector, tracker, full_frame_interval=10, padding=0.5, min_size=(128, 128),
+                 max_regions=4, max_area=0.6):
+        """
+        Parameters:
+            detector (callable) -- detector(image, roi) returning the detections in the roi
+            tracker (TargetTracker) -- the tracker whose tracks the crops are placed around
+                                       (it has to be updated with the detections by the caller)
+            full_frame_interval (int) -- run a full-frame detection at least every N frames
+            padding (float) -- padding added on each side of a track box, relative to its size
+            min_size (tuple) -- minimum (width, height) of a crop in pixels
+            max_regions (int) -- use the full frame if there would be more crops than this
+            max_area (float) -- use the full frame if the crops would cover more than this fraction of it
+        """
+        self.detector = detector
+        self.tracker = tracker
+        self.full_frame_interval = full_frame_interval
+        self.padding = padding
+        self.min_size = np.asarray(min_size, dtype=np.float64)
+        self.max_regions = max_regions
+        self.max_area = max_area
+
+        self.since_full_frame = 0
+        self.frames = 0           # number of frames processed
+        self.full_frames = 0      # number of full-frame detections
+        self.crops = 0            # number of crops detected
+        self.crop_area = 0.0      # sum of the fraction of the frame covered by the crops
+
+    def regions(self, width, height, timestamp=None):
+        """
+        Return the (K,4) regions to detect in for the next frame, or None for the full frame.
+        """
+        tracker = self.tracker
+
+        if self.since_full_frame + 1 >= self.full_frame_interval or len(tracker) == 0:
+            return None
+
+        # fall back to the full frame when any established track was lost
+        if not tracker.confirmed.any() or (tracker.misses[tracker.confirmed] > 0).any():
+            return None
+
+        _, boxes, _ = tracker.predict_boxes(timestamp)
+        regions = merge_regions(pad_regions(boxes, self.padding, self.min_size, width, height))
+
+        if len(regions) == 0 or len(regions) > self.max_regions:
+            return None
+
+        area = np.prod(regions[:, 2:] - regions[:, :2], axis=1).sum() / float(width * height)
+
+        if area > self.max_area:
+            return None
+
+        return regions
+
+    def __call__(self, image, timestamp=None):
+        """
+        Detect the objects in the image, either in the full frame or in the crops around the tracks.
+        Returns a list of detections in the coordinates of the full frame.
+        """
+        self.frames += 1
+        regions = self.regions(image.width, image.height, timestamp)
+
+        if regions is None:
+            self.since_full_frame = 0
+            self.full_frames += 1
+            return self.detector(image, None)
+
+        self.since_full_frame += 1
+        self.crops += len(regions)
+        self.crop_area += np.prod(regions[:, 2:] - regions[:, :2], axis=1).sum() / float(image.width * image.height)
+
+        detections = []
+
+        for left, top, right, bottom in regions:
+            for detection in self.detector(image, (left, top, right, bottom)):
+                detections.append(Detection((detection.Left + left, detection.Top + top,
+                                             detection.Right + left, detection.Bottom + top),
+                                            detection.Confidence, detection.ClassID))
+
+        return detections
+
+    @property
+    def mean_crop_area(self):
+        """
+        Average fraction of the frame covered by the crops, on the frames that used them.
+        """
+        crop_frames = self.frames - self.full_frames
+        return self.crop_area / crop_frames if crop_frames else 0.0
+
+
+class CropDetector:
+    """
+    Detector for ROIDetector that runs a detectNet on the full image, or on a crop
+    of it copied with cudaCrop() into a buffer that gets reused for that crop size.
+    """
+    def __init__(self, net, overlay="box,labels,conf"):
+        """
+        Parameters:
+            net (detectNet) -- the detection network
+            overlay (string) -- overlay flags for the full-frame detections (crops aren't overlaid)
+        """
+        self.net = net
+        self.overlay = overlay
+        self.buffers = {}
+
+    def __call__(self, image, roi=None):
+        if roi is None:
+            return self.net.Detect(image, overlay=self.overlay)
+
+        from jetson_utils import cudaAllocMapped, cudaCrop
+
+        left, top, right, bottom = (int(v) for v in roi)
+        size = (right - left, bottom - top, image.format)
+        crop = self.buffers.get(size)
+
+        if crop is None:
+            crop = self.buffers[size] = cudaAllocMapped(width=size[0], height=size[1], format=image.format)
+
+        cudaCrop(image, crop, (left, top, right, bottom))
+        return self.net.Detect(crop, overlay='none')
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+#
+# Unified laser guidance runner.
+#
+# One detection loop for all of the targeting modes, which used to be five
+# separate detectnet_* scripts:
+#
+#   $ python3 -m laser_guidance.runner --mode=center /dev/video0
+#   $ python3 -m laser_guidance.runner --mode=corners --mapping=exponential csi://0
+#   $ python3 -m laser_guidance.runner --mode=confidence --calibration=laser.json /dev/video0
+#
+# The camera thread runs Capture -> Detect -> targeting strategy -> mapping
+# (with the next frame being captured in the background by a CapturePrefetcher),
+# and posts the finished frame to the LaserWriter thread, which waits on and
+# writes to the DAC(s) - so buffering, tracking, profiling and any other work
+# on the pipeline applies to every mode.
+#
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+from .helios import DEFAULT_LIBRARY, DEFAULT_PPS, DEFAULT_FLAGS
+from .mapping import LaserMapping, LinearMapping, detection_boxes
+from .calibration import LUTMapping
+from .targeting import STRATEGIES, create_strategy
+from .colormap import COLORMAPS, create_colormap
+from .tracker import TargetTracker
+from .selection import TargetSelector
+from .governor import FrameGovernor
+from .roi import ROIDetector, CropDetector
+from .capture import CapturePrefetcher
+from .display import SideChannel, draw_boxes
+from .profiler import SpanRecorder
+from .writer import LaserWriter, LaserTransform
+from .safety import ExclusionMask
+from .feedback import BeamFeedback, CorrectionGrid
+from .simulator import FakeHeliosDAC
+from .recording import Recorder
+
+
+# hand-tuned camera->laser mappings from the original scripts (used when there's no calibration)
+MAPPINGS = {
+    'exponential': lambda width, height: LaserMapping(width, height, exponent=(0.93, 0.5), offset=(100, -400)),
+    'exponential-raw': lambda width, height: LaserMapping(width, height, exponent=(0.93, 0.5), offset=(0, 0), flip_y=False),
+    'linear': lambda width, height: LinearMapping(scale=(1.6 * 3.415, -5.68), offset=(-1600, 4096)),
+    'balloon': lambda width, height: LinearMapping(scale=(5.4, -6.0), offset=(-1300, 3900)),
+}
+
+
+def create_mapping(name, width=800, height=600, calibration=None):
+    """
+    Create the camera->laser mapping from a calibration file if one was given,
+    otherwise from one of the named hand-tuned MAPPINGS.
+    """
+    if calibration:
+        return LUTMapping(calibration)
+
+    if name not in MAPPINGS:
+        raise ValueError(f"unknown mapping '{name}' (valid mappings are: {', '.join(MAPPINGS)})")
+
+    return MAPPINGS[name](width, height)
+
+
+class GuidanceRunner:
+    """
+    Turns the detections from each camera frame into a laser frame and posts it to the writer.
+
+    Usage:
+        runner = GuidanceRunner(create_strategy('center'), mapping, writer)
+
+        while True:
+            img = input.Capture()
+            runner.process(net.Detect(img), capture_time=time.perf_counter())
+    """
+    def __init__(self, strategy, mapping, writer, tracker=None, predict=True, latency=None,
+                 selector=None, governor=None, profiler=None, recorder=None, blank=False, verbose=False):
+        """
+        Parameters:
+            strategy (TargetingStrategy) -- what to draw for the detections
+            mapping (Mapping) -- camera->laser coordinate mapping
+            writer (LaserWriter) -- the started writer thread the frames are posted to
+            tracker (TargetTracker) -- if set, it gets updated with the detections of every frame
+            predict (bool) -- if true (and there's a tracker), aim at the latency-compensated
+                              track predictions instead of the detections
+            latency (float) -- seconds to predict ahead (defaults to the writer's measured latency)
+            selector (TargetSelector) -- if set, only the targets it picks from each frame are aimed at
+            governor (FrameGovernor) -- if set, the targets are handed to it to draw at its fixed
+                                        rate, instead of building a laser frame for each camera frame
+            profiler (SpanRecorder) -- if set, the map/plan stages are recorded to it
+            recorder (Recorder) -- if set, the detections of every frame are recorded to it
+            blank (bool) -- if true, blank the laser when there are no targets
+            verbose (bool) -- if true, print the targets of each frame
+        """
+        self.strategy = strategy
+        self.mapping = mapping
+        self.writer = writer
+        self.tracker = tracker
+        self.predict = predict
+        self.latency = latency
+        self.selector = selector
+        self.governor = governor
+        self.recorder = recorder
+        self.profiler = profiler if profiler is not None else SpanRecorder(report_interval=None)
+        self.blank = blank
+        self.verbose = verbose
+
+        self.aim_points = np.zeros((0, 2))   # camera points of the targets aimed at last frame
+
+        self.frames = 0       # number of camera frames processed
+        self.submitted = 0    # number of laser frames posted to the writer
+
+    def targets(self, detections, capture_time):
+        """
+        Get the (N,4) boxes and (N,) confidences to target from the detections
+        (or from the tracker's predictions of where they'll be), and the (N,) track
+        IDs and ages when there's a tracker (or None).
+        """
+        boxes = detection_boxes(detections)
+        confidence = np.array([detection.Confidence for detection in detections], dtype=np.float64)
+        ids = age = None
+
+        if self.tracker is not None:
+            ids = self.tracker.update(boxes, confidence, capture_time)
+
+            if self.predict:
+                latency = self.writer.latency.value if self.latency is None else self.latency
+                ids, boxes, confidence = self.tracker.predict_boxes(capture_time, latency=latency)
+
+            age = self.tracker.age[np.searchsorted(self.tracker.ids, ids)]
+
+        return boxes, confidence, ids, age
+
+    def select(self, boxes, confidence, ids, age, timestamp):
+        """
+        Keep the boxes, confidences and track IDs of the targets picked by the selector.
+        """
+        if len(boxes) == 0:
+            self.selector.select(np.zeros((0, 2)), boxes, confidence)
+            return boxes, confidence, ids
+
+        centers = self.mapping((boxes[:, :2] + boxes[:, 2:]) * 0.5)
+        keep = self.selector.select(centers, boxes, confidence, ids=ids, age=age,
+                                    cost=self.strategy.cost(boxes, self.mapping),
+                                    position=self.strategy.position, timestamp=timestamp)
+
+        return boxes[keep], confidence[keep], None if ids is None else ids[keep]
+
+    def process(self, detections, capture_time=None, timestamp=None):
+        """
+        Build the laser frame for a list of detectNet detections and post it to the writer.
+
+        Parameters:
+            detections (list) -- detectNet.Detection objects (or anything with the same attributes)
+            capture_time (float) -- time the frame was captured, which the tracker runs on
+                                    (defaults to time.perf_counter())
+            timestamp (float) -- time.perf_counter() time of the capture, used to measure the
+                                 output latency (defaults to capture_time - it only differs on replay)
+
+        Returns the (M,2) laser coordinates of the targets.
+        """
+        capture_time = time.perf_counter() if capture_time is None else capture_time
+        timestamp = capture_time if timestamp is None else timestamp
+
+        if self.recorder is not None:
+            self.recorder.detections(capture_time, detections)
+
+        self.mapping.poll()   # pick up a new calibration if the file changed
+        self.frames += 1
+
+        if self.writer.mask is not None:
+            self.writer.mask.follow(self.mapping)   # move the camera space exclusion zones with the mapping
+
+        with self.profiler.span('map'):
+            boxes, confidence, ids, age = self.targets(detections, capture_time)
+
+        if self.selector is not None:
+            with self.profiler.span('select'):
+                boxes, confidence, ids = self.select(boxes, confidence, ids, age, capture_time)
+
+        # the camera points the strategy aims at (the corners, or only the centers it keeps),
+        # which BeamFeedback looks for the dots around
+        self.aim_points = self.strategy.targets(boxes, confidence)[0]
+
+        if self.governor is not None:
+            # the governor draws the frames at its own rate
+            self.governor.update(boxes, confidence, ids, timestamp)
+            frame = None
+            coords = self.mapping(self.aim_points)
+        else:
+            with self.profiler.span('plan'):
+                frame = self.writer.acquire()
+                frame.timestamp = timestamp
+                coords = self.strategy(boxes, confidence, self.mapping, frame)
+
+        if self.verbose:
+            for x, y in coords:
+                print(f"target:  laser x {x}  y {y}")
+
+        if frame is None:
+            return coords
+
+        if frame.count == 0 and self.blank:
+            frame.view[0] = (100, 100, 0, 0, 0, 0)   # blanked point (like detectnet_balloon.py wrote)
+            frame.count = 1
+
+        if frame.count > 0:
+            self.writer.submit(frame)
+            self.submitted += 1
+        else:
+            frame.release()
+
+        return coords
+
+
+def build_parser(**defaults):
+    """
+    Create the command-line parser, with the given argument defaults (for the mode presets).
+    """
+    parser = argparse.ArgumentParser(description="Aim a laser at the objects detected in a live camera stream.",
+                                     formatter_class=argparse.RawTextHelpFormatter)
+
+    parser.add_argument("input", type=str, default="/dev/video0", nargs='?', help="URI of the input stream")
+    parser.add_argument("output", type=str, default="", nargs='?', help="URI of the output stream")
+    parser.add_argument("--network", type=str, default="ssd-mobilenet-v2", help="pre-trained model to load (see below for options)")
+    parser.add_argument("--model", type=str, default=None, help="path to a custom detection model (e.g. balloon_detector.onnx)")
+    parser.add_argument("--labels", type=str, default="", help="path to the labels of the custom model")
+    parser.add_argument("--input-blob", type=str, default="input_0", help="input layer name of the custom model")
+    parser.add_argument("--output-cvg", type=str, default="scores", help="coverage layer name of the custom model")
+    parser.add_argument("--output-bbox", type=str, default="boxes", help="bounding box layer name of the custom model")
+    parser.add_argument("--overlay", type=str, default="box,labels,conf", help="detection overlay flags (e.g. --overlay=box,labels,conf)\nvalid combinations are:  'box', 'labels', 'conf', 'none'")
+    parser.add_argument("--threshold", type=float, default=0.5, help="minimum detection threshold to use")
+    parser.add_argument("--no-prefetch", dest="prefetch", action="store_false", help="capture each frame inline instead of on a background thread\nwhile the previous frame is detected")
+
+    parser.add_argument("--mode", type=str, default="center", choices=list(STRATEGIES), help="targeting mode:  aim at the box centers, corners, trace\nthe box outlines, or aim at the centers colored by confidence")
+    parser.add_argument("--mapping", type=str, default="exponential", choices=list(MAPPINGS), help="hand-tuned camera->laser mapping to use without --calibration")
+    parser.add_argument("--width", type=int, default=800, help="camera width used by the exponential mappings")
+    parser.add_argument("--height", type=int, default=600, help="camera height used by the exponential mappings")
+    parser.add_argument("--calibration", type=str, default=None, help="camera->laser calibration file (see laser_guidance/calibration.py),\nreloaded automatically when it changes")
+    parser.add_argument("--colormap", type=str, default="steps", choices=list(COLORMAPS), help="confidence->color table of --mode=confidence:  the balloon\nthresholds (red < 0.7 <= blue < 0.8 <= green) or a red-yellow-green gradient")
+    parser.add_argument("--max-intensity", type=int, default=255, help="safety cap on every color channel of --mode=confidence")
+    parser.add_argument("--x-range", type=float, nargs=2, default=None, help="only target detections with min < center x < max")
+
+    parser.add_argument("--dac", type=str, default=DEFAULT_LIBRARY, help="path to libHeliosDacAPI.so")
+    parser.add_argument("--simulate", action="store_true", help="write to a simulated DAC instead of the Helios library")
+    parser.add_argument("--pps", type=int, default=DEFAULT_PPS, help="laser output rate in points per second")
+    parser.add_argument("--flags", type=int, default=DEFAULT_FLAGS, help="flags passed to WriteFrame()")
+    parser.add_argument("--transforms", type=str, default=None, help="JSON file of {device: 3x3 matrix} transforms for DACs whose\nprojectors are aimed differently from the calibrated one")
+    parser.add_argument("--blank", action="store_true", help="blank the laser when there are no targets")
+    parser.add_argument("--refresh-rate", type=float, default=0, help="write the laser frames at this fixed rate (Hz), gliding the targets between\ndetections, instead of once per camera frame (0 for once per camera frame)")
+    parser.add_argument("--blank-timeout", type=float, default=0.5, help="with --refresh-rate, blank the laser after this many seconds without targets")
+    parser.add_argument("--exclusion", type=str, default=None, help="JSON file of audience-safety zones (polygons in camera or laser\ncoordinates, see laser_guidance/safety.py) where the laser is always blanked")
+    parser.add_argument("--feedback", type=str, default=None, help="correct the mapping from the laser dot seen in the camera frames, learning a\ngrid of offsets that is loaded from and saved to this JSON file")
+    parser.add_argument("--feedback-window", type=int, default=48, help="half size in pixels of the window searched for the laser dot around each target")
+
+    parser.add_argument("--predict", action="store_true", help="track the detections and aim where they will be once the\nmeasured capture->laser latency has elapsed")
+    parser.add_argument("--max-targets", type=int, default=0, help="aim at no more than the K best targets per frame, ranked by confidence,\nsize, track age and distance from the beam (0 for all)")
+    parser.add_argument("--point-budget", type=int, default=0, help="only aim at the best targets whose points fit in this budget (0 for no limit)")
+    parser.add_argument("--min-dwell", type=float, default=0.5, help="seconds a selected target is held before --max-targets/--point-budget\ncan switch to another")
+    parser.add_argument("--roi", type=int, default=0, help="detect only in crops around the tracked targets, with a full-frame\ndetection every N frames (and whenever a track is lost)")
+    parser.add_argument("--roi-padding", type=float, default=0.5, help="padding around each track in the --roi crops, relative to its size")
+    parser.add_argument("--profile", type=float, default=0, help="print the p50/p95/p99 latency of each pipeline stage every N seconds")
+    parser.add_argument("--trace", type=str, default=None, help="write the pipeline stages to this Chrome trace JSON file on exit")
+    parser.add_argument("--record", type=str, default=None, help="record the detections and DAC points to this file, for replaying\nwith laser_guidance.recording")
+    parser.add_argument("--verbose", action="store_true", help="print the laser coordinates of the targets")
+    parser.add_argument("--production", action="store_true", help="headless mode for deployed rigs:  no detection overlay, rendering,\nstatus, profiler times or target printing (see --display-interval)")
+    parser.add_argument("--display-interval", type=int, default=0, help="with --production, still overlay, render and log every Nth frame\n(0 for never)")
+
+    parser.set_defaults(**defaults)
+    return parser
+
+
+def main(argv=None, **defaults):
+    """
+    Run the guidance loop until EOS.  The keyword arguments override the defaults
+    of the command-line options (this is how the detectnet_* scripts select their mode).
+    """
+    from jetson_inference import detectNet
+    from jetson_utils import videoSource, videoOutput, Log
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    parser = build_parser(**defaults)
+    parser.epilog = detectNet.Usage() + videoSource.Usage() + videoOutput.Usage() + Log.Usage()
+    args = parser.parse_known_args(argv)[0]
+
+    is_headless = ["--headless"] if sys.argv[0].find('console.py') != -1 else []
+
+    # create video sources and outputs
+    input = videoSource(args.input, argv=sys.argv)
+
+    if args.prefetch:
+        input = CapturePrefetcher(input)
+
+    # in production, the output is only opened for the low-rate side channel
+    production = args.production
+    overlay = 'none' if production else args.overlay
+
+    if not production or args.display_interval > 0:
+        output = videoOutput(args.output, argv=sys.argv + is_headless)
+    else:
+        output = None
+
+    # load the object detection network
+    if args.model:
+        net = detectNet(model=args.model, labels=args.labels, input_blob=args.input_blob,
+                        output_cvg=args.output_cvg, output_bbox=args.output_bbox, threshold=args.threshold)
+    else:
+        net = detectNet(args.network, sys.argv, args.threshold)
+
+    profiler = SpanRecorder(report_interval=args.profile or None, trace=args.trace is not None)
+    recorder = Recorder(args.record) if args.record else None
+
+    mapping = create_mapping(args.mapping, args.width, args.height, args.calibration)
+
+    # closed-loop correction of the mapping, continuing from the saved grid
+    if args.feedback:
+        from jetson_utils import cudaToNumpy
+        grid = CorrectionGrid.load(args.feedback) if os.path.exists(args.feedback) else None
+        feedback = BeamFeedback(mapping, input.GetWidth(), input.GetHeight(), grid=grid, window=args.feedback_window)
+        mapping = feedback.mapping
+    else:
+        feedback = None
+
+    # the camera space zones are mapped through the corrected mapping (and follow it, see GuidanceRunner)
+    mask = ExclusionMask.load(args.exclusion, mapping) if args.exclusion else None
+
+    # the laser writer thread owns the DAC(s)
+    writer = LaserWriter(FakeHeliosDAC() if args.simulate else args.dac, pps=args.pps,
+                         flags=args.flags, profiler=profiler, recorder=recorder, mask=mask,
+                         transforms=LaserTransform.load(args.transforms) if args.transforms else None)
+    writer.start()
+
+    strategy_args = {}
+
+    if args.mode == 'confidence':
+        strategy_args = {'x_range': args.x_range, 'lut': create_colormap(args.colormap, args.max_intensity)}
+
+    # only aim at the best targets when there are too many
+    if args.max_targets > 0 or args.point_budget > 0:
+        selector = TargetSelector(args.max_targets, args.point_budget, args.min_dwell)
+    else:
+        selector = None
+
+    # the tracker is needed to predict the targets, to place the ROI crops,
+    # and for the track ages and IDs that the selector holds targets by
+    tracker = TargetTracker() if args.predict or args.roi > 0 or selector is not None else None
+
+    if args.roi > 0:
+        detector = ROIDetector(CropDetector(net, overlay), tracker, full_frame_interval=args.roi,
+                               padding=args.roi_padding)
+    else:
+        detector = lambda img, timestamp: net.Detect(img, overlay=overlay)
+
+    # display and logging - every frame normally (with the overlay drawn by the network),
+    # every --display-interval frames in production
+    display = SideChannel(output, interval=args.display_interval if production else 1,
+                          overlay=draw_boxes if production else None,
+                          status=lambda: f"{args.network} | Network {net.GetNetworkFPS():.0f} FPS",
+                          log=lambda detections: net.PrintProfilerTimes())
+
+    strategy = create_strategy(args.mode, pps=args.pps, **strategy_args)
+
+    # draw the targets at a fixed rate, independent of the camera
+    if args.refresh_rate > 0:
+        governor = FrameGovernor(writer, strategy, mapping, rate=args.refresh_rate,
+                                 timeout=args.blank_timeout, blank=args.blank)
+        governor.start()
+    else:
+        governor = None
+
+    runner = GuidanceRunner(strategy=strategy,
+                            mapping=mapping,
+                            writer=writer,
+                            tracker=tracker,
+                            predict=args.predict,
+                            selector=selector,
+                            governor=governor,
+                            profiler=profiler,
+                            recorder=recorder,
+                            blank=args.blank,
+                            verbose=args.verbose and not production)
+
+    try:
+        # process frames until EOS or the user exits
+        while True:
+            with profiler.span('capture'):
+                img = input.Capture()
+
+            capture_time = input.timestamp if args.prefetch else time.perf_counter()
+
+            if img is None:  # timeout
+                continue
+
+            # look for the beam before the detection overlay is drawn over it
+            if feedback is not None:
+                with profiler.span('feedback'):
+                    feedback.observe(cudaToNumpy(img), capture_time)
+
+            with profiler.span('detect'):
+                detections = detector(img, capture_time)
+
+            runner.process(detections, capture_time)
+
+            if feedback is not None:
+                feedback.aimed(runner.aim_points, capture_time + writer.latency.value)
+
+            # render the image and print out performance info
+            display(img, detections)
+            profiler.report()
+
+            # exit on input/output EOS
+            if not input.IsStreaming() or not display.IsStreaming():
+                break
+    finally:
+        if governor is not None:
+            governor.stop()
+
+        writer.stop()
+
+        if args.prefetch:
+            input.Close()
+            print(f"captured {input.captured} frames, {input.dropped} dropped before detection")
+
+        if feedback is not None:
+            feedback.grid.save(args.feedback)
+            print(f"found the laser dot {feedback.observations} times ({feedback.misses} misses), "
+                  f"mean error {feedback.error or 0:.1f} pixels")
+
+        if mask is not None:
+            print(f"blanked {mask.blanked} points in exclusion zones, in {mask.frames_blanked} of {mask.frames} frames "
+                  f"(the camera space zones moved with the mapping {mask.rebuilds} times)")
+
+        if args.trace:
+            profiler.dump_trace(args.trace)
+
+        if recorder is not None:
+            recorder.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+#
+# Audience-safety exclusion zones.
+#
+# Nothing between the detector and the DAC knew where people are standing:
+# any detection that mapped there became a lit point.  An ExclusionMask is a
+# bitmap over the DAC coordinate range, rasterized from polygons given in
+# laser coordinates or in camera pixels (which are mapped to the laser first).
+# LaserWriter.submit() checks every point of every frame against it with one
+# array index - a gather over the whole frame - and blanks the lit points that
+# land inside a zone, counting them.
+#
+# The zones are loaded from a JSON file like:
+#
+#   {"margin": 32,
+#    "zones": [{"space": "camera", "polygon": [[0, 500], [1280, 500], [1280, 720], [0, 720]]},
+#              {"space": "laser", "polygon": [[0, 0], [600, 0], [600, 4095], [0, 4095]]}]}
+#
+# where margin grows every zone by that many DAC units on each side.
+#
+# The camera space zones are only where the mapping put them when they were
+# rasterized, and the mapping moves:  a new calibration gets loaded, or the
+# beam feedback shifts its correction grid.  follow() maps the zone edges
+# again every frame (a few hundred points, well under a millisecond) and when
+# they have drifted by more than the tolerance, rasterizes the zones again in
+# a background thread - that takes about 100 ms at the full DAC resolution -
+# which swaps in the new bitmap when it's done (like LUTMapping's reloads).
+#
+# Zones are in the laser space of the calibrated projector.  The per-device
+# transforms are applied after the mask, so each DeviceWorker also maps its
+# transformed points back through the inverse transform and blanks any that
+# rounding or clipping to the DAC range put inside a zone.
+#
+import json
+import threading
+
+import numpy as np
+
+from .helios import HELIOS_MAX_COORD
+
+
+def fill_polygon(vertices, shape, cell=1):
+    """
+    Rasterize a polygon (even-odd rule) into a bool bitmap of the given (rows, columns) shape,
+    whose cells are cell DAC units wide, marking the cells whose centers are inside of it.
+    """
+    rows, columns = shape
+    vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2) / cell
+    x0, y0 = vertices[:,0], vertices[:,1]
+    x1, y1 = np.roll(x0, -1), np.roll(y0, -1)
+
+    # the rows whose centers (row + 0.5) each non-horizontal edge crosses
+    begin = np.clip(np.ceil(np.minimum(y0, y1) - 0.5), 0, rows).astype(np.intp)
+    end = np.clip(np.ceil(np.maximum(y0, y1) - 0.5), 0, rows).astype(np.intp)
+    counts = np.where(y0 != y1, end - begin, 0)
+
+    edge = np.repeat(np.arange(len(vertices)), counts)
+    row = begin[edge] + np.arange(edge.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    # toggle the inside/outside parity at the first cell center right of each crossing
+    x = x0[edge] + (row + 0.5 - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+    column = np.clip(np.ceil(x - 0.5), 0, columns).astype(np.intp)
+
+    toggles = np.zeros((rows, columns + 1), dtype=np.uint8)
+    np.add.at(toggles, (row, column), 1)
+
+    return np.bitwise_xor.accumulate(toggles & 1, axis=1)[:, :columns].astype(bool)
+
+
+def dilate(bitmap, radius):
+    """
+    Grow the set cells of a bool bitmap by radius cells in each direction (a square dilation).
+    """
+    if radius <= 0:
+        return bitmap
+
+    for axis in (0, 1):
+        counts = np.cumsum(bitmap, axis=axis, dtype=np.int32)
+        counts = np.concatenate([np.zeros_like(counts.take([0], axis=axis)), counts], axis=axis)
+        size = bitmap.shape[axis]
+
+        upper = np.minimum(np.arange(size) + radius + 1, size)
+        lower = np.maximum(np.arange(size) - radius, 0)
+
+        bitmap = (counts.take(upper, axis=axis) - counts.take(lower, axis=axis)) > 0
+
+    return bitmap
+
+
+class ExclusionMask:
+    """
+    Bitmap of the DAC coordinates that must never be lit.
+
+    Usage:
+        mask = ExclusionMask.load('zones.json', mapping)
+        writer = LaserWriter(library, mask=mask)    # or mask.apply(buffer.view[:buffer.count])
+
+        mask.follow(mapping)    # every frame, if the mapping can change
+        print(mask.blanked)
+    """
+    def __init__(self, shift=0, tolerance=4.0):
+        """
+        Parameters:
+            shift (int) -- each bitmap cell covers 2**shift DAC units in x and y
+                           (0 for the full 4096x4096 DAC resolution)
+            tolerance (float) -- DAC units the camera space zones may drift with the mapping
+                                 before follow() rasterizes them again (keep it below the margin)
+        """
+        self.shift = shift
+        self.size = (HELIOS_MAX_COORD + 1) >> shift
+        self.bitmap = np.zeros((self.size, self.size), dtype=bool)
+        self.active = False   # false until a zone was added, so an empty mask costs nothing
+        self.tolerance = tolerance
+
+        self.zones = []     # (laser vertices, margin) of the zones given in laser space
+        self.camera = []    # (camera edge samples, laser vertices, margin) of the zones given in camera space
+
+        self.frames = 0           # number of frames checked
+        self.frames_blanked = 0   # number of frames that had points blanked
+        self.blanked = 0          # number of lit points blanked
+        self.rebuilds = 0         # number of times the camera space zones were rasterized again
+        self.builder = None       # thread rasterizing the moved zones in the background
+
+    def rasterize(self, bitmap, vertices, margin):
+        """
+        Set the cells of a bitmap inside a polygon of (N,2) laser coordinates, grown by margin DAC units.
+        """
+        cell = 1 << self.shift
+        radius = int(np.ceil(margin / cell))
+
+        # only rasterize the window around the zone (and its margin)
+        begin = np.clip(np.floor(vertices.min(axis=0) / cell).astype(np.intp) - radius - 1, 0, self.size)
+        end = np.clip(np.ceil(vertices.max(axis=0) / cell).astype(np.intp) + radius + 1, 0, self.size)
+
+        if (end <= begin).any():
+            return
+
+        zone = fill_polygon(vertices - begin * cell, (end[1] - begin[1], end[0] - begin[0]), cell)
+        bitmap[begin[1]:end[1], begin[0]:end[0]] |= dilate(zone, radius)
+
+    def add_polygon(self, vertices, margin=0):
+        """
+        Exclude the inside of a polygon given as (N,2) laser coordinates,
+        grown by margin DAC units on each side.
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+
+        self.zones.append((vertices, margin))
+        self.rasterize(self.bitmap, vertices, margin)
+        self.active = bool(self.bitmap.any())
+
+    def add_camera_polygon(self, vertices, mapping, margin=0, step=4.0):
+        """
+        Exclude the inside of a polygon given as (N,2) camera pixel coordinates.  Its edges are
+        sampled every step pixels and mapped to laser coordinates, so they follow the mapping's curvature.
+        """
+        vertices = np.asarray(vertices, dtype=np.float64).reshape(-1, 2)
+        edges = np.roll(vertices, -1, axis=0) - vertices
+        counts = np.maximum(np.ceil(np.linalg.norm(edges, axis=1) / step), 1).astype(np.intp)
+
+        edge = np.repeat(np.arange(len(vertices)), counts)
+        t = (np.arange(edge.size) - np.repeat(np.cumsum(counts) - counts, counts)) / counts[edge]
+
+        samples = vertices[edge] + edges[edge] * t[:, None]
+        coords = np.asarray(mapping(samples), dtype=np.float64)
+
+        self.camera.append((samples, coords, margin))
+        self.rasterize(self.bitmap, coords, margin)
+        self.active = bool(self.bitmap.any())
+
+    def follow(self, mapping):
+        """
+        Map the edges of the camera space zones again, and if any of them moved by more than
+        the tolerance, start rasterizing the zones again in the background.  This doesn't wait
+        for the new bitmap (the old one stays in use until then).  Returns true if a rebuild
+        was started.
+        """
+        if not self.camera or (self.builder is not None and self.builder.is_alive()):
+            return False
+
+        moved = [np.asarray(mapping(samples), dtype=np.float64) for samples, _, _ in self.camera]
+
+        if max(np.abs(coords - previous).max() for coords, (_, previous, _) in zip(moved, self.camera)) <= self.tolerance:
+            return False
+
+        self.builder = threading.Thread(target=self.rebuild, args=(moved,), name='exclusion-mask', daemon=True)
+        self.builder.start()
+
+        return True
+
+    def rebuild(self, moved):
+        """
+        Rasterize all of the zones into a new bitmap, with the camera space zones at the given
+        laser coordinates of their edges, and swap it in (so the writer threads never see a partly
+        built one).  This blocks while it's built.
+        """
+        bitmap = np.zeros_like(self.bitmap)
+
+        for vertices, margin in self.zones:
+            self.rasterize(bitmap, vertices, margin)
+
+        for coords, (_, _, margin) in zip(moved, self.camera):
+            self.rasterize(bitmap, coords, margin)
+
+        self.camera = [(samples, coords, margin) for coords, (samples, _, margin) in zip(moved, self.camera)]
+        self.bitmap = bitmap
+        self.rebuilds += 1
+
+    def wait(self, timeout=None):
+        """
+        Wait for a rebuild started by follow() to finish.
+        """
+        if self.builder is not None:
+            self.builder.join(timeout)
+
+    @staticmethod
+    def load(path, mapping=None, shift=0):
+        """
+        Load the zones from a JSON file (see the top of this file).  The mapping
+        is needed for zones in camera space.
+        """
+        with open(path) as file:
+            config = json.load(file)
+
+        if isinstance(config, list):
+            config = {'zones': config}
+
+        mask = ExclusionMask(shift)
+        margin = config.get('margin', 0)
+
+        for zone in config.get('zones', []):
+            space = zone.get('space', 'laser')
+
+            if space == 'laser':
+                mask.add_polygon(zone['polygon'], zone.get('margin', margin))
+            elif space == 'camera':
+                if mapping is None:
+                    raise ValueError(f"{path} has camera space zones, which need a camera->laser mapping")
+                mask.add_camera_polygon(zone['polygon'], mapping, zone.get('margin', margin))
+            else:
+                raise ValueError(f"unknown zone space '{space}' in {path} (valid spaces are: laser, camera)")
+
+        return mask
+
+    def contains(self, coords):
+        """
+        Return an (N,) bool array of whether each of the (N,2) laser coordinates is excluded.
+        """
+        coords = np.clip(np.asarray(coords).reshape(-1, 2), 0, HELIOS_MAX_COORD).astype(np.intp)
+        bitmap = self.bitmap   # (follow() can swap it from another thread)
+        return bitmap[coords[:,1] >> self.shift, coords[:,0] >> self.shift]
+
+    def apply(self, view):
+        """
+        Blank the lit points of a HELIOS_POINT_DTYPE view that are inside a zone, in place.
+        Returns the number of points blanked.
+        """
+        self.frames += 1
+
+        if not self.active or len(view) == 0:
+            return 0
+
+        bitmap = self.bitmap   # (follow() can swap it from another thread)
+        x = np.minimum(view['x'], HELIOS_MAX_COORD) >> self.shift
+        y = np.minimum(view['y'], HELIOS_MAX_COORD) >> self.shift
+
+        hit = bitmap[y, x]
+        hit &= (view['r'] | view['g'] | view['b'] | view['i']) > 0
+        blanked = int(np.count_nonzero(hit))
+
+        if blanked:
+            for channel in ('r', 'g', 'b', 'i'):
+                view[channel][hit] = 0
+
+            self.blanked += blanked
+            self.frames_blanked += 1
+
+        return blanked
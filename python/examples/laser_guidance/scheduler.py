@@ -0,0 +1,186 @@
+#
+# Adaptive DAC readiness polling.
+#
+# The scripts waited for the DAC with a busy loop of up to 512 GetStatus()
+# calls, which keeps a core spinning on USB control transfers and has no
+# bound on its wall time other than however long 512 round-trips take.
+#
+# A Helios becomes ready again once it has played out the previous frame
+# (num_points / pps) plus some transfer overhead.  The ReadinessScheduler
+# learns that overhead per device, sleeps until just before the device is
+# expected to be ready, then polls with exponential backoff up to a hard
+# deadline.  Frames that miss the deadline are dropped and counted.
+#
+import time
+
+from .helios import HELIOS_READY
+
+
+class DeviceTiming:
+    """
+    Readiness timing and counters for one DAC.
+    """
+    __slots__ = ('written_at', 'playout', 'ready_at', 'overhead', 'samples',
+                 'waits', 'polls', 'dropped', 'wait_time')
+
+    def __init__(self, overhead=0.0):
+        self.written_at = None     # perf_counter() time of the last write
+        self.playout = 0.0         # seconds to play out the last frame (num_points / pps)
+        self.ready_at = 0.0        # perf_counter() time the device is expected to be ready
+        self.overhead = overhead   # learned seconds it stays busy beyond playing out the frame
+        self.samples = 0           # number of times the overhead was measured
+        self.waits = 0             # number of waits
+        self.polls = 0             # number of GetStatus() calls
+        self.dropped = 0           # number of waits that hit the deadline
+        self.wait_time = 0.0       # total seconds spent waiting
+
+
+class ReadinessScheduler:
+    """
+    Waits for Helios DACs to become ready, without spinning.
+
+    Usage:
+        scheduler = ReadinessScheduler(lib)
+
+        if scheduler.wait(device):
+            lib.WriteFrame(device, pps, flags, points, num_points)
+            scheduler.wrote(device, num_points, pps)
+    """
+    def __init__(self, lib=None, margin=0.0005, initial_backoff=0.00005, max_backoff=0.002,
+                 deadline=0.05, smoothing=0.2):
+        """
+        Parameters:
+            lib (object) -- the Helios library handle (can also be set later)
+            margin (float) -- seconds before the expected ready time to start polling
+            initial_backoff (float) -- first sleep between polls (seconds)
+            max_backoff (float) -- maximum sleep between polls (seconds)
+            deadline (float) -- maximum seconds to poll for past the expected ready time
+            smoothing (float) -- weight of new measurements in the learned overhead
+        """
+        self.lib = lib
+        self.margin = margin
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.smoothing = smoothing
+        self.devices = {}
+
+    def device(self, device):
+        """
+        Get the timing state for a device.
+        """
+        timing = self.devices.get(device)
+
+        if timing is None:
+            timing = self.devices.setdefault(device, DeviceTiming())
+
+        return timing
+
+    def wait(self, device):
+        """
+        Sleep until the device is expected to be ready, then poll GetStatus() with
+        exponential backoff until it is, or until the deadline passes.
+        Returns true if the device is ready, or false if the frame should be dropped.
+        """
+        timing = self.device(device)
+        timing.waits += 1
+
+        time_begin = time.perf_counter()
+        deadline = max(timing.ready_at, time_begin) + self.deadline
+
+        # sleep through the time the device is known to be busy
+        sleep = timing.ready_at - self.margin - time_begin
+
+        if sleep > 0:
+            time.sleep(sleep)
+
+        backoff = self.initial_backoff
+        busy_at = None   # time of the last poll that found the device busy
+        ready = False
+
+        while True:
+            timing.polls += 1
+
+            if self.lib.GetStatus(device) == HELIOS_READY:
+                ready = True
+                break
+
+            now = busy_at = time.perf_counter()
+
+            if now >= deadline:
+                break
+
+            time.sleep(min(backoff, deadline - now))
+            backoff = min(backoff * 2, self.max_backoff)
+
+        now = time.perf_counter()
+        timing.wait_time += now - time_begin
+
+        if ready:
+            self.learn(timing, now, busy_at)
+        else:
+            timing.dropped += 1
+
+        return ready
+
+    def wrote(self, device, num_points, pps):
+        """
+        Tell the scheduler that a frame was just written to the device.
+        """
+        timing = self.device(device)
+        timing.written_at = time.perf_counter()
+        timing.playout = num_points / max(pps, 1)
+        timing.ready_at = timing.written_at + timing.playout + timing.overhead
+
+    def learn(self, timing, ready_time, busy_time=None):
+        """
+        Update the device's overhead estimate from when it was seen ready.  If a poll found
+        it busy first, it became ready between busy_time and ready_time.  Otherwise ready_time
+        is only an upper bound (the device may have been idle for a while), which can only
+        shrink the estimate - so it settles just above the real overhead.
+        """
+        if timing.written_at is None:
+            return
+
+        if busy_time is not None:
+            ready_time = (ready_time + busy_time) * 0.5
+
+        overhead = max(ready_time - timing.written_at - timing.playout, 0.0)
+        timing.written_at = None
+
+        if busy_time is not None and timing.samples == 0:
+            timing.overhead = overhead
+        elif busy_time is not None or overhead < timing.overhead:
+            timing.overhead += self.smoothing * (overhead - timing.overhead)
+        else:
+            return
+
+        timing.samples += 1
+
+    @property
+    def dropped(self):
+        """
+        Total number of frames dropped because a device missed the deadline.
+        """
+        return sum(timing.dropped for timing in self.devices.values())
+
+    @property
+    def polls(self):
+        """
+        Total number of GetStatus() calls.
+        """
+        return sum(timing.polls for timing in self.devices.values())
+
+    @property
+    def wait_time(self):
+        """
+        Total seconds spent waiting on all of the devices.
+        """
+        return sum(timing.wait_time for timing in self.devices.values())
+
+    def stats(self):
+        """
+        Return {device: {counter: value}} with the timing and counters of each device.
+        """
+        return {device: {name: getattr(timing, name) for name in ('overhead', 'waits', 'polls', 'dropped', 'wait_time')}
+                for device, timing in self.devices.items()}
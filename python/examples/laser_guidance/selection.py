@@ -0,0 +1,146 @@
+#
+# Target selection for crowded frames.
+#
+# With many detections, sending all of them floods the frame (each target gets
+# less dwell and the refresh rate drops), and the old scripts that kept a
+# single target just aimed at whichever detection came last in the list.
+# TargetSelector ranks the candidates by a weighted score of their confidence,
+# size, track age and distance from where the beam currently is, and keeps the
+# best K that fit in a point budget.  A target that was selected is held for a
+# minimum dwell time (as long as it's still detected), so that the beam
+# doesn't thrash between targets with similar scores.  The scoring and the
+# selection are array ops over all of the candidates.
+#
+import numpy as np
+
+from .helios import HELIOS_MAX_COORD
+
+
+class TargetSelector:
+    """
+    Picks the targets to aim at from the detections or tracks of a frame.
+
+    Usage:
+        selector = TargetSelector(max_targets=3, point_budget=1500, min_dwell=0.5)
+        keep = selector.select(centers, boxes, confidence, ids=ids, age=age, cost=cost,
+                               position=beam, timestamp=capture_time)
+        boxes, confidence = boxes[keep], confidence[keep]
+    """
+    def __init__(self, max_targets=0, point_budget=0, min_dwell=0.5, confidence_weight=1.0,
+                 size_weight=0.5, age_weight=0.5, distance_weight=0.5, age_scale=10.0):
+        """
+        Parameters:
+            max_targets (int) -- maximum number of targets per frame (0 for no limit)
+            point_budget (int) -- maximum total of the targets' point costs per frame (0 for no limit)
+            min_dwell (float) -- seconds a selected target is held before it can be replaced
+            confidence_weight (float) -- score weight of the detection confidence [0,1]
+            size_weight (float) -- score weight of the box area, relative to the largest candidate
+            age_weight (float) -- score weight of the track age, saturating after a few age_scale frames
+            distance_weight (float) -- score penalty of the distance from the beam, relative to the DAC range
+            age_scale (float) -- track age (in frames) at which the age score reaches 63%
+        """
+        self.max_targets = max_targets
+        self.point_budget = point_budget
+        self.min_dwell = min_dwell
+        self.weights = np.array([confidence_weight, size_weight, age_weight, -distance_weight])
+        self.age_scale = age_scale
+
+        self.held_ids = np.zeros(0, dtype=np.int64)   # sorted IDs of the targets selected last frame
+        self.held_since = np.zeros(0)                  # when each of them was first selected
+
+        self.frames = 0       # number of frames selected from
+        self.candidates = 0   # total number of candidates
+        self.selected = 0     # total number of targets selected
+        self.switches = 0     # number of targets that were newly selected
+
+    def score(self, centers, boxes, confidence, age=None, position=None):
+        """
+        Return the (N,) scores of the candidates.
+
+        Parameters:
+            centers (array) -- (N,2) laser coordinates of the candidates
+            boxes (array) -- (N,4) camera boxes as (left, top, right, bottom)
+            confidence (array) -- (N,) detection confidences
+            age (array) -- (N,) track ages in frames (or None without tracking)
+            position (array) -- laser coordinates of the beam (or None if unknown)
+        """
+        count = len(boxes)
+        area = np.prod(np.maximum(boxes[:, 2:] - boxes[:, :2], 0), axis=1)
+        features = np.zeros((count, 4))
+
+        features[:,0] = confidence
+        features[:,1] = area / max(area.max(), 1.0)
+
+        if age is not None:
+            features[:,2] = 1.0 - np.exp(-np.asarray(age, dtype=np.float64) / self.age_scale)
+
+        if position is not None:
+            features[:,3] = np.linalg.norm(centers - position, axis=1) / (HELIOS_MAX_COORD * np.sqrt(2))
+
+        return features @ self.weights
+
+    def select(self, centers, boxes, confidence, ids=None, age=None, cost=1, position=None, timestamp=0.0):
+        """
+        Select the targets for a frame.
+
+        Parameters:
+            centers, boxes, confidence, age, position -- see score()
+            ids (array) -- (N,) track IDs, needed to hold the targets for min_dwell
+            cost (array) -- (N,) number of points each target takes in the frame (or one for all)
+            timestamp (float) -- the frame time in seconds
+
+        Returns the indices of the selected candidates, best first.
+        """
+        centers = np.asarray(centers, dtype=np.float64).reshape(-1, 2)
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        confidence = np.asarray(confidence, dtype=np.float64).reshape(-1)
+        count = len(boxes)
+
+        self.frames += 1
+        self.candidates += count
+
+        if count == 0:
+            self.held_ids = self.held_ids[:0]
+            self.held_since = self.held_since[:0]
+            return np.zeros(0, dtype=np.intp)
+
+        priority = self.score(centers, boxes, confidence, age, position)
+
+        # targets within their minimum dwell go first
+        since = np.full(count, timestamp)
+
+        if ids is not None:
+            ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+
+        if ids is not None and len(self.held_ids) > 0:
+            index = np.minimum(np.searchsorted(self.held_ids, ids), len(self.held_ids) - 1)
+            held = self.held_ids[index] == ids
+            since[held] = self.held_since[index[held]]
+            priority[held & (timestamp - since < self.min_dwell)] += 1.0e6
+        else:
+            held = np.zeros(count, dtype=bool)
+
+        order = np.argsort(-priority, kind='stable')
+
+        # the best K whose points fit in the budget (always at least the best one)
+        keep = np.ones(count, dtype=bool)
+
+        if self.max_targets > 0:
+            keep[self.max_targets:] = False
+
+        if self.point_budget > 0:
+            total = np.cumsum(np.broadcast_to(cost, (count,))[order])
+            keep &= total <= self.point_budget
+            keep[0] = True
+
+        selected = order[keep]
+
+        self.selected += len(selected)
+        self.switches += int(np.count_nonzero(~held[selected]))
+
+        if ids is not None:
+            sort = np.argsort(ids[selected])
+            self.held_ids = ids[selected][sort]
+            self.held_since = since[selected][sort]
+
+        return selected
@@ -0,0 +1,368 @@
+#
+# Stand-in for libHeliosDacAPI.so that can be used without hardware attached.
+#
+# FakeHeliosDAC exposes the same functions that the guidance scripts call on
+# the ctypes library handle (OpenDevices, GetStatus, WriteFrame, CloseDevices)
+# and models the device being busy while it plays out the previous frame,
+# so that readiness polling and write latency can be benchmarked on a PC.
+# SyntheticScene, FakeVideoSource, FakeVideoOutput and FakeDetector likewise
+# stand in for the camera, the output stream and the detection network, and
+# FakeProjector for a misaligned laser projector as seen by the camera.
+#
+import time
+import ctypes
+import threading
+import collections
+
+import numpy as np
+
+from .helios import HELIOS_READY, HELIOS_NOT_READY
+from .mapping import Detection
+
+
+class FakeHeliosDAC:
+    """
+    Simulated Helios DAC library.  After each WriteFrame(), the device reports
+    not-ready for the time it takes to play the frame (num_points / pps) plus
+    a fixed USB transfer latency.  Each call to GetStatus() or WriteFrame()
+    can also be given a round-trip delay to mimic the USB control transfers.
+    """
+    def __init__(self, num_devices=1, status_latency=0.0, write_latency=0.0,
+                 transfer_latency=0.0, history=64):
+        """
+        Parameters:
+            num_devices (int) -- number of DACs reported by OpenDevices()
+            status_latency (float) -- seconds that each GetStatus() call blocks for
+            write_latency (float) -- seconds that each WriteFrame() call blocks for
+            transfer_latency (float) -- extra seconds the device stays busy after a write
+            history (int) -- number of written frames to keep per device (see frames)
+        """
+        self.num_devices = num_devices
+        self.status_latency = status_latency
+        self.write_latency = write_latency
+        self.transfer_latency = transfer_latency
+        self.is_open = False
+
+        self.busy_until = [0.0] * num_devices
+        self.status_calls = [0] * num_devices
+        self.write_calls = [0] * num_devices
+        self.frames = [collections.deque(maxlen=history) for _ in range(num_devices)]
+        self.lock = threading.Lock()
+
+    def OpenDevices(self):
+        self.is_open = True
+        return self.num_devices
+
+    def CloseDevices(self):
+        self.is_open = False
+        return 0
+
+    def GetStatus(self, device):
+        if self.status_latency > 0:
+            time.sleep(self.status_latency)
+
+        self.status_calls[device] += 1
+
+        if time.perf_counter() >= self.busy_until[device]:
+            return HELIOS_READY
+
+        return HELIOS_NOT_READY
+
+    def WriteFrame(self, device, pps, flags, points, num_points):
+        if self.write_latency > 0:
+            time.sleep(self.write_latency)
+
+        frame = [(p.x, p.y, p.r, p.g, p.b, p.i) for p in frame_points(points, num_points)]
+
+        with self.lock:
+            self.write_calls[device] += 1
+            self.frames[device].append(frame)
+            self.busy_until[device] = time.perf_counter() + self.transfer_latency + num_points / max(pps, 1)
+
+        return 1
+
+    @property
+    def total_writes(self):
+        return sum(self.write_calls)
+
+    @property
+    def total_status_calls(self):
+        return sum(self.status_calls)
+
+
+def frame_points(points, length):
+    """
+    Return the first points of a frame passed to WriteFrame(), which may be a
+    ctypes array, a pointer to an array or to a single point, or a byref() object.
+    """
+    if hasattr(points, '_obj'):
+        points = points._obj
+
+    if hasattr(points, 'contents'):
+        if isinstance(points.contents, ctypes.Array):
+            points = points.contents
+        else:
+            return [points[n] for n in range(length)]
+
+    return points[:length]
+
+
+class SyntheticScene:
+    """
+    Targets moving at constant speed across the camera image, bouncing off its edges,
+    for exercising the tracking and guidance stages offline against ground truth.
+    """
+    def __init__(self, num_targets=3, width=1280, height=720, speed=300.0, size=60.0,
+                 noise=3.0, seed=0):
+        """
+        Parameters:
+            num_targets (int) -- number of moving targets
+            width (int) -- width of the camera image (in pixels)
+            height (int) -- height of the camera image (in pixels)
+            speed (float) -- target speed (pixels per second)
+            size (float) -- width and height of the target boxes (in pixels)
+            noise (float) -- standard deviation of the detected box coordinates (pixels)
+            seed (int) -- random seed for the starting positions, headings and noise
+        """
+        self.rng = np.random.default_rng(seed)
+        self.extent = np.array([width, height], dtype=np.float64)
+        self.size = size
+        self.noise = noise
+
+        heading = self.rng.uniform(0, 2 * np.pi, num_targets)
+        self.origin = self.rng.uniform(size, self.extent - size, size=(num_targets, 2))
+        self.velocity = speed * np.stack([np.cos(heading), np.sin(heading)], axis=1)
+
+    def truth(self, t):
+        """
+        The (N,2) true target centers at time t (seconds).
+        """
+        half = self.size / 2
+        span = self.extent - self.size
+        travel = np.mod(self.origin - half + self.velocity * t, 2 * span)
+        return np.where(travel > span, 2 * span - travel, travel) + half
+
+    def detect(self, t):
+        """
+        Simulated detections at time t:  (N,4) noisy (left, top, right, bottom) boxes
+        and (N,) confidences, in the same order as truth().
+        """
+        centers = self.truth(t)
+        half = self.size / 2
+        boxes = np.concatenate([centers - half, centers + half], axis=1)
+        boxes += self.rng.normal(scale=self.noise, size=boxes.shape)
+        return boxes, self.rng.uniform(0.6, 1.0, size=len(boxes))
+
+    def detections(self, t):
+        """
+        Simulated detections at time t as Detection objects, which have the same
+        attributes as detectNet.Detection (so they can be passed to GuidanceRunner).
+        """
+        boxes, confidence = self.detect(t)
+        return [Detection(box, conf) for box, conf in zip(boxes, confidence)]
+
+
+
+class SyntheticImage:
+    """
+    Stand-in for a captured cudaImage of a SyntheticScene at time t.
+    """
+    def __init__(self, scene, t):
+        self.scene = scene
+        self.t = t
+        self.width, self.height = (int(v) for v in scene.extent)
+
+    @staticmethod
+    def copy(src, dst=None):
+        """
+        Copy an image (for CapturePrefetcher, in place of cuda_copy()).
+        """
+        if dst is None:
+            return SyntheticImage(src.scene, src.t)
+
+        dst.scene, dst.t, dst.width, dst.height = src.scene, src.t, src.width, src.height
+        return dst
+
+
+class FakeVideoSource:
+    """
+    Stand-in for a videoSource that delivers SyntheticImages of a scene at a fixed frame rate.
+    Capture() blocks until the next frame is due and then for the capture latency (the time
+    a camera takes to deliver and convert a frame), without using the CPU while it waits.
+    """
+    def __init__(self, scene=None, fps=30.0, latency=0.005, frames=None):
+        """
+        Parameters:
+            scene (SyntheticScene) -- the scene to capture (created if not given)
+            fps (float) -- camera frame rate
+            latency (float) -- seconds from the frame being due to Capture() returning it
+            frames (int) -- number of frames before the stream ends (or None to stream forever)
+        """
+        self.scene = scene if scene is not None else SyntheticScene()
+        self.fps = fps
+        self.latency = latency
+        self.frames = frames
+
+        self.start_time = None
+        self.captured = 0   # number of frames captured
+
+    def Capture(self, format='rgb8', timeout=1000):
+        if not self.IsStreaming():
+            return None
+
+        now = time.perf_counter()
+
+        if self.start_time is None:
+            self.start_time = now
+
+        # the next frame that the camera will finish after now
+        index = max(self.captured, int(np.ceil((now - self.start_time) * self.fps)))
+        t = index / self.fps
+        delay = self.start_time + t + self.latency - now
+
+        if timeout >= 0 and delay > timeout / 1000.0:
+            time.sleep(timeout / 1000.0)
+            return None
+
+        time.sleep(max(delay, 0))
+        self.captured = index + 1
+
+        return SyntheticImage(self.scene, t)
+
+    def IsStreaming(self):
+        return self.frames is None or self.captured < self.frames
+
+    def GetWidth(self):
+        return int(self.scene.extent[0])
+
+    def GetHeight(self):
+        return int(self.scene.extent[1])
+
+    def GetFrameRate(self):
+        return self.fps
+
+    def Close(self):
+        self.frames = self.captured
+
+
+class FakeVideoOutput:
+    """
+    Stand-in for a videoOutput whose Render() takes a fixed time (the copy, encode or display).
+    """
+    def __init__(self, render_cost=0.004):
+        """
+        Parameters:
+            render_cost (float) -- seconds per Render() call
+        """
+        self.render_cost = render_cost
+        self.rendered = 0   # number of frames rendered
+        self.status = None
+
+    def Render(self, image):
+        self.rendered += 1
+        time.sleep(self.render_cost)
+
+    def SetStatus(self, status):
+        self.status = status
+
+    def IsStreaming(self):
+        return True
+
+
+class FakeProjector:
+    """
+    Simulated laser projector seen by the camera, for testing BeamFeedback.  The beam lands
+    where a LinearMapping would put it, except that the projector has been bumped:  the
+    spot is shifted, scaled and rotated on the camera image by a small misalignment.
+    render() draws the spots of some DAC coordinates on a noisy (H,W,3) uint8 image.
+    """
+    def __init__(self, mapping, width=1280, height=720, shift=(24.0, -16.0), scale=1.03,
+                 rotation=1.0, radius=2.0, noise=12, seed=0):
+        """
+        Parameters:
+            mapping (LinearMapping) -- the mapping the projector was aligned to
+            width, height (int) -- camera resolution in pixels
+            shift (tuple) -- (x, y) misalignment in pixels
+            scale (float) -- misalignment scale around the image center
+            rotation (float) -- misalignment rotation around the image center, in degrees
+            radius (float) -- radius of the laser spot in pixels
+            noise (int) -- amplitude of the background noise
+            seed (int) -- random seed of the background
+        """
+        self.mapping = mapping
+        self.width = width
+        self.height = height
+        self.radius = radius
+
+        angle = np.radians(rotation)
+        self.center = np.array([width, height], dtype=np.float64) * 0.5
+        self.shift = np.array(shift, dtype=np.float64)
+        self.matrix = scale * np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+
+        rng = np.random.default_rng(seed)
+        self.background = rng.integers(0, noise + 1, size=(height, width, 3), dtype=np.uint8) + np.uint8(40)
+
+    def camera_points(self, coords):
+        """
+        Return the (N,2) camera pixels where the beam lands for (N,2) DAC coordinates.
+        """
+        points = (np.asarray(coords, dtype=np.float64).reshape(-1, 2) - self.mapping.offset) / self.mapping.scale
+        return (points - self.center) @ self.matrix.T + self.center + self.shift
+
+    def render(self, coords):
+        """
+        Draw the laser spots of (N,2) DAC coordinates on a copy of the background.
+        """
+        image = self.background.copy()
+        size = int(np.ceil(self.radius * 3))
+
+        for x, y in self.camera_points(coords):
+            left, top = max(int(x) - size, 0), max(int(y) - size, 0)
+            right, bottom = min(int(x) + size + 1, self.width), min(int(y) + size + 1, self.height)
+
+            if right <= left or bottom <= top:
+                continue
+
+            ys, xs = np.mgrid[top:bottom, left:right]
+            spot = 215.0 * np.exp(-((xs - x) ** 2 + (ys - y) ** 2) / (2 * self.radius ** 2))
+            image[top:bottom, left:right, 0] = np.maximum(image[top:bottom, left:right, 0], 40 + spot).astype(np.uint8)
+
+        return image
+
+
+class FakeDetector:
+    """
+    Simulated detectNet for SyntheticImages, usable as a ROIDetector detector.  Each call
+    takes a fixed time plus a time per pixel of the image (or crop) it is run on, and returns
+    the scene's detections whose centers are inside the crop, in the crop's coordinates.
+    """
+    def __init__(self, fixed_cost=0.004, pixel_cost=10e-9):
+        """
+        Parameters:
+            fixed_cost (float) -- seconds per call (network inference at its fixed input size)
+            pixel_cost (float) -- seconds per input pixel (upload, resize and normalization)
+        """
+        self.fixed_cost = fixed_cost
+        self.pixel_cost = pixel_cost
+        self.calls = 0
+        self.pixels = 0
+
+    def cost(self, pixels):
+        """
+        Simulated seconds for a call on an image with the given number of pixels.
+        """
+        return self.fixed_cost + self.pixel_cost * pixels
+
+    def __call__(self, image, roi=None):
+        left, top, right, bottom = (0, 0, image.width, image.height) if roi is None else roi
+        pixels = (right - left) * (bottom - top)
+
+        self.calls += 1
+        self.pixels += pixels
+        time.sleep(self.cost(pixels))
+
+        boxes, confidence = image.scene.detect(image.t)
+        centers = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+        inside = (centers[:,0] >= left) & (centers[:,0] < right) & (centers[:,1] >= top) & (centers[:,1] < bottom)
+
+        return [Detection(box - (left, top, left, top), conf) for box, conf in zip(boxes[inside], confidence[inside])]
@@ -0,0 +1,192 @@
+#
+# Targeting strategies - what the laser draws for the detections in a frame.
+#
+# The detectnet_* scripts only differed in this part:  aiming at the center
+# of each box, at its corners, tracing its outline, or at the center with a
+# color picked from the detection confidence.  A strategy takes the (N,4)
+# detection boxes and their confidences, maps its target points to laser
+# coordinates, and writes the frame into a FrameBuffer, so that the runner
+# (and everything it does with the frame afterwards) is shared by all modes.
+#
+import numpy as np
+
+from .helios import DEFAULT_COLOR
+from .mapping import box_corners
+from .planner import ScanPlanner
+from .colormap import ColorLUT
+from .outline import OutlineRasterizer
+
+
+class TargetingStrategy:
+    """
+    Base class for targeting strategies.  Subclasses implement targets(), which returns
+    the camera pixel coordinates to aim at and their colors, and may override render()
+    to change how the mapped coordinates are written to the frame.
+
+    Usage:
+        strategy = create_strategy('center', pps=writer.pps)
+        buffer = writer.acquire()
+        strategy(boxes, confidence, mapping, buffer)
+        writer.submit(buffer)
+    """
+    name = None
+    points_per_box = 1   # number of targets per detection box
+
+    def __init__(self, planner=None, color=DEFAULT_COLOR, pps=None):
+        """
+        Parameters:
+            planner (ScanPlanner) -- orders the targets into one frame (created if not given)
+            color (tuple) -- (r, g, b, i) of the targets
+            pps (int) -- output rate used to create the planner
+        """
+        self.planner = planner if planner is not None else ScanPlanner(**({'pps': pps} if pps else {}))
+        self.color = color
+
+    def targets(self, boxes, confidence):
+        """
+        Select the points to aim at.
+
+        Parameters:
+            boxes (array) -- (N,4) detection boxes as (left, top, right, bottom)
+            confidence (array) -- (N,) detection confidences
+
+        Returns (points, colors) with the (M,2) camera pixel coordinates, and either
+        one (r, g, b, i) color for all of them or an (M,4) array of colors.
+        """
+        raise NotImplementedError(f"{type(self).__name__} must implement targets()")
+
+    def render(self, coords, colors, buffer):
+        """
+        Write the (M,2) laser coordinates into the buffer (as one planned frame by default).
+        """
+        self.planner.plan(coords, buffer, colors)
+
+    def cost(self, boxes, mapping):
+        """
+        Estimate the number of points that each of the (N,4) boxes takes in the frame
+        (the dwell on its targets, not counting the transits between them).
+        """
+        return np.full(len(boxes), self.points_per_box * self.planner.dwell_points, dtype=np.intp)
+
+    @property
+    def position(self):
+        """
+        Laser coordinates where the previous frame left the beam (or None).
+        """
+        return self.planner.position
+
+    def __call__(self, boxes, confidence, mapping, buffer):
+        """
+        Build the frame for a set of detections into a FrameBuffer.
+        Returns the (M,2) laser coordinates of the targets.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        confidence = np.asarray(confidence, dtype=np.float64).reshape(-1)
+
+        points, colors = self.targets(boxes, confidence)
+        coords = mapping(points)
+
+        if len(coords) > 0:
+            self.render(coords, colors, buffer)
+        else:
+            buffer.clear()
+
+        return coords
+
+
+class CenterTargeting(TargetingStrategy):
+    """
+    Aim at the center of each detection (detectnet_gpt.py, detectnet_centerLaser.py).
+    """
+    name = 'center'
+
+    def targets(self, boxes, confidence):
+        return (boxes[:, :2] + boxes[:, 2:]) * 0.5, self.color
+
+
+class CornerTargeting(TargetingStrategy):
+    """
+    Aim at the four corners of each detection box (detectnet_gpt_corners.py).
+    """
+    name = 'corners'
+    points_per_box = 4
+
+    def targets(self, boxes, confidence):
+        return box_corners(boxes).reshape(-1, 2), self.color
+
+
+class OutlineTargeting(TargetingStrategy):
+    """
+    Trace the outline of each detection box (detectnet_frame.py), with the edges resampled
+    to an even point density, dwell at the corners and blanked moves between the boxes.
+    """
+    name = 'outline'
+
+    def __init__(self, rasterizer=None, **kwargs):
+        """
+        Parameters:
+            rasterizer (OutlineRasterizer) -- draws the outlines (created for the planner's pps if not given)
+        """
+        super().__init__(**kwargs)
+        self.rasterizer = rasterizer if rasterizer is not None else OutlineRasterizer(pps=self.planner.pps)
+
+    def targets(self, boxes, confidence):
+        return box_corners(boxes).reshape(-1, 2), self.color
+
+    def cost(self, boxes, mapping):
+        return self.rasterizer.cost(mapping(box_corners(boxes).reshape(-1, 2)).reshape(-1, 4, 2))
+
+    @property
+    def position(self):
+        return self.rasterizer.position
+
+    def __call__(self, boxes, confidence, mapping, buffer):
+        """
+        Rasterize the detection outlines into a FrameBuffer.
+        Returns the (4N,2) laser coordinates of the box corners.
+        """
+        return self.rasterizer.draw(boxes, mapping, buffer, self.color).reshape(-1, 2)
+
+
+class ConfidenceTargeting(TargetingStrategy):
+    """
+    Aim at the center of each detection, colored by its confidence through a ColorLUT
+    (detectnet_balloon.py):  by default red below 0.7, then blue, then green from 0.8.
+    Detections whose center is outside of x_range are ignored.
+    """
+    name = 'confidence'
+
+    def __init__(self, lut=None, x_range=None, **kwargs):
+        """
+        Parameters:
+            lut (ColorLUT) -- confidence -> (r, g, b, i) table (defaults to ColorLUT.steps())
+            x_range (tuple) -- (min, max) camera x coordinates of the detections to target
+        """
+        super().__init__(**kwargs)
+
+        self.lut = lut if lut is not None else ColorLUT.steps()
+        self.x_range = x_range
+
+    def targets(self, boxes, confidence):
+        centers = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+
+        if self.x_range is not None:
+            keep = (centers[:,0] > self.x_range[0]) & (centers[:,0] < self.x_range[1])
+            centers = centers[keep]
+            confidence = confidence[keep]
+
+        return centers, self.lut(confidence)
+
+
+STRATEGIES = {strategy.name: strategy for strategy in (CenterTargeting, CornerTargeting,
+                                                        OutlineTargeting, ConfidenceTargeting)}
+
+
+def create_strategy(name, **kwargs):
+    """
+    Create a targeting strategy by name ('center', 'corners', 'outline', 'confidence').
+    """
+    if name not in STRATEGIES:
+        raise ValueError(f"unknown targeting mode '{name}' (valid modes are: {', '.join(STRATEGIES)})")
+
+    return STRATEGIES[name](**kwargs)
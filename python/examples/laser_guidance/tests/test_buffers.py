@@ -0,0 +1,72 @@
+#
+# Tests of the preallocated frame buffers (buffers.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.buffers import FramePool
+from laser_guidance.writer import LaserWriter
+from laser_guidance.simulator import FakeHeliosDAC
+
+
+def test_pool_reuses_buffers():
+    pool = FramePool(16, buffers=3)
+    buffers = {id(buffer) for buffer in pool.free}
+
+    for n in range(100):
+        buffer = pool.acquire()
+        buffer.timestamp = 1.0
+        buffer.set(np.full((n % 16 + 1, 2), n, dtype=np.uint16))
+        buffer.release()
+
+    assert pool.allocations == 0
+    assert {id(buffer) for buffer in pool.free} == buffers
+
+    buffer = pool.acquire()
+
+    assert buffer.count == 0 and buffer.timestamp is None   # cleared when taken again
+    assert id(buffer) in buffers
+
+
+def test_pool_grows_when_empty():
+    pool = FramePool(16, buffers=2)
+    buffers = [pool.acquire() for _ in range(3)]
+
+    assert len({id(buffer) for buffer in buffers}) == 3
+    assert (pool.size, pool.allocations) == (3, 1)
+
+    for buffer in buffers:
+        buffer.release()
+
+    assert len(pool.free) == 3
+
+
+def test_buffer_points():
+    buffer = FramePool(8, buffers=1).acquire()
+    buffer.set(np.array([(1, 2), (3, 4)]), color=(10, 20, 30, 40))
+    buffer.append(np.array([(5, 6)]))
+
+    assert len(buffer) == 3
+    assert [(point.x, point.y) for point in buffer.points[:3]] == [(1, 2), (3, 4), (5, 6)]
+    assert (buffer.points[0].r, buffer.points[0].g, buffer.points[0].b, buffer.points[0].i) == (10, 20, 30, 40)
+
+
+def test_writer_returns_buffers_to_pool():
+    dac = FakeHeliosDAC(num_devices=1, transfer_latency=0.001)
+    writer = LaserWriter(dac)
+    writer.start()
+
+    for n in range(200):
+        writer.submit(writer.acquire().set(np.array([(n, n)])))
+
+    writer.stop()
+
+    assert writer.pool.allocations == 0   # filling, waiting in the mailbox and being written
+    assert len(writer.pool.free) == writer.pool.size
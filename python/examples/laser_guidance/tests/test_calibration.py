@@ -0,0 +1,69 @@
+#
+# Tests of the camera->laser calibration and its lookup table (calibration.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import time
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.calibration import Calibration, LUTMapping
+
+
+def fit(scale, width=320, height=240):
+    camera = np.random.default_rng(0).uniform((0, 0), (width, height), size=(20, 2))
+    return Calibration.fit(camera, camera * scale + 100, width, height)
+
+
+def touch(path, mtime):
+    os.utime(path, (mtime, mtime))
+
+
+def test_lut_matches_model():
+    calibration = fit(4.0)
+    mapping = LUTMapping(calibration)
+    points = np.array([(10, 20), (160, 120), (319, 239)])
+
+    assert np.abs(mapping(points).astype(np.float64) - calibration.project(points)).max() <= 1.0
+
+
+def test_reload_in_background(tmp_path):
+    path = str(tmp_path / 'calibration.json')
+    fit(4.0).save(path)
+    mapping = LUTMapping(path, reload_interval=0.0)
+
+    assert mapping([(10, 10)]).tolist() == [[140, 140]]
+
+    fit(2.0).save(path)
+    touch(path, time.time() + 10)
+
+    assert not mapping.poll()   # only starts the reload
+    mapping.wait(5.0)
+
+    assert mapping.poll()
+    assert mapping([(10, 10)]).tolist() == [[120, 120]]
+    assert not mapping.poll()
+
+
+def test_bad_file_reported_once(tmp_path, capsys):
+    path = str(tmp_path / 'calibration.json')
+    fit(4.0).save(path)
+    mapping = LUTMapping(path, reload_interval=0.0)
+
+    with open(path, 'w') as file:
+        file.write('{"broken": ')
+
+    touch(path, time.time() + 10)
+
+    for _ in range(5):
+        mapping.poll()
+        mapping.wait(5.0)
+
+    assert capsys.readouterr().out.count('failed to load calibration') == 1
+    assert mapping([(10, 10)]).tolist() == [[140, 140]]   # the last good table stays in use
+    assert mapping.reloads == 1
@@ -0,0 +1,116 @@
+#
+# Tests of the camera capture prefetching (capture.py) with a stub source.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import time
+
+import pytest
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.capture import CapturePrefetcher
+
+
+class Frame:
+    def __init__(self, number):
+        self.number = number
+
+
+def copy_frame(src, dst=None):
+    if dst is None:
+        dst = Frame(0)
+
+    dst.number = src.number
+    return dst
+
+
+class StubSource:
+    """
+    Captures a numbered frame every interval, and ends or fails after a number of frames.
+    """
+    def __init__(self, interval=0.001, frames=None, fail=False):
+        self.interval = interval
+        self.frames = frames
+        self.fail = fail
+        self.count = 0
+        self.closed = False
+
+    def Capture(self, timeout=1000):
+        if not self.IsStreaming():
+            if self.fail:
+                raise IOError("stub source failed")
+            return None
+
+        time.sleep(self.interval)
+        self.count += 1
+        return Frame(self.count)
+
+    def IsStreaming(self):
+        return self.frames is None or self.count < self.frames
+
+    def GetWidth(self):
+        return 1280
+
+    def Close(self):
+        self.closed = True
+
+
+def test_held_frame_not_overwritten():
+    input = CapturePrefetcher(StubSource(), copy=copy_frame)
+
+    img = input.Capture()
+    number = img.number
+    time.sleep(0.05)   # plenty of frames arrive meanwhile
+
+    assert img.number == number
+
+    newer = input.Capture()
+
+    assert newer is not img and newer.number > number
+    assert input.dropped > 0
+
+    input.Close()
+
+
+def test_frames_handed_over_in_order():
+    input = CapturePrefetcher(StubSource(), copy=copy_frame)
+    numbers = []
+    images = set()
+
+    for _ in range(50):
+        img = input.Capture()
+        numbers.append(img.number)
+        images.add(id(img))
+        time.sleep(0.002)
+
+    input.Close()
+
+    assert numbers == sorted(set(numbers))   # newest first, never repeated or older
+    assert len(images) == 2                  # the frames are copied into the two slots
+    assert input.captured == input.delivered + input.dropped + (input.pending is not None)
+    assert input.source.closed
+
+
+def test_last_frame_delivered_at_end():
+    input = CapturePrefetcher(StubSource(frames=3), copy=None)
+    time.sleep(0.05)
+
+    assert input.IsStreaming()               # the last frame is still waiting
+    assert input.Capture().number == 3
+    assert not input.IsStreaming()
+    assert input.Capture(timeout=10) is None
+    assert input.GetWidth() == 1280          # forwarded to the source
+
+
+def test_source_error_raised_by_capture():
+    input = CapturePrefetcher(StubSource(frames=1, fail=True), copy=None)
+    input.join(1.0)
+
+    assert not input.is_alive()
+
+    with pytest.raises(IOError):
+        input.Capture()
@@ -0,0 +1,67 @@
+#
+# Tests of the closed-loop beam correction (feedback.py) with the runner's strategies.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.feedback import BeamFeedback
+from laser_guidance.mapping import LinearMapping, Detection
+from laser_guidance.targeting import create_strategy
+from laser_guidance.runner import GuidanceRunner
+from laser_guidance.writer import LaserWriter
+from laser_guidance.simulator import FakeHeliosDAC, FakeProjector
+
+
+BOXES = [(200, 150, 520, 400), (800, 300, 1000, 600)]
+
+
+def run_feedback(strategy, frames=10):
+    """
+    Aim a strategy at two large boxes through a misaligned projector, with BeamFeedback
+    looking for the dots that the laser frames drew.  Returns the runner and the feedback.
+    """
+    mapping = LinearMapping(scale=(3.2, -5.6), offset=(0, 4095))
+    projector = FakeProjector(mapping, 1280, 720, shift=(10.0, -6.0), rotation=0.0, noise=0)
+    feedback = BeamFeedback(mapping, 1280, 720, window=24, max_dots=8, settle=0.0)
+
+    writer = LaserWriter(FakeHeliosDAC())
+    writer.start()
+
+    runner = GuidanceRunner(strategy, feedback.mapping, writer)
+    detections = [Detection(box, 0.9) for box in BOXES]
+    coords = np.zeros((0, 2))
+
+    try:
+        for frame in range(frames):
+            feedback.observe(projector.render(coords), float(frame))
+            coords = runner.process(detections, capture_time=float(frame))
+            feedback.aimed(runner.aim_points, frame + 0.5)
+    finally:
+        writer.stop()
+
+    return runner, feedback
+
+
+def test_feedback_follows_the_corners():
+    runner, feedback = run_feedback(create_strategy('corners'))
+
+    # the dots are at the box corners, far outside a window around the centers
+    assert len(runner.aim_points) == 8
+    assert feedback.observations > 0 and feedback.misses == 0
+    assert feedback.error < 15.0
+
+
+def test_feedback_skips_filtered_targets():
+    strategy = create_strategy('confidence', x_range=(0, 700))
+    runner, feedback = run_feedback(strategy)
+
+    # only the box inside x_range is drawn, so there's no dot to miss at the other one
+    assert np.allclose(runner.aim_points, [[360, 275]])
+    assert feedback.observations > 0 and feedback.misses == 0
@@ -0,0 +1,71 @@
+#
+# Tests of the region-of-interest detection around the tracks (roi.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.roi import ROIDetector, pad_regions, merge_regions
+from laser_guidance.mapping import detection_boxes
+from laser_guidance.tracker import TargetTracker
+from laser_guidance.simulator import SyntheticScene, SyntheticImage, FakeDetector
+
+
+def test_pad_regions():
+    regions = pad_regions([[100, 100, 140, 120], [0, 0, 10, 10]], padding=0.5, min_size=(64, 64), width=640, height=480)
+
+    assert regions.tolist() == [[80, 78, 160, 142], [0, 0, 37, 37]]
+
+
+def test_merge_regions():
+    regions = merge_regions([[0, 0, 10, 10], [5, 5, 20, 20], [30, 30, 40, 40], [18, 0, 32, 4]])
+
+    assert sorted(regions.tolist()) == [[0, 0, 32, 20], [30, 30, 40, 40]]
+
+
+def test_crops_find_the_tracked_targets():
+    scene = SyntheticScene(num_targets=2, speed=200.0, size=48, noise=0.0)
+    tracker = TargetTracker()
+    roi = ROIDetector(FakeDetector(fixed_cost=0.0, pixel_cost=0.0), tracker, full_frame_interval=10)
+    full_frames = []
+
+    for frame in range(40):
+        t = frame / 30.0
+        full = roi.full_frames
+        detections = roi(SyntheticImage(scene, t), t)
+
+        if roi.full_frames > full:
+            full_frames.append(frame)
+
+        # the detections in the crops are mapped back to frame coordinates
+        boxes = detection_boxes(detections)
+        centers = np.sort((boxes[:, :2] + boxes[:, 2:]) * 0.5, axis=0)
+
+        assert len(detections) == 2
+        assert np.allclose(centers, np.sort(scene.truth(t), axis=0), atol=1.0)
+
+        tracker.update(boxes, timestamp=t)
+
+    assert roi.crops > 0 and roi.mean_crop_area < 0.6
+    assert max(np.diff(full_frames)) <= 10   # a full frame at least every interval
+
+
+def test_full_frame_when_track_lost():
+    scene = SyntheticScene(num_targets=1, size=48, noise=0.0)
+    tracker = TargetTracker()
+    roi = ROIDetector(FakeDetector(fixed_cost=0.0, pixel_cost=0.0), tracker)
+
+    for frame in range(5):
+        tracker.update(detection_boxes(roi(SyntheticImage(scene, frame / 30.0))), timestamp=frame / 30.0)
+
+    assert roi.regions(1280, 720) is not None
+
+    tracker.update(np.zeros((0, 4)), timestamp=5 / 30.0)
+
+    assert roi.regions(1280, 720) is None
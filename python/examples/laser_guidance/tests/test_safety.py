@@ -0,0 +1,114 @@
+#
+# Tests of the audience-safety exclusion zones (safety.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import json
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.safety import ExclusionMask
+from laser_guidance.buffers import FramePool
+from laser_guidance.mapping import LinearMapping
+from laser_guidance.feedback import FeedbackMapping, CorrectionGrid
+
+
+L_SHAPE = [(1000, 1000), (3000, 1000), (3000, 1800), (1800, 1800), (1800, 3000), (1000, 3000)]
+
+
+def inside_polygon(points, vertices):
+    """
+    Reference even-odd point in polygon test (ray casting, one point at a time).
+    """
+    result = []
+
+    for x, y in points:
+        inside = False
+
+        for (x0, y0), (x1, y1) in zip(vertices, vertices[1:] + vertices[:1]):
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+
+        result.append(inside)
+
+    return np.array(result)
+
+
+def test_polygon_matches_reference():
+    mask = ExclusionMask()
+    mask.add_polygon(L_SHAPE)
+
+    points = np.random.default_rng(0).integers(0, 4096, size=(5000, 2)) + 0.5   # cell centers
+
+    assert np.array_equal(mask.contains(points), inside_polygon(points, L_SHAPE))
+
+
+def test_margin_and_coarse_cells():
+    for shift in (0, 4):
+        mask = ExclusionMask(shift=shift)
+        mask.add_polygon([(1000, 1000), (2000, 1000), (2000, 2000), (1000, 2000)], margin=32)
+
+        assert mask.contains([(1500, 1500), (980, 1500), (1500, 2020)]).all()
+        assert not mask.contains([(900, 1500), (1500, 2100), (4095, 4095), (0, 0)]).any()
+
+
+def test_apply_blanks_lit_points_inside():
+    mask = ExclusionMask()
+    buffer = FramePool(8, buffers=1).acquire()
+
+    assert mask.apply(buffer.set(np.array([(1500, 1500)])).view[:1]) == 0   # an empty mask passes everything
+
+    mask.add_polygon(L_SHAPE)
+    buffer.set(np.array([(1500, 1500), (2500, 2500), (1200, 2800), (100, 100)]), color=(255, 0, 0, 255))
+    buffer.view[2] = (1200, 2800, 0, 0, 0, 0)   # already blanked
+
+    assert mask.apply(buffer.view[:buffer.count]) == 1
+    assert buffer.view['r'].tolist()[:4] == [0, 255, 0, 255]
+    assert buffer.view['x'].tolist()[:4] == [1500, 2500, 1200, 100]   # blanked, not moved
+    assert (mask.frames, mask.frames_blanked, mask.blanked) == (2, 1, 1)
+
+
+def test_load_camera_zone(tmp_path):
+    path = str(tmp_path / 'zones.json')
+
+    with open(path, 'w') as file:
+        json.dump({'zones': [{'space': 'camera', 'polygon': [[0, 500], [1280, 500], [1280, 720], [0, 720]]}]}, file)
+
+    mapping = LinearMapping(scale=(3.2, -5.6), offset=(0, 4095))
+    mask = ExclusionMask.load(path, mapping)
+
+    assert mask.contains(mapping([(640, 600)])).all()
+    assert not mask.contains(mapping([(640, 400)])).any()
+
+
+def test_camera_zone_follows_mapping():
+    zone = [(0, 500), (1280, 500), (1280, 720), (0, 720)]
+    grid = CorrectionGrid(1280, 720)
+    mapping = FeedbackMapping(LinearMapping(scale=(3.2, -5.6), offset=(0, 4095)), grid)
+
+    mask = ExclusionMask()
+    mask.add_camera_polygon(zone, mapping)
+    mask.add_polygon([(0, 0), (100, 0), (100, 100), (0, 100)])
+
+    # a correction smaller than the tolerance leaves the zones where they are
+    grid.offsets[:] = (0, 3)
+
+    assert not mask.follow(mapping)
+
+    # the beam correction moves the zone, so the zone has to move with it
+    grid.offsets[:] = (0, 300)
+
+    assert mask.follow(mapping)
+
+    mask.wait()
+
+    assert mask.rebuilds == 1
+    assert mask.contains(mapping([(640, 505), (640, 715)])).all()
+    assert not mask.contains(mapping([(640, 440)])).any()
+    assert mask.contains([(50, 50)]).all()   # the laser space zones are kept
+    assert not mask.follow(mapping)
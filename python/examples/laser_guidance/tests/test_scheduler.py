@@ -0,0 +1,75 @@
+#
+# Tests of the adaptive DAC readiness polling (scheduler.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import time
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.helios import HeliosPoint, HELIOS_NOT_READY
+from laser_guidance.scheduler import ReadinessScheduler
+from laser_guidance.simulator import FakeHeliosDAC
+
+
+class BusyDAC:
+    """
+    A DAC that never becomes ready, and records when its status was polled.
+    """
+    def __init__(self):
+        self.polls = []
+
+    def GetStatus(self, device):
+        self.polls.append(time.perf_counter())
+        return HELIOS_NOT_READY
+
+
+def test_ready_device_polled_once():
+    scheduler = ReadinessScheduler(FakeHeliosDAC())
+
+    assert scheduler.wait(0)
+    assert scheduler.polls == 1 and scheduler.dropped == 0
+
+
+def test_backoff_until_deadline():
+    dac = BusyDAC()
+    scheduler = ReadinessScheduler(dac, initial_backoff=0.001, max_backoff=0.004, deadline=0.03)
+
+    time_begin = time.perf_counter()
+    ready = scheduler.wait(0)
+    elapsed = time.perf_counter() - time_begin
+
+    assert not ready
+    assert scheduler.dropped == 1
+    assert 0.03 <= elapsed < 0.06
+
+    # 1, 2, 4, 4, ... ms apart - a handful of polls instead of a spin
+    intervals = [b - a for a, b in zip(dac.polls, dac.polls[1:])]
+
+    assert len(dac.polls) <= 12
+    assert intervals[0] >= 0.001 and intervals[1] >= 0.002
+    assert all(interval >= 0.004 for interval in intervals[2:-1])
+
+
+def test_sleeps_while_busy_and_learns_overhead():
+    dac = FakeHeliosDAC(transfer_latency=0.01)
+    scheduler = ReadinessScheduler(dac)
+    frame = (HeliosPoint * 30)()
+
+    for _ in range(10):
+        assert scheduler.wait(0)
+        dac.WriteFrame(0, 30000, 0, frame, 30)
+        scheduler.wrote(0, 30, 30000)
+
+    polls = scheduler.polls
+    time_begin = time.perf_counter()
+
+    assert scheduler.wait(0)
+    assert time.perf_counter() - time_begin >= 0.01
+    assert scheduler.polls - polls <= 4   # slept through the busy time instead of polling it
+
+    assert abs(scheduler.device(0).overhead - 0.01) < 0.003
+    assert scheduler.dropped == 0
@@ -0,0 +1,77 @@
+#
+# Tests of the latency-compensated target tracker (tracker.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.tracker import TargetTracker, LatencyEstimator
+
+
+def boxes_at(centers, size=40.0):
+    centers = np.asarray(centers, dtype=np.float64)
+    return np.concatenate([centers - size / 2, centers + size / 2], axis=1)
+
+
+def test_tracks_keep_their_ids():
+    tracker = TargetTracker(min_frames=3)
+    velocity = np.array([[300.0, 0.0], [0.0, -200.0]])
+    origin = np.array([[100.0, 100.0], [600.0, 500.0]])
+
+    for frame in range(30):
+        t = frame / 30.0
+        ids = tracker.update(boxes_at(origin + velocity * t), timestamp=t)
+
+        if frame == 0:
+            first = ids
+
+        assert list(ids) == list(first)
+        assert tracker.confirmed.all() == (frame >= 2)
+
+
+def test_predicts_ahead_by_latency():
+    tracker = TargetTracker()
+    velocity = np.array([300.0, -150.0])
+    origin = np.array([200.0, 400.0])
+
+    for frame in range(20):
+        t = frame / 30.0
+        tracker.update(boxes_at([origin + velocity * t]), timestamp=t)
+
+    ids, centers = tracker.predict(latency=0.06)
+    truth = origin + velocity * (t + 0.06)
+
+    assert len(ids) == 1
+    assert np.linalg.norm(centers[0] - truth) < 2.0
+    assert np.linalg.norm(tracker.state[0, 2:] - velocity) < 10.0
+
+
+def test_lost_tracks_dropped():
+    tracker = TargetTracker(drop_frames=5)
+
+    for frame in range(3):
+        tracker.update(boxes_at([[300.0, 300.0]]), timestamp=frame / 30.0)
+
+    for frame in range(3, 8):
+        tracker.update(np.zeros((0, 4)), timestamp=frame / 30.0)
+        assert len(tracker) == 1
+
+        ids, centers = tracker.predict()
+        assert len(ids) == 0   # lost tracks aren't aimed at
+
+    tracker.update(np.zeros((0, 4)), timestamp=8 / 30.0)   # lost for more than drop_frames
+    assert len(tracker) == 0
+
+
+def test_latency_estimator():
+    latency = LatencyEstimator(smoothing=0.5)
+
+    assert latency.update(0.04) == 0.04
+    assert latency.update(0.02) == 0.03
+    assert latency.samples == 2
@@ -0,0 +1,183 @@
+#
+# Tests of the laser writer threads (writer.py) against the simulated DAC.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import time
+import threading
+
+import numpy as np
+
+EXAMPLES_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(EXAMPLES_DIR)
+
+from laser_guidance.writer import Mailbox, LaserWriter, LaserTransform
+from laser_guidance.safety import ExclusionMask
+from laser_guidance.simulator import FakeHeliosDAC
+
+
+def wait_for(condition, timeout=2.0):
+    """
+    Wait until the condition is true (returns it, so a timeout fails the assert).
+    """
+    time_end = time.monotonic() + timeout
+
+    while not condition() and time.monotonic() < time_end:
+        time.sleep(0.001)
+
+    return condition()
+
+
+def test_mailbox_keeps_newest():
+    mailbox = Mailbox()
+
+    assert mailbox.take(timeout=0.01) is None
+    assert mailbox.post(1) is None
+    assert mailbox.post(2) == 1
+    assert mailbox.post(3) == 2
+    assert mailbox.take(timeout=0.01) == 3
+    assert mailbox.take(timeout=0.01) is None
+
+    assert (mailbox.posted, mailbox.taken, mailbox.dropped) == (3, 1, 2)
+
+
+def test_mailbox_hands_each_item_out_once():
+    mailbox = Mailbox()
+    taken = []
+    replaced = []
+    done = threading.Event()
+
+    def consume():
+        while not done.is_set() or mailbox.posted != mailbox.taken + mailbox.dropped:
+            item = mailbox.take(timeout=0.01)
+
+            if item is not None:
+                taken.append(item)
+
+    consumer = threading.Thread(target=consume)
+    consumer.start()
+
+    for n in range(20000):
+        item = mailbox.post(n)
+
+        if item is not None:
+            replaced.append(item)
+
+    done.set()
+    consumer.join(5.0)
+
+    assert not consumer.is_alive()
+    assert taken == sorted(taken)                             # in the order they were posted
+    assert sorted(taken + replaced) == list(range(20000))   # each either taken or replaced, never both
+    assert taken[-1] == 19999                                 # the newest isn't lost
+
+
+def test_writer_writes_latest_frame_and_closes():
+    dac = FakeHeliosDAC(num_devices=1)
+    writer = LaserWriter(dac)
+    writer.start()
+
+    assert dac.is_open
+
+    for n in range(50):
+        writer.submit([(n, n)])
+
+    assert wait_for(lambda: dac.frames[0] and dac.frames[0][-1][0][:2] == (49, 49))
+
+    writer.stop()
+
+    assert not writer.is_alive()
+    assert not any(worker.is_alive() for worker in writer.workers)
+    assert not dac.is_open
+
+    written = [frame[0][0] for frame in dac.frames[0]]
+    assert written == sorted(written)   # never an older frame after a newer one
+
+
+def test_writer_stops_without_frames():
+    dac = FakeHeliosDAC(num_devices=2)
+    writer = LaserWriter(dac)
+    writer.start()
+    writer.stop()
+
+    assert not writer.is_alive()
+    assert not dac.is_open
+    assert dac.total_writes == 0
+
+
+def test_broadcast_to_each_device():
+    dac = FakeHeliosDAC(num_devices=3, transfer_latency=0.001)
+    writer = LaserWriter(dac)
+    writer.start()
+
+    assert len(writer.workers) == 3
+
+    for n in range(100):
+        writer.submit(writer.acquire().set(np.array([(n, n)])))
+
+    assert wait_for(lambda: all(frames and frames[-1][0][:2] == (99, 99) for frames in dac.frames))
+
+    writer.stop()
+
+    # a buffer goes back to the pool once every device has written or dropped it
+    assert len(writer.pool.free) == writer.pool.size
+    assert all(worker.frames_written + worker.mailbox.dropped + worker.not_ready == 100 for worker in writer.workers)
+
+
+def test_per_device_transform():
+    transform = LaserTransform(np.array([[1, 0, 100], [0, 1, 200], [0, 0, 1]]))
+    dac = FakeHeliosDAC(num_devices=2)
+    writer = LaserWriter(dac, transforms={1: transform})
+    writer.start()
+
+    buffer = writer.acquire().set(np.array([(1000, 2000)]))
+    writer.submit(buffer)
+
+    assert wait_for(lambda: all(dac.frames))
+
+    writer.stop()
+
+    assert dac.frames[0][-1][0][:2] == (1000, 2000)
+    assert dac.frames[1][-1][0][:2] == (1100, 2200)
+    assert buffer.points[0].x == 1000   # the submitted frame is left as it was
+
+
+def test_transform_cannot_move_points_into_zone():
+    mask = ExclusionMask()
+    mask.add_polygon([(3500, 0), (3700, 0), (3700, 4095), (3500, 4095)])
+
+    # the device is aimed 500 DAC units further right, so x=3800 gets clipped to its edge at
+    # x=4095, which is where the frame's x=3595 (inside the zone) lands
+    transform = LaserTransform(np.array([[1, 0, 500], [0, 1, 0], [0, 0, 1]]))
+    dac = FakeHeliosDAC(num_devices=2)
+    writer = LaserWriter(dac, transforms={1: transform}, mask=mask)
+    writer.start()
+
+    writer.submit(writer.acquire().set(np.array([(3800, 2000), (1000, 2000)]), color=(255, 0, 0, 255)))
+
+    assert wait_for(lambda: all(dac.frames))
+
+    writer.stop()
+
+    assert [point[2] for point in dac.frames[0][-1]] == [255, 255]
+    assert [point[:3] for point in dac.frames[1][-1]] == [(4095, 2000, 0), (1500, 2000, 255)]
+    assert writer.workers[1].blanked == 1 and mask.blanked == 0
+
+
+def test_frames_written_counted_once():
+    dac = FakeHeliosDAC(num_devices=4, history=1000)
+    writer = LaserWriter(dac)
+    writer.start()
+
+    for n in range(500):
+        writer.submit(writer.acquire().set(np.array([(n, n)])))
+
+        if n % 10 == 0:
+            time.sleep(0.0005)
+
+    writer.stop()
+
+    written = {frame[0][0] for frames in dac.frames for frame in frames}
+    assert writer.frames_written == len(written)
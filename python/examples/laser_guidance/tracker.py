@@ -0,0 +1,284 @@
+#
+# Predictive target tracking with latency compensation.
+#
+# By the time a point reaches the DAC, the detection it came from is already
+# one capture, one net.Detect() and one DAC write old, so aiming at the raw
+# detection.Center always trails a moving target.  TargetTracker associates
+# detections across frames (by IoU, falling back to centroid distance), runs
+# a constant-velocity Kalman filter per track, and predicts where each track
+# will be once the measured pipeline latency has elapsed.
+#
+# The track state for all of the tracks is kept in arrays, so the predict and
+# update steps of the filters run as batched numpy operations.
+#
+import time
+
+import numpy as np
+
+
+def box_iou(a, b):
+    """
+    Intersection-over-union between each of the (M,4) boxes a and (N,4) boxes b,
+    given as (left, top, right, bottom).  Returns an (M,N) matrix.
+    """
+    a = a[:, None, :]
+    b = b[None, :, :]
+
+    width = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    height = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    intersection = width * height
+
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+
+    return intersection / np.maximum(area_a + area_b - intersection, 1e-9)
+
+
+def greedy_match(scores, threshold, maximize=True):
+    """
+    Greedily pair rows and columns of a score matrix, best score first,
+    skipping pairs that don't pass the threshold.  Returns a list of (row, col).
+    """
+    scores = np.array(scores, dtype=np.float64)
+
+    if not maximize:
+        scores = -scores
+        threshold = -threshold
+
+    matches = []
+
+    while scores.size > 0:
+        row, col = np.unravel_index(np.argmax(scores), scores.shape)
+
+        if scores[row, col] < threshold or not np.isfinite(scores[row, col]):
+            break
+
+        matches.append((int(row), int(col)))
+        scores[row, :] = -np.inf
+        scores[:, col] = -np.inf
+
+    return matches
+
+
+class LatencyEstimator:
+    """
+    Exponential moving average of a latency (in seconds).
+    """
+    def __init__(self, initial=0.0, smoothing=0.1):
+        self.value = initial
+        self.smoothing = smoothing
+        self.samples = 0
+
+    def update(self, latency):
+        if self.samples == 0:
+            self.value = latency
+        else:
+            self.value += self.smoothing * (latency - self.value)
+
+        self.samples += 1
+        return self.value
+
+
+class TargetTracker:
+    """
+    Multi-target tracker with a constant-velocity Kalman filter per track.
+
+    Usage:
+        tracker = TargetTracker()
+        tracker.update(detection_boxes(detections), timestamp=capture_time)
+        ids, centers = tracker.predict(capture_time + latency)
+
+    The parameter names and defaults follow the objectTrackerIOU from c/tracking.
+    """
+    def __init__(self, min_frames=3, drop_frames=15, overlap_threshold=0.5, max_distance=80.0,
+                 process_noise=2000.0, measurement_noise=4.0):
+        """
+        Parameters:
+            min_frames (int) -- the number of re-identified frames before a track is established
+            drop_frames (int) -- the number of consecutive lost frames after which a track is removed
+            overlap_threshold (float) -- minimum IoU to associate a detection with a track
+            max_distance (float) -- maximum centroid distance (pixels) for detections that didn't overlap
+            process_noise (float) -- acceleration noise of the motion model (pixels/s^2)
+            measurement_noise (float) -- standard deviation of the detection centers (pixels)
+        """
+        self.min_frames = min_frames
+        self.drop_frames = drop_frames
+        self.overlap_threshold = overlap_threshold
+        self.max_distance = max_distance
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+
+        self.time = None
+        self.next_id = 0
+
+        self.ids = np.zeros(0, dtype=np.int64)         # (M,) track IDs
+        self.state = np.zeros((0, 4))                  # (M,4) cx, cy, vx, vy
+        self.covariance = np.zeros((0, 4, 4))          # (M,4,4) state covariance
+        self.size = np.zeros((0, 2))                   # (M,2) box width, height
+        self.confidence = np.zeros(0)                  # (M,) last detection confidence
+        self.hits = np.zeros(0, dtype=np.int64)        # (M,) number of frames the track was detected in
+        self.misses = np.zeros(0, dtype=np.int64)      # (M,) consecutive frames the track was lost for
+        self.age = np.zeros(0, dtype=np.int64)         # (M,) number of frames since the track was created
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def confirmed(self):
+        """
+        Boolean mask of the tracks that have been detected in at least min_frames.
+        """
+        return self.hits >= self.min_frames
+
+    @property
+    def boxes(self):
+        """
+        The (M,4) current track boxes as (left, top, right, bottom).
+        """
+        half = self.size * 0.5
+        return np.concatenate([self.state[:, :2] - half, self.state[:, :2] + half], axis=1)
+
+    def advance(self, dt):
+        """
+        Run the Kalman predict step on all tracks for dt seconds.
+        """
+        if dt <= 0 or len(self) == 0:
+            return
+
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+
+        # white-noise acceleration model
+        q = self.process_noise ** 2
+        Q = np.zeros((4, 4))
+        Q[[0, 1], [0, 1]] = q * dt ** 4 / 4
+        Q[[0, 1], [2, 3]] = Q[[2, 3], [0, 1]] = q * dt ** 3 / 2
+        Q[[2, 3], [2, 3]] = q * dt ** 2
+
+        self.state = self.state @ F.T
+        self.covariance = F @ self.covariance @ F.T + Q
+
+    def correct(self, index, centers):
+        """
+        Run the Kalman update step on the given tracks with their measured centers.
+        """
+        P = self.covariance[index]
+        S = P[:, :2, :2] + np.eye(2) * self.measurement_noise ** 2
+        K = P[:, :, :2] @ np.linalg.inv(S)
+
+        residual = centers - self.state[index, :2]
+
+        self.state[index] += (K @ residual[:, :, None])[:, :, 0]
+        self.covariance[index] = P - K @ P[:, :2, :]
+
+    def update(self, boxes, confidence=None, timestamp=None):
+        """
+        Update the tracks with the detections from a new frame.
+
+        Parameters:
+            boxes (array) -- (N,4) detection boxes as (left, top, right, bottom)
+            confidence (array) -- (N,) detection confidences (optional)
+            timestamp (float) -- time the frame was captured (defaults to time.perf_counter())
+
+        Returns an (N,) array with the track ID assigned to each detection.
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        confidence = np.ones(len(boxes)) if confidence is None else np.asarray(confidence, dtype=np.float64)
+        timestamp = time.perf_counter() if timestamp is None else timestamp
+
+        if self.time is not None:
+            self.advance(timestamp - self.time)
+
+        self.time = timestamp
+        self.age += 1
+
+        centers = (boxes[:, :2] + boxes[:, 2:]) * 0.5
+        assigned = np.full(len(boxes), -1, dtype=np.int64)
+
+        # associate by overlap first, then by distance for the leftovers
+        matches = greedy_match(box_iou(self.boxes, boxes), self.overlap_threshold) if len(self) and len(boxes) else []
+
+        unmatched_tracks = np.setdiff1d(np.arange(len(self)), [m[0] for m in matches])
+        unmatched_boxes = np.setdiff1d(np.arange(len(boxes)), [m[1] for m in matches])
+
+        if len(unmatched_tracks) and len(unmatched_boxes):
+            distance = np.linalg.norm(self.state[unmatched_tracks, None, :2] - centers[None, unmatched_boxes], axis=-1)
+            matches += [(unmatched_tracks[t], unmatched_boxes[b]) for t, b in greedy_match(distance, self.max_distance, maximize=False)]
+
+        if matches:
+            tracks, detections = np.array(matches).T
+            self.correct(tracks, centers[detections])
+            self.size[tracks] = boxes[detections, 2:] - boxes[detections, :2]
+            self.confidence[tracks] = confidence[detections]
+            self.hits[tracks] += 1
+            assigned[detections] = self.ids[tracks]
+
+        # tracks that weren't detected in this frame
+        lost = np.ones(len(self), dtype=bool)
+
+        if matches:
+            lost[tracks] = False
+
+        self.misses[lost] += 1
+        self.misses[~lost] = 0
+
+        # start new tracks from the detections that didn't match any
+        new = np.flatnonzero(assigned < 0)
+
+        if len(new):
+            new_ids = np.arange(self.next_id, self.next_id + len(new))
+            self.next_id += len(new)
+
+            covariance = np.zeros((len(new), 4, 4))
+            covariance[:, [0, 1], [0, 1]] = self.measurement_noise ** 2
+            covariance[:, [2, 3], [2, 3]] = (self.max_distance * 10.0) ** 2   # unknown velocity
+
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.state = np.concatenate([self.state, np.concatenate([centers[new], np.zeros((len(new), 2))], axis=1)])
+            self.covariance = np.concatenate([self.covariance, covariance])
+            self.size = np.concatenate([self.size, boxes[new, 2:] - boxes[new, :2]])
+            self.confidence = np.concatenate([self.confidence, confidence[new]])
+            self.hits = np.concatenate([self.hits, np.ones(len(new), dtype=np.int64)])
+            self.misses = np.concatenate([self.misses, np.zeros(len(new), dtype=np.int64)])
+            self.age = np.concatenate([self.age, np.zeros(len(new), dtype=np.int64)])
+
+            assigned[new] = new_ids
+
+        # drop the tracks that have been lost for too long
+        keep = self.misses <= self.drop_frames
+
+        if not keep.all():
+            for name in ('ids', 'state', 'covariance', 'size', 'confidence', 'hits', 'misses', 'age'):
+                setattr(self, name, getattr(self, name)[keep])
+
+        return assigned
+
+    def predict(self, at_time=None, latency=0.0, confirmed=True):
+        """
+        Predict the track centers at a future time, without changing the filters.
+
+        Parameters:
+            at_time (float) -- the time to predict at (defaults to the last update time)
+            latency (float) -- additional seconds to predict ahead of at_time
+            confirmed (bool) -- if true, only return established tracks that were seen in the last frame
+
+        Returns (ids, centers) with the (K,) track IDs and (K,2) predicted centers in pixels.
+        """
+        if self.time is None:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 2))
+
+        dt = (self.time if at_time is None else at_time) - self.time + latency
+        mask = (self.confirmed & (self.misses == 0)) if confirmed else np.ones(len(self), dtype=bool)
+
+        centers = self.state[mask, :2] + self.state[mask, 2:] * dt
+        return self.ids[mask], centers
+
+    def predict_boxes(self, at_time=None, latency=0.0, confirmed=True):
+        """
+        Like predict(), but returns (ids, boxes, confidence) with the (K,4) track boxes
+        moved to their predicted centers, and the last detection confidence of each.
+        """
+        ids, centers = self.predict(at_time, latency, confirmed)
+        mask = np.isin(self.ids, ids)
+        half = self.size[mask] * 0.5
+        return ids, np.concatenate([centers - half, centers + half], axis=1), self.confidence[mask]
@@ -0,0 +1,475 @@
+#
+# Background laser output threads.
+#
+# The detection loop should never wait on the DAC.  Instead it posts the
+# newest frame into a single-slot Mailbox and carries on with the next
+# Capture/Detect, while a worker thread waits for the device to become ready
+# and writes whatever frame is the most recent at that moment.  Frames that
+# were superseded before the DAC could take them are dropped (and counted)
+# rather than queued up.
+#
+# With several DACs attached, each one gets its own DeviceWorker thread and
+# mailbox, and every frame is broadcast to all of them - so the devices are
+# waited on and written to in parallel (ctypes releases the GIL during the
+# library calls) and the output latency doesn't grow with the device count.
+# Each worker can apply its own coordinate transform, so that every projector
+# can have its own calibration.
+#
+import json
+import time
+import ctypes
+import threading
+import traceback
+import collections
+
+import numpy as np
+
+from .helios import (load_helios, make_frame, point_view, HELIOS_MAX_COORD, HELIOS_MAX_POINTS,
+                     DEFAULT_LIBRARY, DEFAULT_PPS, DEFAULT_FLAGS, DEFAULT_COLOR)
+from .buffers import FrameBuffer, FramePool
+from .tracker import LatencyEstimator
+from .scheduler import ReadinessScheduler
+
+
+class Mailbox:
+    """
+    Lock-free single-slot mailbox - posting a new item replaces any item that
+    hasn't been taken yet.  It relies on deque.pop(), deque.popleft() and
+    deque.append() being atomic, so the producer never blocks on the consumer,
+    and an item is either taken by the consumer or handed back to the producer
+    as replaced - never both.
+    """
+    def __init__(self):
+        self._slot = collections.deque(maxlen=1)
+        self._event = threading.Event()
+
+        self.posted = 0    # number of items posted
+        self.taken = 0     # number of items handed to the consumer
+        self.dropped = 0   # number of items replaced before they were taken
+
+    def post(self, item):
+        """
+        Post an item, replacing the previous one if it hasn't been taken yet.
+        This never blocks and is safe to call from the producer thread.
+        Returns the item that was replaced, or None.
+        """
+        try:
+            replaced = self._slot.pop()
+            self.dropped += 1
+        except IndexError:
+            replaced = None
+
+        self._slot.append(item)
+        self.posted += 1
+        self._event.set()
+
+        return replaced
+
+    def take(self, timeout=None):
+        """
+        Wait for and return the newest item, or None if the timeout expired.
+        This should only be called from the single consumer thread.
+        """
+        if not self._event.wait(timeout):
+            return None
+
+        self._event.clear()
+
+        try:
+            item = self._slot.popleft()
+        except IndexError:
+            return None
+
+        self.taken += 1
+        return item
+
+
+class LaserTransform:
+    """
+    Projective transform applied to laser coordinates, to aim a device whose
+    projector is mounted differently from the one the frames were mapped for.
+    """
+    def __init__(self, matrix=None):
+        """
+        Parameters:
+            matrix (array) -- 3x3 homography from the frame's DAC coordinates to the device's
+        """
+        self.matrix = np.eye(3) if matrix is None else np.asarray(matrix, dtype=np.float64).reshape(3, 3)
+
+    @staticmethod
+    def fit(source, destination):
+        """
+        Fit the transform from corresponding (N,2) DAC coordinates (N >= 4), for example
+        the same calibration targets hit by the reference projector and by this one.
+        """
+        from .calibration import fit_homography
+        return LaserTransform(fit_homography(np.asarray(source, dtype=np.float64),
+                                             np.asarray(destination, dtype=np.float64)))
+
+    @staticmethod
+    def load(path):
+        """
+        Load per-device transforms from a JSON file of {"device": 3x3 matrix}.
+        Returns a dict of {device: LaserTransform}.
+        """
+        with open(path) as file:
+            return {int(device): LaserTransform(matrix) for device, matrix in json.load(file).items()}
+
+    def inverse(self):
+        """
+        Return the transform from the device's DAC coordinates back to the frame's.
+        """
+        return LaserTransform(np.linalg.inv(self.matrix))
+
+    def __call__(self, coords):
+        """
+        Transform an (N,2) array of DAC coordinates, returning an (N,2) uint16 array.
+        """
+        coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+        projected = coords @ self.matrix[:, :2].T + self.matrix[:, 2]
+        projected = projected[:, :2] / projected[:, 2:]
+        return np.clip(np.rint(projected), 0, HELIOS_MAX_COORD).astype(np.uint16)
+
+
+class Broadcast:
+    """
+    A frame posted to every device worker.  The frame's buffer goes back to the pool
+    once the last worker is done with it (written or dropped).
+    """
+    __slots__ = ('frame', 'points', 'count', 'remaining', 'written', 'lock')
+
+    def __init__(self, frame, points, count, workers):
+        self.frame = frame
+        self.points = points
+        self.count = count
+        self.remaining = workers
+        self.written = 0
+        self.lock = threading.Lock()
+
+    def done(self, writer, written):
+        """
+        Called by each worker when it has written (or dropped) the frame.
+        """
+        with self.lock:
+            self.remaining -= 1
+            self.written += written
+            last = self.remaining == 0
+
+        if not last:
+            return
+
+        timestamp = self.frame.timestamp if isinstance(self.frame, FrameBuffer) else None
+
+        if self.written:
+            # the last workers of different frames can finish at the same time
+            with writer.lock:
+                writer.frames_written += 1
+
+                if timestamp is not None:
+                    writer.latency.update(time.perf_counter() - timestamp)
+
+            if timestamp is not None and writer.profiler is not None:
+                writer.profiler.record('capture->write', int(timestamp * 1e9))
+
+        if isinstance(self.frame, FrameBuffer):
+            self.frame.release()
+
+
+class DeviceWorker(threading.Thread):
+    """
+    Thread that waits on and writes the newest broadcast frame to one DAC.
+    """
+    def __init__(self, writer, device, transform=None):
+        """
+        Parameters:
+            writer (LaserWriter) -- the writer that owns the library handle and settings
+            device (int) -- index of the DAC
+            transform (callable) -- optional per-device mapping of (N,2) DAC coordinates
+                                    (if it has an inverse(), the transformed points are
+                                    checked against the writer's exclusion mask again)
+        """
+        super().__init__(name=f"{writer.name}-{device}", daemon=True)
+
+        self.writer = writer
+        self.device = device
+        self.transform = transform
+        self.inverse = transform.inverse() if hasattr(transform, 'inverse') else None
+        self.mailbox = Mailbox()
+        self.buffer = FrameBuffer(writer.pool.capacity) if transform is not None else None
+
+        self.frames_written = 0   # number of frames written to this device
+        self.not_ready = 0        # number of frames dropped because the device missed the ready deadline
+        self.blanked = 0          # number of points the transform moved into an exclusion zone
+        self.write_time = 0.0     # total seconds spent waiting on and writing to the device
+
+    def post(self, broadcast):
+        """
+        Post a frame to the worker, releasing the frame it replaced (if any).
+        """
+        replaced = self.mailbox.post(broadcast)
+
+        if replaced is not None:
+            replaced.done(self.writer, False)
+
+    def run(self):
+        while True:
+            broadcast = self.mailbox.take(timeout=0.25)
+
+            if broadcast is None:
+                if not self.writer.run_flag:
+                    break
+                continue
+
+            written = False
+
+            try:
+                written = self.write(broadcast.points, broadcast.count)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                broadcast.done(self.writer, written)
+
+    def write(self, points, num_points):
+        """
+        Wait for the device to be ready and write the first num_points of a ctypes HeliosPoint array.
+        Returns true if the frame was written.
+        """
+        writer = self.writer
+        profiler = writer.profiler
+
+        if num_points == 0:
+            return False
+
+        if self.transform is not None:
+            view = self.buffer.view[:num_points]
+            view[:] = point_view(points)[:num_points]
+            coords = self.transform(np.stack([view['x'], view['y']], axis=1))
+            view['x'] = coords[:,0]
+            view['y'] = coords[:,1]
+            points = self.buffer.points
+
+            # rounding and clipping to the DAC range can put a point inside a zone
+            if writer.mask is not None and writer.mask.active and self.inverse is not None:
+                hit = writer.mask.contains(self.inverse(coords))
+                hit &= (view['r'] | view['g'] | view['b'] | view['i']) > 0
+
+                if hit.any():
+                    for channel in ('r', 'g', 'b', 'i'):
+                        view[channel][hit] = 0
+                    self.blanked += int(np.count_nonzero(hit))
+
+        time_begin = time.perf_counter()
+        span_begin = time.perf_counter_ns()
+        ready = writer.scheduler.wait(self.device)
+        span_end = time.perf_counter_ns()
+
+        if profiler is not None:
+            profiler.record('status wait', span_begin, span_end)
+
+        if not ready:
+            self.not_ready += 1
+            return False
+
+        writer.lib.WriteFrame(self.device, writer.pps, writer.flags, points, num_points)
+        writer.scheduler.wrote(self.device, num_points, writer.pps)
+
+        if writer.recorder is not None:
+            writer.recorder.points(time.perf_counter(), self.device, points, num_points)
+
+        if profiler is not None:
+            profiler.record('WriteFrame', span_end)
+
+        self.write_time += time.perf_counter() - time_begin
+        self.frames_written += 1
+        return True
+
+
+class LaserWriter(threading.Thread):
+    """
+    Thread that owns the Helios DAC(s), with a DeviceWorker thread per device that writes
+    the latest submitted frame to it.
+
+    Usage:
+        writer = LaserWriter()
+        writer.start()              # opens the DAC(s) from the writer thread
+        writer.submit([(x, y)])     # returns immediately
+
+        buffer = writer.acquire()   # or fill a preallocated buffer in place
+        buffer.set(coords)
+        writer.submit(buffer)       # the buffer goes back to the pool once written
+        ...
+        writer.stop()               # closes the DAC(s)
+    """
+    def __init__(self, library=DEFAULT_LIBRARY, pps=DEFAULT_PPS, flags=DEFAULT_FLAGS,
+                 color=DEFAULT_COLOR, scheduler=None, max_points=HELIOS_MAX_POINTS,
+                 profiler=None, transforms=None, recorder=None, mask=None, name='laser-writer'):
+        """
+        Parameters:
+            library (string or object) -- path to libHeliosDacAPI.so, or an object with the
+                                          same functions (e.g. simulator.FakeHeliosDAC)
+            pps (int) -- output rate in points per second
+            flags (int) -- flags passed to WriteFrame()
+            color (tuple) -- default (r, g, b, i) used for frames submitted as (x, y) points
+            scheduler (ReadinessScheduler) -- waits for the devices to be ready (created if not given)
+            max_points (int) -- capacity of the buffers returned by acquire()
+            profiler (SpanRecorder) -- if set, the status wait, WriteFrame and end-to-end
+                                       latency of each frame are recorded to it
+            transforms (dict or list) -- per-device coordinate transforms (e.g. LaserTransform),
+                                         indexed by device - devices without one get the frame as-is
+            recorder (Recorder) -- if set, the points written to each device are recorded to it
+            mask (ExclusionMask) -- if set, the lit points of every submitted frame that are inside
+                                    one of its zones are blanked (before the per-device transforms,
+                                    and again after them on the devices that have one)
+        """
+        super().__init__(name=name, daemon=True)
+
+        self.library = library
+        self.pps = pps
+        self.flags = flags
+        self.color = color
+        self.scheduler = scheduler if scheduler is not None else ReadinessScheduler()
+        self.profiler = profiler
+        self.transforms = transforms
+        self.recorder = recorder
+        self.mask = mask
+
+        self.lib = None
+        self.num_devices = 0
+        self.workers = []
+        self.pool = FramePool(max_points)
+        self.run_flag = False
+        self.opened = threading.Event()
+        self.stopped = threading.Event()
+        self.error = None
+
+        self.lock = threading.Lock()   # guards the frame counter and the latency estimate
+        self.frames_written = 0   # number of frames written (to at least one device)
+        self.latency = LatencyEstimator()   # capture -> DAC write latency of timestamped buffers
+
+    def start(self):
+        """
+        Start the thread and wait for it to open the DAC(s).
+        Raises the error from the writer thread if the devices couldn't be opened.
+        """
+        self.run_flag = True
+        super().start()
+        self.opened.wait()
+
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=1.0):
+        """
+        Signal the threads to exit, wait for them to close the DAC(s).
+        """
+        self.run_flag = False
+        self.stopped.set()
+
+        for worker in self.workers:
+            worker.post(None)   # wake the workers up so they exit
+
+        if self.is_alive():
+            self.join(timeout)
+
+    def acquire(self):
+        """
+        Get an empty FrameBuffer from the writer's pool to fill and submit().
+        """
+        return self.pool.acquire()
+
+    def submit(self, frame):
+        """
+        Post the next frame to every device, replacing any frame that hasn't been written yet.
+        The frame can be a FrameBuffer, a ctypes HeliosPoint array, or a sequence of (x, y)
+        laser coordinates (which gets converted using the default color).  The points in the
+        exclusion mask are blanked in place.  This never blocks on the DAC.
+        """
+        if isinstance(frame, FrameBuffer):
+            points, count = frame.points, frame.count
+        else:
+            if not isinstance(frame, ctypes.Array):
+                frame = make_frame(frame, self.color)
+            points, count = frame, len(frame)
+
+        if self.mask is not None:
+            self.mask.apply(point_view(points)[:count])
+
+        if not self.workers:
+            if isinstance(frame, FrameBuffer):
+                frame.release()
+            return
+
+        broadcast = Broadcast(frame, points, count, len(self.workers))
+
+        for worker in self.workers:
+            worker.post(broadcast)
+
+    @property
+    def frames_dropped(self):
+        """
+        The number of submitted frames that were replaced before a device could write them
+        (counted per device).
+        """
+        return sum(worker.mailbox.dropped for worker in self.workers)
+
+    @property
+    def not_ready(self):
+        """
+        The number of device writes dropped because the DAC missed the ready deadline.
+        """
+        return sum(worker.not_ready for worker in self.workers)
+
+    @property
+    def write_time(self):
+        """
+        The total seconds the device workers spent waiting on and writing to the DACs.
+        """
+        return sum(worker.write_time for worker in self.workers)
+
+    def run(self):
+        """
+        Open the DAC(s) and start a worker for each, then close them once stopped.
+        """
+        try:
+            self.open()
+        except Exception as error:
+            self.error = error
+            self.run_flag = False
+            return
+        finally:
+            self.opened.set()
+
+        try:
+            self.stopped.wait()
+
+            for worker in self.workers:
+                worker.join()
+        finally:
+            self.lib.CloseDevices()
+
+    def open(self):
+        """
+        Load the library (if a path was given), open the devices and start their workers.
+        """
+        if isinstance(self.library, str):
+            self.lib, self.num_devices = load_helios(self.library)
+        else:
+            self.lib = self.library
+            self.num_devices = self.lib.OpenDevices()
+
+            if self.num_devices < 1:
+                raise Exception("No Helios DAC devices found")
+
+        self.scheduler.lib = self.lib
+
+        transforms = self.transforms
+
+        if transforms is None:
+            transforms = {}
+        elif not isinstance(transforms, dict):
+            transforms = dict(enumerate(transforms))
+
+        self.workers = [DeviceWorker(self, device, transforms.get(device)) for device in range(self.num_devices)]
+
+        for worker in self.workers:
+            worker.start()
@@ -37,7 +37,7 @@ from dash.exceptions import PreventUpdate
 from config import config, print_config
 from server import Server
 
-from layout import create_grid, create_navbar, create_alerts, create_stream_dialog, create_model_dialog, create_actions_dialog
+from layout import create_grid, create_navbar, create_alerts, create_updates, create_stream_dialog, create_model_dialog, create_actions_dialog
 
 
 # create the dash app
@@ -65,18 +65,19 @@ app.layout = dash.html.Div([
     create_stream_dialog(),
     create_model_dialog(),
     create_actions_dialog(),
-    dcc.Store(id='server_resources'),
-    dcc.Interval(id='server_refresh_timer', interval=config['dash']['refresh'])
+    create_updates(),
+    dcc.Store(id='server_resources')
 ], className='dbc')
 
 
 @app.callback(Output('server_resources', 'data'),
+              Input('server_resources_version', 'data'),
               Input('server_refresh_timer', 'n_intervals'),
               Input('server_resources', 'data'))
-def on_refresh(n_intervals, previous_resources):
+def on_refresh(resources_version, n_intervals, previous_resources):
     """
-    Get the latest resources config from the server.
-    This can trigger updates to the clientside nav structure.
+    Get the latest resources config from the server when it pushes a change (or polling it
+    while the push channel is disconnected).  This can trigger updates to the clientside nav structure.
     """
     try:
         server_resources = Server.request('/resources').json()
@@ -104,6 +105,7 @@ if __name__ == '__main__':
     parser.add_argument("--ssl-key", default=os.getenv('SSL_KEY'), type=str, help="path to PEM-encoded SSL/TLS key file for enabling HTTPS")
     parser.add_argument("--ssl-cert", default=os.getenv('SSL_CERT'), type=str, help="path to PEM-encoded SSL/TLS certificate file for enabling HTTPS")
     parser.add_argument("--resources", default=None, type=str, help="path to JSON config file to load initial server resources from")
+    parser.add_argument("--in-process", action="store_true", help="run the backend server on a thread of this process, and call it without HTTP")
     
     args = parser.parse_args()
 
@@ -122,6 +124,9 @@ if __name__ == '__main__':
     if args.resources:
         config['server']['resources'] = args.resources
         
+    if args.in_process:
+        config['server']['in_process'] = True
+        
     print_config(config)
     
     # check if HTTPS/SSL requested
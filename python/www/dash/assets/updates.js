@@ -0,0 +1,61 @@
+/*
+ * clientside subscriber of the backend server's /updates push channel (Server-Sent Events)
+ */
+var updateSource = null;
+var updateVersions = {};
+
+if (!window.dash_clientside) {
+    window.dash_clientside = {};
+}
+
+window.dash_clientside.updates =
+{
+    // this function gets called from the dash app with the config from layout/updates.py
+    connect: function(updateConfig)
+    {
+		if( updateSource || !updateConfig )
+			return window.dash_clientside.no_update;
+
+		// the stores are set with dash_clientside.set_props() (dash 2.16 and newer)
+		if( !window.dash_clientside.set_props )
+		{
+			console.warn("dash_clientside.set_props() isn't supported, polling the server instead of subscribing to updates");
+			return window.dash_clientside.no_update;
+		}
+
+		// get the URL of /updates on the backend server
+		var protocol = updateConfig['ssl'] ? 'https://' : 'http://';
+		var url = protocol + window.location.hostname + ':' + updateConfig['port'] + updateConfig['path'];
+		console.log("updates URL:  " + url);
+
+		updateSource = new EventSource(url);
+
+		updateSource.addEventListener('open', function() {
+			// stop polling while the changes are pushed
+			console.log("subscribed to updates from %s", url);
+			window.dash_clientside.set_props(updateConfig['timer'], {disabled: true});
+		});
+
+		updateSource.addEventListener('error', function() {
+			// poll until the EventSource reconnects (it retries on its own)
+			console.warn("lost connection to %s, polling the server until it reconnects", url);
+			updateVersions = {};
+			window.dash_clientside.set_props(updateConfig['timer'], {disabled: false});
+		});
+
+		updateSource.addEventListener('update', function(event) {
+			// set the store of each topic whose version changed, which triggers its callbacks
+			var versions = JSON.parse(event.data);
+
+			for( var topic in versions )
+			{
+				if( topic in updateConfig['stores'] && versions[topic] !== updateVersions[topic] )
+					window.dash_clientside.set_props(updateConfig['stores'][topic], {data: versions[topic]});
+			}
+
+			updateVersions = versions;
+		});
+
+		return window.dash_clientside.no_update;
+    }
+}
@@ -0,0 +1,797 @@
+#!/usr/bin/env python3
+#
+# Scaling benchmarks of the backend server, with stub video sources, models,
+# outputs and events (so no camera, GPU, jetson_utils or flask is needed).
+#
+# streams:  the old round-robin loop that processed every stream serially
+# from one thread against a StreamWorker per stream, with one slow source
+# among the streams, and the supervisor restarting a stream whose source fails.
+#
+# events:  the cost of each poll of the event table/timeline as the event
+# history grows, fetching the full history against the changes since the
+# last poll from the EventLog - and on the dash side, the cost of a push to
+# the table and timeline callbacks (the EventCache refresh, the rows and
+# points they update, and the JSON sent to the browser) keeping every event
+# against keeping the server's window and sending only the newest events.
+#
+# store:  the memory used by hours of a classification stream's events, kept
+# in a list with a score per frame against the EventLog's downsampled scores
+# and in-memory window (spilling to SQLite), and the time of queries by
+# label and time range.
+#
+# push:  the backend requests per second of browsers polling the server on the
+# old dcc.Interval timers against subscribing to the /updates push channel,
+# and how long it takes a change to reach them - with only an occasional alert
+# (idle), and with streams producing events (load).
+#
+# session:  the latency of the REST requests made from forked gunicorn-style
+# worker processes and threads, opening a new connection for each request
+# against the pooled keep-alive RestSession (over HTTP, and HTTPS with --ssl),
+# and with the dash app and the server in one process, the RestSession over
+# HTTP against handing the requests to the flask app (if flask is installed).
+#
+#   $ python3 benchmark.py streams --streams 4 --capture-latency 0.033 --slow-latency 0.25
+#   $ python3 benchmark.py events --sizes 1000 20000
+#   $ python3 benchmark.py store --hours 2
+#   $ python3 benchmark.py push --clients 4
+#   $ python3 benchmark.py session --workers 4 --threads 4 --ssl
+#
+import os
+import sys
+import ssl
+import json
+import time
+import types
+import random
+import argparse
+import tempfile
+import queue
+import threading
+import subprocess
+import tracemalloc
+import http.server
+import multiprocessing
+import importlib.util
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+
+from worker import StreamWorker
+from event_log import EventLog
+from updates import UpdatePublisher
+
+
+class StubImage:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+
+class StubSource:
+    """
+    Stand-in for a videoSource whose Capture() takes a fixed time (e.g. the camera frame interval),
+    and optionally fails after a number of frames (like a disconnected RTSP camera).
+    """
+    def __init__(self, latency=0.033, fail_after=None, width=1280, height=720):
+        self.latency = latency
+        self.fail_after = fail_after
+        self.width = width
+        self.height = height
+        self.frames = 0
+
+    def Capture(self):
+        if self.fail_after is not None and self.frames >= self.fail_after:
+            raise IOError("stub source disconnected")
+
+        time.sleep(self.latency)
+        self.frames += 1
+        return StubImage(self.width, self.height)
+
+    def IsStreaming(self):
+        return True
+
+
+class StubOutput:
+    """
+    Stand-in for a videoOutput (or a model) whose calls take a fixed time.
+    """
+    def __init__(self, latency=0.005):
+        self.latency = latency
+        self.frames = 0
+
+    def Render(self, img):
+        time.sleep(self.latency)
+        self.frames += 1
+
+    def process(self, img):
+        self.Render(img)
+
+
+def create_streams(args):
+    """
+    Create the (source, model, output) stubs of each stream - the last one has a slow source.
+    """
+    streams = []
+
+    for n in range(args.streams):
+        latency = args.slow_latency if n == args.streams - 1 and args.slow_latency > 0 else args.capture_latency
+        streams.append((StubSource(latency), StubOutput(args.model_latency), StubOutput(args.render_latency)))
+
+    return streams
+
+
+def bench_serial(args):
+    """
+    The old Server.process():  capture, process and render every stream in turn from one thread.
+    """
+    streams = create_streams(args)
+    time_end = time.perf_counter() + args.duration
+
+    while time.perf_counter() < time_end:
+        for source, model, output in streams:
+            img = source.Capture()
+            model.process(img)
+            output.Render(img)
+
+    return [output.frames / args.duration for source, model, output in streams], [0] * len(streams)
+
+
+def bench_workers(args):
+    """
+    A StreamWorker per stream, with capture, process and render on their own threads.
+    """
+    streams = create_streams(args)
+    workers = [StreamWorker(f"/stream{n}", capture=source.Capture, process=model.process, render=output.Render,
+                            queue_size=args.queue_size)
+               for n, (source, model, output) in enumerate(streams)]
+
+    for worker in workers:
+        worker.supervise()
+
+    time.sleep(args.duration)
+
+    stats = [worker.stats() for worker in workers]
+
+    for worker in workers:
+        worker.stop()
+
+    return [s['frames']['render'] / args.duration for s in stats], [sum(s['dropped'].values()) for s in stats]
+
+
+def bench_supervisor(args):
+    """
+    A stream whose source fails every few seconds, restarted by the supervisor.
+    """
+    source = StubSource(args.capture_latency, fail_after=int(2.0 / args.capture_latency))
+
+    def reopen():
+        source.frames = 0   # a new connection to the camera
+
+    worker = StreamWorker('/flaky', capture=source.Capture, render=StubOutput(args.render_latency).Render,
+                          reopen=reopen, backoff=0.5)
+    time_end = time.perf_counter() + args.duration
+
+    while time.perf_counter() < time_end:
+        worker.supervise()
+        time.sleep(0.1)
+
+    stats = worker.stats()
+    worker.stop()
+
+    print(f"supervisor:  the flaky stream was restarted {stats['restarts']} times in {args.duration:.0f} s and "
+          f"rendered {stats['frames']['render'] / args.duration:.1f} FPS (last error:  {stats['error']})")
+
+
+def bench_streams(args):
+    """
+    Serial vs. per-stream worker processing with stub video streams.
+    """
+    for name, func in (('serial', bench_serial), ('workers', bench_workers)):
+        fps, dropped = func(args)
+        streams = '  '.join(f"{rate:5.1f}" for rate in fps)
+        print(f"{name:<8} {sum(fps):6.1f} FPS total   per stream: {streams}   dropped: {sum(dropped)}")
+
+    print(f"{args.streams} streams ({args.capture_latency * 1000:.0f} ms capture, {args.model_latency * 1000:.0f} ms model, "
+          f"{args.render_latency * 1000:.0f} ms render), the last with a {args.slow_latency * 1000:.0f} ms source")
+
+    bench_supervisor(args)
+
+
+class StubEvent:
+    """
+    Stand-in for server.Event (which needs the running Server) with the same list representation.
+    """
+    def __init__(self, label, score, timestamp=None):
+        self.id = -1
+        self.version = 0
+        self.begin = time.time() if timestamp is None else timestamp
+        self.end = self.begin
+        self.frames = 0
+        self.label = label
+        self.score = score
+        self.maxScore = score
+        self.scores = [[self.begin, score, score, score, 1]]
+
+    def update(self, log, score, timestamp=None):
+        with log.lock:
+            self.end = time.time() if timestamp is None else timestamp
+            self.score = score
+            self.maxScore = max(self.maxScore, score)
+            self.frames += 1
+            log.add_score(self, self.end, score)
+
+    def to_list(self):
+        return [self.id, self.begin, self.end, self.frames, '/camera', 'detector', 1,
+                self.label, self.score, self.maxScore, self.scores]
+
+
+def load_event_cache(log, window=None):
+    """
+    Load the dash app's layout/event_cache.py on its own (the layout package needs dash, and the
+    Server it requests from needs flask), with its /events?since= requests served by the EventLog
+    as if the server's event window was the given one (None for the copy to keep every event).
+    """
+    def request(path, params):
+        version, events = log.since(params['since'])
+        response = {'version': version, 'epoch': log.epoch, 'window': window, 'count': len(log), 'events': events}
+        return types.SimpleNamespace(json=lambda: json.loads(json.dumps(response)))
+
+    sys.modules['server'] = types.SimpleNamespace(Server=types.SimpleNamespace(request=request))
+
+    try:
+        spec = importlib.util.spec_from_file_location('event_cache', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'layout', 'event_cache.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        del sys.modules['server']
+
+    return module
+
+
+def event_to_row(event):
+    """
+    The row of the event table (like layout/event_table.py, which needs dash).
+    """
+    row = {'id': event[0], '1': time.strftime('%H:%M:%S', time.localtime(event[1])), '2': time.strftime('%H:%M:%S', time.localtime(event[2]))}
+    row.update((str(n), event[n]) for n in range(3, 10))
+    return row
+
+
+def event_to_points(event):
+    """
+    The points of the event timeline (like layout/event_timeline.py, which needs dash).
+    """
+    return (event[7], [time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(bucket[0])) for bucket in event[10]],
+            [bucket[1] * 100 for bucket in event[10]])
+
+
+def bench_events(args):
+    """
+    Per-poll cost of the full /events history vs. /events?since= as the history grows,
+    and the cost of the dash callbacks for each push keeping every event vs. a bounded window.
+    """
+    random.seed(0)
+    log = EventLog(window=max(args.sizes) * 2)
+    active = []
+    cursor = 0
+    clock = time.time() - 3600
+
+    # the dash side:  the EventCache and the table and timeline EventViews
+    dash_sides = {}
+
+    for name, window, rows, plots in (('every event', None, None, None), ('bounded', args.window, args.rows, args.timeline)):
+        module = load_event_cache(log, window)
+        cache = module.EventCache()
+        dash_sides[name] = (cache, module.EventView(cache, event_to_row, rows), module.EventView(cache, event_to_points, plots))
+
+    def push(cache, table, timeline):
+        version = cache.refresh()
+        return len(json.dumps(table.update(version))) + len(json.dumps(timeline.update(version)))
+
+    dash_results = []
+
+    print(f"{'events':>8}  {'full history':>24}  {'changes since last poll':>28}")
+
+    for size in args.sizes:
+        # fill the history up to the size, each old event with its scores
+        while len(log) < size:
+            clock += 1.0
+            event = StubEvent(random.choice(['person', 'car', 'dog', 'balloon']), random.random(), clock)
+            log.add(event)
+
+            for _ in range(args.scores - 1):
+                clock += log.bucket
+                event.update(log, random.random(), clock)
+
+        cursor = log.version
+
+        # one poll interval:  the active events (one per stream) get new scores, and a few new ones start
+        for _ in range(args.new_events):
+            event = StubEvent('person', random.random())
+            log.add(event)
+            active = (active + [event])[-args.active:]
+
+        for event in active:
+            for _ in range(args.updates):
+                event.update(log, random.random(), event.end + 1 / 30)
+
+        full, delta = [], []
+
+        for _ in range(args.polls):
+            time_begin = time.perf_counter()
+            full_payload = json.dumps([event.to_list() for event in log])
+            full.append(time.perf_counter() - time_begin)
+
+            time_begin = time.perf_counter()
+            version, events = log.since(cursor)
+            delta_payload = json.dumps({'version': version, 'count': len(log), 'events': events})
+            delta.append(time.perf_counter() - time_begin)
+
+        print(f"{len(log):8d}  {min(full) * 1000:8.2f} ms {len(full_payload) / 1024:10.0f} KB  "
+              f"{min(delta) * 1000:12.3f} ms {len(delta_payload) / 1024:10.1f} KB")
+
+        # the dash callbacks catch up with the history, then get a push after each poll interval's changes
+        for sides in dash_sides.values():
+            push(*sides)
+
+        timings = {name: [] for name in dash_sides}
+
+        for _ in range(args.polls):
+            for event in active:
+                event.update(log, random.random(), event.end + 1 / 30)
+
+            for name, sides in dash_sides.items():
+                time_begin = time.perf_counter()
+                payload = push(*sides)
+                timings[name].append((time.perf_counter() - time_begin, payload))
+
+        dash_results.append((len(log), [min(timings[name]) for name in dash_sides]))
+
+    print(f"{args.scores} score buckets per event, {args.active} active events with {args.updates} new scores "
+          f"and {args.new_events} new events per poll")
+
+    print(f"\n{'events':>8}  {'dash push, every event':>24}  {'dash push, bounded':>28}")
+
+    for size, results in dash_results:
+        print(f"{size:8d}  " + "  ".join(f"{seconds * 1000:{width}.2f} ms {payload / 1024:10.0f} KB"
+                                         for width, (seconds, payload) in zip((8, 12), results)))
+
+    print(f"bounded:  the server's window of {args.window} events, {args.rows} table rows and {args.timeline} timeline events "
+          f"(the table and timeline send all of their data on every push)")
+
+
+def bench_store(args):
+    """
+    Memory and query time of a long classification stream's events, kept in a list with a
+    (timestamp, score) per frame vs. the EventLog's score buckets, window and SQLite spill.
+    """
+    random.seed(0)
+    labels = ['person', 'car', 'dog', 'cat', 'bicycle', 'balloon']
+    frames = int(args.hours * 3600 * args.fps)
+    start = time.time() - frames / args.fps - 60
+
+    def classify():
+        # the same sequence of (timestamp, label, score) results for both stores
+        rng = random.Random(1)
+        label, change = None, 0
+
+        for frame in range(frames):
+            timestamp = start + frame / args.fps
+
+            if frame >= change:
+                label, change = rng.choice(labels), frame + int(rng.uniform(1, 20) * args.fps)
+                yield timestamp, label, rng.random(), True
+            else:
+                yield timestamp, label, rng.random(), False
+
+    # the previous Server.events:  a list of every event, with a score per frame
+    tracemalloc.start()
+    events = []
+
+    for timestamp, label, score, new in classify():
+        if new:
+            events.append({'id': len(events), 'begin': timestamp, 'end': timestamp, 'label': label, 'scores': [(timestamp, score)]})
+        else:
+            events[-1]['end'] = timestamp
+            events[-1]['scores'].append((timestamp, score))
+
+    list_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    # the EventLog
+    path = os.path.join(tempfile.mkdtemp(), 'events.db')
+
+    tracemalloc.start()
+    log = EventLog(window=args.window, path=path, bucket=args.bucket)
+    event = None
+
+    for timestamp, label, score, new in classify():
+        if new:
+            event = StubEvent(label, score, timestamp)
+            log.add(event)
+        else:
+            event.update(log, score, timestamp)
+
+    log_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f"{len(events)} events from {frames} frames ({args.hours} hours at {args.fps:.0f} FPS)")
+    print(f"list of events      {list_memory / 1e6:7.1f} MB in memory")
+    print(f"EventLog            {log_memory / 1e6:7.1f} MB in memory ({len(log.events)} events), "
+          f"{os.path.getsize(path) / 1e6:.1f} MB on disk ({log.spilled} events)")
+
+    # queries of a label in a 10 minute range from the middle of the history
+    begin = start + frames / args.fps / 2
+    end = begin + 600
+
+    def scan():
+        return [e for e in events if e['label'] == 'person' and e['end'] >= begin and e['begin'] <= end]
+
+    for name, query in (('list scan', scan), ('EventLog query', lambda: log.query(begin=begin, end=end, label='person'))):
+        timings = []
+
+        for _ in range(10):
+            time_begin = time.perf_counter()
+            results = query()
+            timings.append(time.perf_counter() - time_begin)
+
+        print(f"{name:<19} {min(timings) * 1000:7.2f} ms  ({len(results)} events of 'person' in a 10 minute range)")
+
+    log.close()
+
+
+class Backend:
+    """
+    Stand-in for the server's REST API and /updates, counting the requests and the time each
+    version of a topic was published (to measure how long it takes the clients to see it).
+    """
+    def __init__(self, interval):
+        self.updates = UpdatePublisher(interval=interval)
+        self.log = EventLog(window=100000, listener=lambda version: self.publish('events', version))
+        self.alerts = []
+        self.published = {topic: {} for topic in self.updates.versions}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def publish(self, topic, version):
+        self.published[topic][version] = time.perf_counter()
+        self.updates.publish(topic, version)
+
+    def alert(self, text):
+        self.alerts.append((text, 'info', time.time(), 3500))
+        self.publish('alerts', len(self.alerts))
+
+    def request(self, topic, since=0):
+        """
+        Serve a GET of /resources, /status or /events?since= and return the topic's version.
+        """
+        with self.lock:
+            self.requests += 1
+
+        if topic == 'events':
+            version, events = self.log.since(since)
+            json.dumps({'version': version, 'count': len(self.log), 'events': events})
+            return version
+        elif topic == 'alerts':
+            json.dumps({'running': True, 'alerts': self.alerts})
+            return len(self.alerts)
+
+        return self.updates.versions['resources']
+
+
+class Client:
+    """
+    A browser with the event table and timeline open, keeping track of the versions it has seen
+    and how long after they were published it saw them.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.seen = {topic: 0 for topic in backend.published}
+        self.latency = {topic: [] for topic in backend.published}
+
+    def observe(self, topic, version):
+        now = time.perf_counter()
+        published = self.backend.published[topic]
+
+        for v in range(self.seen[topic] + 1, version + 1):
+            if v in published:
+                self.latency[topic].append(now - published[v])
+
+        self.seen[topic] = max(self.seen[topic], version)
+
+    def poll(self, stop):
+        # the old dcc.Interval timers:  /resources, /status, and /events from the table and timeline
+        timers = [('resources', 2.5), ('alerts', 1.0), ('events', 0.5), ('events', 0.5)]
+        deadlines = [time.perf_counter() + random.uniform(0, period) for topic, period in timers]
+
+        while not stop.is_set():
+            n = deadlines.index(min(deadlines))
+            time.sleep(max(deadlines[n] - time.perf_counter(), 0))
+            topic, period = timers[n]
+            self.observe(topic, self.backend.request(topic, self.seen[topic]))
+            deadlines[n] += period
+
+    def subscribe(self, stop):
+        # an EventSource on /updates, requesting a topic when its version changes
+        for message in self.backend.updates.subscribe():
+            if stop.is_set():
+                break
+
+            if not message.startswith('event: update'):
+                continue
+
+            versions = json.loads(message.split('data: ')[1])
+
+            for topic, version in versions.items():
+                if version != self.seen[topic]:
+                    self.observe(topic, self.backend.request(topic, self.seen[topic]))
+
+
+def bench_push(args):
+    """
+    Backend requests per second and the time for changes to reach the clients with the old
+    fixed-interval polling vs. the /updates push channel, at idle and under load.
+    """
+    random.seed(0)
+
+    print(f"{args.clients} clients, {args.duration:.0f} seconds each, an alert every {args.alert_period:.1f} s, "
+          f"load of {args.streams} streams with events updated at {args.fps:.0f} FPS")
+    print(f"{'':16}  {'requests/s':>10}  {'alert latency':>13}  {'event latency':>13}")
+
+    for load in (False, True):
+        for mode in ('polling', 'push'):
+            backend = Backend(args.interval)
+            clients = [Client(backend) for _ in range(args.clients)]
+            stop = threading.Event()
+
+            threads = [threading.Thread(target=client.poll if mode == 'polling' else client.subscribe, args=(stop,), daemon=True)
+                       for client in clients]
+
+            for thread in threads:
+                thread.start()
+
+            time.sleep(0.5)   # let the subscribers connect and the first requests go out
+            requests = backend.requests
+            time_begin = time.perf_counter()
+            next_alert = time_begin + args.alert_period / 2
+            next_frame = time_begin
+            events = []
+
+            while time.perf_counter() - time_begin < args.duration:
+                now = time.perf_counter()
+
+                if now >= next_alert:
+                    backend.alert(f"alert {len(backend.alerts)}")
+                    next_alert += args.alert_period
+
+                if load and now >= next_frame:
+                    # each stream's current event gets a score, and a new event starts every second
+                    if len(events) < args.streams or random.random() < args.streams / args.fps:
+                        event = StubEvent('person', random.random())
+                        backend.log.add(event)
+                        events = (events + [event])[-args.streams:]
+
+                    for event in events:
+                        event.update(backend.log, random.random())
+
+                    next_frame += 1 / args.fps
+
+                time.sleep(0.001)
+
+            rate = (backend.requests - requests) / (time.perf_counter() - time_begin)
+
+            stop.set()
+            backend.updates.close()
+
+            for thread in threads:
+                thread.join()
+
+            def latency(topic):
+                samples = [sample for client in clients for sample in client.latency[topic]]
+                return f"{sum(samples) / len(samples) * 1000:10.1f} ms" if samples else f"{'-':>13}"
+
+            print(f"{mode:<8} {'load' if load else 'idle':<7}  {rate:10.1f}  {latency('alerts')}  {latency('events')}")
+
+
+class StubRestServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128   # the listen backlog of werkzeug's server
+
+
+class StubRestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Stand-in for the server's REST API (a small /status response), with keep-alive like the
+    threaded flask server (and TCP_NODELAY like its request handler in Server.init()).
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        body = json.dumps({'running': True, 'pid': os.getpid(), 'alerts': []}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(ssl_dir=None):
+    """
+    Start the stub REST server on a thread, with a self-signed certificate if ssl_dir is set,
+    and return its URL.
+    """
+    server = StubRestServer(('127.0.0.1', 0), StubRestHandler)
+    protocol = 'http'
+
+    if ssl_dir:
+        cert, key = os.path.join(ssl_dir, 'cert.pem'), os.path.join(ssl_dir, 'key.pem')
+        subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1', '-subj', '/CN=localhost',
+                        '-keyout', key, '-out', cert], check=True, capture_output=True)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        protocol = 'https'
+
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"{protocol}://127.0.0.1:{server.server_address[1]}"
+
+
+def session_worker(request, requests_per_thread, threads, results):
+    """
+    A gunicorn worker process with a number of threads that make requests from the dash callbacks.
+    """
+    latencies = []
+
+    def run():
+        for _ in range(requests_per_thread):
+            time_begin = time.perf_counter()
+            request('/status').json()
+            latencies.append(time.perf_counter() - time_begin)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+
+    for thread in workers:
+        thread.start()
+
+    for thread in workers:
+        thread.join()
+
+    results.put(latencies)
+
+
+def bench_session(args):
+    """
+    Latency of the REST requests from forked gunicorn-style workers, with a new connection per
+    request (requests.request) vs. the pooled keep-alive RestSession.
+    """
+    import requests
+    import urllib3
+
+    from session import RestSession
+
+    urllib3.disable_warnings()
+    context = multiprocessing.get_context('fork')
+
+    def report(name, latencies, elapsed):
+        latencies = sorted(latencies)
+        print(f"{name:<28}  {sum(latencies) / len(latencies) * 1000:6.2f} ms  "
+              f"{latencies[len(latencies) // 2] * 1000:6.2f} ms  {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms  "
+              f"{len(latencies) / elapsed:10.0f}")
+
+    print(f"{args.workers} workers x {args.threads} threads x {args.requests} requests")
+    print(f"{'':28}  {'mean':>9}  {'p50':>9}  {'p99':>9}  {'requests/s':>10}")
+
+    for protocol in (['http', 'https'] if args.ssl else ['http']):
+        url = start_stub_server(tempfile.mkdtemp() if protocol == 'https' else None)
+
+        # the session is created before the workers fork, like when gunicorn imports the app
+        session = RestSession(url)
+
+        clients = {
+            'requests.request': lambda path: requests.request('GET', url + path, verify=False),
+            'RestSession': lambda path: session.request('GET', path),
+        }
+
+        for name, request in clients.items():
+            results = context.Queue()
+            time_begin = time.perf_counter()
+
+            workers = [context.Process(target=session_worker, args=(request, args.requests, args.threads, results))
+                       for _ in range(args.workers)]
+
+            for worker in workers:
+                worker.start()
+
+            latencies = [sample for _ in workers for sample in results.get()]
+            elapsed = time.perf_counter() - time_begin
+
+            for worker in workers:
+                worker.join()
+
+            report(protocol + ' ' + name, latencies, elapsed)
+
+    # the dash app and the server in one process (Server(in_process=True)), with the threads of one worker
+    try:
+        import flask
+    except ImportError:
+        print("in-process:  skipped (flask isn't installed)")
+        return
+
+    app = flask.Flask('stub')
+    app.add_url_rule('/status', view_func=lambda: flask.jsonify({'running': True, 'pid': os.getpid(), 'alerts': []}))
+    url = start_stub_server()
+
+    for name, session in (('in-process over HTTP', RestSession(url)), ('in-process flask app', RestSession(url, app=app))):
+        results = queue.Queue()
+        time_begin = time.perf_counter()
+        session_worker(lambda path: session.request('GET', path), args.requests, args.threads, results)
+        report(name, results.get(), time.perf_counter() - time_begin)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backend server with stub streams and events.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    streams = subparsers.add_parser("streams", help="serial vs. per-stream worker processing with stub video streams",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    streams.add_argument("--streams", type=int, default=4, help="number of streams")
+    streams.add_argument("--duration", type=float, default=5.0, help="seconds to run each configuration")
+    streams.add_argument("--capture-latency", type=float, default=0.033, help="seconds per Capture() of the stub sources")
+    streams.add_argument("--slow-latency", type=float, default=0.25, help="seconds per Capture() of the last (slow) source, 0 to disable")
+    streams.add_argument("--model-latency", type=float, default=0.010, help="seconds per frame of the stub model")
+    streams.add_argument("--render-latency", type=float, default=0.005, help="seconds per Render() of the stub outputs")
+    streams.add_argument("--queue-size", type=int, default=1, help="frames queued between the worker stages")
+    streams.set_defaults(func=bench_streams)
+
+    events = subparsers.add_parser("events", help="full /events history vs. the changes since the last poll",
+                                   formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    events.add_argument("--sizes", type=int, nargs='+', default=[1000, 5000, 20000], help="event history sizes to measure at")
+    events.add_argument("--scores", type=int, default=30, help="scores of each past event")
+    events.add_argument("--active", type=int, default=4, help="events being updated (one per stream)")
+    events.add_argument("--updates", type=int, default=15, help="new scores of each active event per poll")
+    events.add_argument("--new-events", type=int, default=2, help="new events per poll")
+    events.add_argument("--polls", type=int, default=5, help="polls to time at each size (the fastest is reported)")
+    events.add_argument("--window", type=int, default=1000, help="event window of the server (for the bounded dash callbacks)")
+    events.add_argument("--rows", type=int, default=500, help="events sent to the event table (for the bounded dash callbacks)")
+    events.add_argument("--timeline", type=int, default=50, help="events sent to the event timeline (for the bounded dash callbacks)")
+    events.set_defaults(func=bench_events)
+
+    store = subparsers.add_parser("store", help="memory and queries of a long event history in a list vs. the EventLog",
+                                  formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    store.add_argument("--hours", type=float, default=2.0, help="hours of classification results to store")
+    store.add_argument("--fps", type=float, default=30.0, help="classification results per second")
+    store.add_argument("--window", type=int, default=100, help="events kept in memory by the EventLog")
+    store.add_argument("--bucket", type=float, default=0.5, help="seconds of scores per bucket")
+    store.set_defaults(func=bench_store)
+
+    push = subparsers.add_parser("push", help="requests/s and latency of polling the server vs. the /updates push channel",
+                                 formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    push.add_argument("--clients", type=int, default=4, help="number of browsers with the dash app open")
+    push.add_argument("--duration", type=float, default=5.0, help="seconds to run each configuration")
+    push.add_argument("--alert-period", type=float, default=2.0, help="seconds between the alerts")
+    push.add_argument("--streams", type=int, default=4, help="streams producing events under load")
+    push.add_argument("--fps", type=float, default=30.0, help="event updates per second of each stream under load")
+    push.add_argument("--interval", type=float, default=0.1, help="minimum seconds between the updates pushed to a client")
+    push.set_defaults(func=bench_push)
+
+    session = subparsers.add_parser("session", help="REST request latency from gunicorn-style workers without and with connection pooling",
+                                    formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+
+    session.add_argument("--workers", type=int, default=4, help="number of worker processes")
+    session.add_argument("--threads", type=int, default=4, help="number of threads per worker")
+    session.add_argument("--requests", type=int, default=200, help="requests made by each thread")
+    session.add_argument("--ssl", action="store_true", help="also measure HTTPS (with a self-signed certificate from openssl)")
+    session.set_defaults(func=bench_session)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,7 +29,9 @@ config={
         'title' : 'Hello AI World',     # title of the dash app (used in browser title bar and navbar)
         'host' : '0.0.0.0',             # hostname/IP of the frontend webserver (ignored by gunicorn)
         'port' : 8050,                  # port used for the frontend webserver (ignored by gunicorn)
-        'refresh' : 2500,               # the interval at which the server state is refreshed
+        'refresh' : 2500,               # the interval at which the server state is polled while the /updates push channel is disconnected
+        'event_rows' : 500,             # maximum number of the most recently changed events sent to the event table
+        'event_timeline' : 50,          # maximum number of the most recently changed events plotted in the event timeline
         'users' : {                     # to enable basic authentication logins, add username/password pairs here
             # 'username' : 'password',
         },
@@ -43,6 +45,13 @@ config={
         'ssl_cert' : None,              # path to PEM-encoded SSL/TLS certificate file for enabling HTTPS
         'ssl_key' : None,               # path to PEM-encoded SSL/TLS key file for enabling HTTPS
         'stun_server' : None,           # override the default WebRTC STUN server (stun.l.google.com:19302)
+        'event_window' : 1000,          # number of recent events kept in memory by the backend server
+        'event_db' : os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data/events.db'),  # SQLite database older events are moved to
+        'update_interval' : 0.1,        # minimum seconds between the changes pushed to the browsers (see /updates)
+        'request_timeout' : [5.0, 60.0],  # default (connect, read) timeout in seconds of the REST requests to the backend server
+        'request_retries' : 3,          # number of times failed REST requests are retried (with exponential backoff)
+        'request_backoff' : 0.1,        # backoff factor of the retries (see urllib3.util.Retry)
+        'in_process' : False,           # run the backend server on a thread of the frontend's process (not with gunicorn)
     }
 }
 
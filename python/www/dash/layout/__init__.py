@@ -3,6 +3,7 @@ from .card import create_card, card_callback
 from .grid import create_grid
 from .navbar import create_navbar
 from .alerts import create_alerts
+from .updates import create_updates
 from .actions import create_actions_dialog
 from .event_table import create_event_table
 from .event_timeline import create_event_timeline
@@ -29,6 +29,8 @@ from dash.exceptions import PreventUpdate
 from server import Server
 from datetime import datetime
 
+from .updates import pushed
+
 
 def create_alerts():
     style={
@@ -40,8 +42,7 @@ def create_alerts():
     
     return html.Div([
         dbc.Alert('Placeholder Text', color='#444444', style=style, dismissable=True, is_open=False, id='alerts'),
-        dcc.Store(id='alert_count', data=0),
-        dcc.Interval(id='alert_timer', interval=1000)
+        dcc.Store(id='alert_count', data=0)
     ])
 
 
@@ -49,9 +50,14 @@ def create_alerts():
                Output('alerts', 'is_open'),
                Output('alerts', 'duration'),
                Output('alert_count', 'data'),
-               Input('alert_timer', 'n_intervals'),
+               Input('server_alerts_version', 'data'),
+               Input('server_refresh_timer', 'n_intervals'),
                State('alert_count', 'data'))
-def refresh_alerts(n_intervals, alert_count):
+def refresh_alerts(alerts_version, n_intervals, alert_count):
+    # the version of the alerts is the number of them
+    if pushed('server_alerts_version') and (alerts_version is None or alerts_version <= alert_count):
+        raise PreventUpdate
+        
     request = Server.request('/status')
     alerts = request.json()['alerts']
     
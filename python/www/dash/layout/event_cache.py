@@ -0,0 +1,165 @@
+#
+# Client-side copy of the server's events, kept up to date with /events?since=
+#
+# The event table and timeline used to fetch the full event history (with all
+# of the scores) every 500 ms.  The EventCache requests only the events that
+# changed since the version it last got, merges them into its copy (new events
+# are added, the others have their fields replaced and their score buckets
+# from the first new one on replaced), and remembers the order they changed in - so the callbacks can
+# update just what changed since they last rendered, and skip the update
+# entirely when nothing did.  The callbacks are triggered by the events version
+# the server pushes from /updates (see layout/updates.py), and both of them are
+# served by one request per push.
+#
+# The copy is bounded like the server's:  it keeps the server's event window
+# of the most recently changed events, and starts over when the epoch of the
+# server's versions changes (it restarted).  Each callback keeps an EventView
+# of the records converted for its component, with only the newest of them,
+# so that what gets sent to the browsers on every push is bounded too.
+#
+import threading
+import collections
+
+from server import Server
+
+
+class EventCache:
+    """
+    Merged copy of the server's events, shared by the dash callbacks.
+
+    Usage:
+        version = event_cache.refresh()
+
+        for id in event_cache.changed(rendered_version):
+            record = event_cache.records[id]   # Event.to_list() with all of its scores
+    """
+    def __init__(self):
+        self.records = {}                          # {id: Event.to_list() record}
+        self.version = 0                           # server version the copy is up to date with
+        self.epoch = None                          # epoch of the server's versions
+        self.changes = collections.OrderedDict()   # {id: version} in the order the events last changed
+        self.resets = 0                            # number of times the copy was cleared (the server restarted)
+        self.evicted = 0                           # number of records dropped beyond the server's window
+        self.pushed = None                         # the version pushed by the server that the copy was last refreshed for
+        self.lock = threading.RLock()
+
+    def refresh(self, pushed=None):
+        """
+        Merge the events that changed on the server since the last refresh, and return the new version.
+        If the version pushed by the server's /updates is given and the copy was already refreshed
+        for it (by the other callback triggered by the same push), the server isn't asked again.
+        """
+        with self.lock:
+            if pushed is not None and pushed == self.pushed:
+                return self.version
+
+            self.pushed = pushed
+            response = Server.request('/events', params={'since': self.version}).json()
+
+            if response.get('epoch') != self.epoch:
+                if self.epoch is not None or self.version > 0:
+                    # the server restarted, and its versions with it - start over
+                    self.records.clear()
+                    self.changes.clear()
+                    self.version = 0
+                    self.resets += 1
+                    response = Server.request('/events', params={'since': 0}).json()
+
+                self.epoch = response.get('epoch')
+
+            for record in response['events']:
+                id = record[0]
+
+                if id in self.records and record[10]:
+                    # the buckets from the first new timestamp on were updated (or merged)
+                    scores = self.records[id][10]
+                    first = record[10][0][0]
+
+                    while scores and scores[-1][0] >= first:
+                        scores.pop()
+
+                    scores.extend(record[10])
+                    record[10] = scores
+                elif id in self.records:
+                    record[10] = self.records[id][10]
+
+                self.records[id] = record
+                self.changes[id] = response['version']
+                self.changes.move_to_end(id)
+
+            # the server doesn't report the events it no longer keeps in memory
+            window = response.get('window')
+
+            while window is not None and len(self.records) > window:
+                id, _ = self.changes.popitem(last=False)
+                del self.records[id]
+                self.evicted += 1
+
+            self.version = max(self.version, response['version'])
+            return self.version
+
+    def changed(self, version):
+        """
+        Return the IDs of the events that changed after the given version (oldest change first).
+        """
+        with self.lock:
+            ids = []
+
+            for id in reversed(self.changes):
+                if self.changes[id] <= version:
+                    break
+                ids.append(id)
+
+            ids.reverse()
+            return ids
+
+
+class EventView:
+    """
+    The cache's records converted for one dash component (table rows, timeline points),
+    updated with the events that changed and limited to the most recently changed ones.
+
+    Usage:
+        table = EventView(event_cache, event_to_row, limit=500)
+        rows = table.update(event_cache.refresh())
+    """
+    def __init__(self, cache, convert, limit=None):
+        """
+        Parameters:
+            cache (EventCache) -- the copy of the server's events
+            convert (callable) -- convert(record) returns the item for an Event.to_list() record
+            limit (int) -- maximum number of events kept (and returned by update())
+        """
+        self.cache = cache
+        self.convert = convert
+        self.limit = limit
+        self.items = collections.OrderedDict()   # {id: item} in the order the events last changed
+        self.version = 0
+        self.resets = 0
+        self.lock = threading.Lock()
+
+    def update(self, version):
+        """
+        Convert the events that changed since the last update, and return the list of items.
+        """
+        with self.lock:
+            if self.resets != self.cache.resets:
+                self.items.clear()
+                self.version = 0
+                self.resets = self.cache.resets
+
+            with self.cache.lock:
+                for id in self.cache.changed(self.version):
+                    self.items[id] = self.convert(self.cache.records[id])
+                    self.items.move_to_end(id)
+
+                # drop the oldest events, and the ones the cache evicted (which changed before those it kept)
+                while self.items and ((self.limit is not None and len(self.items) > self.limit) or
+                                      next(iter(self.items)) not in self.cache.records):
+                    self.items.popitem(last=False)
+
+            self.version = version
+            return list(self.items.values())
+
+
+event_cache = EventCache()
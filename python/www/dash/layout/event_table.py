@@ -22,13 +22,39 @@
 
 import dash
 
-from dash import dcc, html, dash_table, Input, Output
+from dash import dcc, html, dash_table, Input, Output, State
 from .card import create_card, card_callback
+from .event_cache import event_cache, EventView
+from .updates import pushed
 
-from server import Server
+from config import config
 from datetime import datetime
 
 
+def event_to_row(event):
+    """
+    Convert an Event.to_list() record into a row of the table.
+    """
+    #date_format = '%Y-%m-%d %H:%M:%S'
+    #date_format = '%-I:%M:%S %p'
+    date_format = '%H:%M:%S'
+
+    row = {
+        'id': event[0],
+        '1': datetime.fromtimestamp(event[1]).strftime(date_format),
+        '2': datetime.fromtimestamp(event[2]).strftime(date_format),
+    }
+
+    for n in range(3, 10):
+        row[str(n)] = event[n]
+
+    return row
+
+
+# the table rows of the most recent events, updated as they change (shared by all of the clients)
+table_view = EventView(event_cache, event_to_row, limit=config['dash']['event_rows'])
+
+
 def create_event_table():
     columns = [
         dict(id='id', name='ID', hideable=True),
@@ -73,7 +99,7 @@ def create_event_table():
             style_table={'overflowX': 'auto'},
             style_data={'font-size': 14},  #'font-family': 'monospace'
         ),
-        dcc.Interval(id='event_refresh_timer', interval=500)
+        dcc.Store(id='event_table_version', data=-1)
     ]
     
     return create_card(
@@ -85,28 +111,20 @@ def create_event_table():
     )
 
 @dash.callback(Output('event_table', 'data'),
-               Input('event_refresh_timer', 'n_intervals'))
-def refresh_events(n_intervals):
-    request = Server.request('/events')
-    records = request.json()
-    
-    #date_format = '%Y-%m-%d %H:%M:%S'
-    #date_format = '%-I:%M:%S %p'
-    date_format = '%H:%M:%S'
+               Output('event_table_version', 'data'),
+               Input('server_events_version', 'data'),
+               Input('server_refresh_timer', 'n_intervals'),
+               State('event_table_version', 'data'))
+def refresh_events(events_version, n_intervals, rendered_version):
+    """
+    Update the table with the events that changed (or skip the update if none did).
+    """
+    version = event_cache.refresh(events_version if pushed('server_events_version') else None)
     
-    def event_to_dict(event):
-        d = {
-            'id': event[0],
-            '1': datetime.fromtimestamp(event[1]).strftime(date_format),
-            '2': datetime.fromtimestamp(event[2]).strftime(date_format),
-        }
-        
-        for n in range(3, 10):
-            d[str(n)] = event[n]
-        
-        return d
+    if version == rendered_version:
+        return dash.no_update, dash.no_update
         
-    return [event_to_dict(event) for event in records]
+    return table_view.update(version), version
            
 @card_callback(Input('navbar_event_table', 'n_clicks'))
 def open_events(n_clicks):
@@ -23,22 +23,38 @@
 import dash
 import plotly.graph_objects as go
 
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State
 from dash_bootstrap_templates import load_figure_template
 
 from .card import create_card, card_callback
+from .event_cache import event_cache, EventView
+from .updates import pushed
 
-from server import Server
+from config import config
 from datetime import datetime
 
 
 load_figure_template('darkly')
 
 
+def event_to_points(event):
+    """
+    Convert an Event.to_list() record into the (label, x, y) points of its scores.
+    """
+    # the score buckets are [timestamp, mean, min, max, count]
+    return (event[7],
+            [datetime.fromtimestamp(bucket[0]).strftime('%Y-%m-%d %H:%M:%S.%f') for bucket in event[10]],
+            [bucket[1] * 100 for bucket in event[10]])
+
+
+# the points of the most recent events, updated as the events get new scores
+timeline_view = EventView(event_cache, event_to_points, limit=config['dash']['event_timeline'])
+
+
 def create_event_timeline():  
     children = [
         dcc.Graph(id='event_timeline_graph'), #, animate=True),
-        dcc.Interval(id='event_timeline_timer', interval=500)
+        dcc.Store(id='event_timeline_version', data=-1)
     ]
     
     return create_card(
@@ -51,21 +67,28 @@ def create_event_timeline():
    
    
 @dash.callback(Output('event_timeline_graph', 'figure'),
-               Input('event_timeline_timer', 'n_intervals'))
-def refresh_timeline(n_intervals):
-    request = Server.request('/events')
-    records = request.json()
+               Output('event_timeline_version', 'data'),
+               Input('server_events_version', 'data'),
+               Input('server_refresh_timer', 'n_intervals'),
+               State('event_timeline_version', 'data'))
+def refresh_timeline(events_version, n_intervals, rendered_version):
+    """
+    Redraw the timeline if any events changed, formatting only the scores of those events.
+    """
+    version = event_cache.refresh(events_version if pushed('server_events_version') else None)
+    
+    if version == rendered_version:
+        return dash.no_update, dash.no_update
+        
+    points = timeline_view.update(version)
     classes = {}
 
-    for event in records:
-        label = event[7]
-        
+    for label, x, y in points:
         if label not in classes:
             classes[label] = {'x': [], 'y': []}
             
-        for timestamp, score in event[10]:
-            classes[label]['x'].append(datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f'))
-            classes[label]['y'].append(score * 100)
+        classes[label]['x'].extend(x)
+        classes[label]['y'].extend(y)
 
         classes[label]['x'].append(None)
         classes[label]['y'].append(None)
@@ -84,7 +107,7 @@ def refresh_timeline(n_intervals):
         #'uirevision': 0,  # https://community.plotly.com/t/preserving-ui-state-like-zoom-in-dcc-graph-with-uirevision-with-dash/15793
     )
     
-    return fig
+    return fig, version
 
            
 @card_callback(Input('navbar_event_timeline', 'n_clicks'))
@@ -0,0 +1,58 @@
+#
+# Browser subscription to the backend server's /updates push channel.
+#
+# Each topic the server pushes (resources, events and alerts) has a dcc.Store
+# of its version, which assets/updates.js sets from the EventSource when the
+# version changes - the callbacks that depend on a topic take its store as
+# an Input, so they only run (and only request anything from the server) when
+# something they show changed.  While the EventSource is connected, the
+# server_refresh_timer is disabled, and it's re-enabled to poll the server
+# every config['dash']['refresh'] milliseconds while it's disconnected (or if
+# this version of dash can't set the stores from javascript).
+#
+import dash
+
+from dash import dcc, html, Input, Output
+from config import config
+
+
+UPDATE_STORES = {
+    'resources': 'server_resources_version',
+    'events': 'server_events_version',
+    'alerts': 'server_alerts_version',
+}
+
+
+def create_updates():
+    updates_config = {
+        'port': config['server']['rest_port'],
+        'ssl': bool(config['server']['ssl_cert']),
+        'path': '/updates',
+        'stores': UPDATE_STORES,
+        'timer': 'server_refresh_timer',
+    }
+
+    children = [dcc.Store(id=store) for store in UPDATE_STORES.values()]
+
+    children.extend([
+        dcc.Store(id='server_updates_config', data=updates_config),
+        dcc.Interval(id='server_refresh_timer', interval=config['dash']['refresh']),
+        html.Div(id='server_updates_status', style={'display': 'none'}),
+    ])
+
+    return html.Div(children)
+
+
+def pushed(store):
+    """
+    Return true if the callback was triggered by the given version store (as opposed to the
+    server_refresh_timer polling the server).
+    """
+    return dash.ctx.triggered_id == store
+
+
+dash.clientside_callback(
+    dash.ClientsideFunction('updates', 'connect'),
+    Output('server_updates_status', 'children'),  # script has no output, but dash callbacks must have outputs
+    Input('server_updates_config', 'data'),
+)
@@ -5,6 +5,9 @@ from .action import Action
 from .filter import EventFilter
 
 from .event import Event
+from .event_log import EventLog
+from .updates import UpdatePublisher
+from .session import RestSession
 from .model import Model
 
 
@@ -34,7 +34,8 @@ class Event:
         """
         Create a new event
         """
-        self.id = len(Server.instance.events)
+        self.id = -1        # assigned by the server's EventLog
+        self.version = 0    # EventLog version of the latest change
         self.stream = stream
         self.model = model
         self.classID = classID
@@ -45,20 +46,24 @@ class Event:
         self.begin = time()
         self.end = self.begin
         self.frames = 0
-        self.scores = [(self.begin,score)]
+        self.scores = [[self.begin, score, score, score, 1]]   # [timestamp, mean, min, max, count] buckets
         
-        Server.instance.events.append(self)
+        Server.instance.events.add(self)
         self.dispatch()
                     
     def update(self, score):
         """
         Update an event with new results
         """
-        self.end = time()
-        self.score = score
-        self.maxScore = max(self.maxScore, score)
-        self.scores.append((self.end, score))
-        self.frames += 1
+        events = Server.instance.events
+        
+        with events.lock:
+            self.end = time()
+            self.score = score
+            self.maxScore = max(self.maxScore, score)
+            self.frames += 1
+            events.add_score(self, self.end, score)
+            
         self.dispatch()
         
     def dispatch(self):
@@ -0,0 +1,347 @@
+#
+# Change-tracked, bounded event store for the /events REST endpoint.
+#
+# /events used to return the whole history on every poll - every event with
+# every (timestamp, score) pair it ever had - and the event table and timeline
+# both poll it twice a second, so the payload and the serialization cost grew
+# without bound over a shift.  The EventLog gives every change (a new event,
+# or new scores of an existing one) an increasing version number, and keeps
+# the events in the order they last changed.  since(version) walks back from
+# the newest change only as far as the client's cursor, and sends only the
+# scores that changed after it, so a poll costs as much as what changed
+# since the last one - not the size of the history.
+#
+#   GET /events?since=<version>   ->  {"version": 1234, "epoch": "9f0c...", "window": 1000,
+#                                      "count": 56, "events": [...]}
+#
+# The clients keep the returned version as the cursor for the next request and
+# merge the events into their copy:  new IDs are added, and the others have
+# their fields replaced and their scores from the first new timestamp on
+# replaced by the new ones.  The versions start over when the server restarts,
+# which the clients notice by the epoch changing (and then start over too),
+# and they keep no more than the window of the most recently changed events.
+#
+# The memory is bounded too.  Instead of a (timestamp, score) pair per frame,
+# each event's scores are downsampled into [timestamp, mean, min, max, count]
+# buckets of a fixed duration, and once an event has max_buckets of them,
+# neighbouring buckets are merged (doubling its bucket duration).  Only the
+# newest window of events is kept in memory - older events that are no longer
+# being updated spill to an append-only SQLite database, whose indexes serve
+# the queries by time range, stream and label.  The database is written
+# after the lock is released, so a commit never holds up the stream threads
+# adding events and scores - until then, the spilled events are pending,
+# and the queries look them up there:
+#
+#   GET /events?begin=<time>&end=<time>&stream=<name>&label=<label>&limit=<n>
+#
+import json
+import uuid
+import bisect
+import sqlite3
+import threading
+import collections
+
+from time import time
+
+
+class EventLog:
+    """
+    Store of the server's events that tracks which events changed since a given version,
+    keeping the newest events in memory and spilling the older ones to disk.
+    The events need the attributes of an Event (including to_list()).
+
+    Usage:
+        log = EventLog(window=1000, path='data/events.db')
+        log.add(event)                 # assigns event.id
+
+        with log.lock:
+            log.add_score(event, time(), score)
+
+        version, events = log.since(cursor)
+        events = log.query(label='person', begin=time() - 3600)
+    """
+    def __init__(self, window=1000, path=None, bucket=0.5, max_buckets=256, idle=10.0, listener=None):
+        """
+        Parameters:
+            window (int) -- number of events to keep in memory
+            path (string) -- SQLite database the older events spill to (if None, they're discarded)
+            bucket (float) -- seconds of scores that are downsampled into each bucket
+            max_buckets (int) -- maximum number of score buckets per event (merged when exceeded)
+            idle (float) -- seconds that an event must not have been updated for before it can spill
+            listener (callable) -- listener(version) is called after each change (e.g. to push it to the clients)
+        """
+        self.window = window
+        self.path = path
+        self.bucket = bucket
+        self.max_buckets = max_buckets
+        self.idle = idle
+        self.listener = listener
+
+        self.events = collections.OrderedDict()    # {id: event} of the events in memory, oldest first
+        self.changes = collections.OrderedDict()   # {id: version} in the order the events last changed
+        self.count = 0                             # number of events ever added
+        self.version = 0                           # version of the latest change
+        self.spilled = 0                           # number of events written to disk
+        self.pending = {}                          # {id: row} of the spilled events not yet written to disk
+        self.epoch = uuid.uuid4().hex              # identifies this run's versions (they start over on a restart)
+        self.lock = threading.RLock()
+        self.db_lock = threading.Lock()            # serializes the use of the database (never taken while holding lock)
+
+        self.db = sqlite3.connect(path, check_same_thread=False) if path else None
+
+        if self.db is not None:
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, begin REAL, end REAL, frames INTEGER,
+                    stream TEXT, model TEXT, classID INTEGER, label TEXT, score REAL, maxScore REAL, scores TEXT);
+                CREATE INDEX IF NOT EXISTS events_begin ON events (begin);
+                CREATE INDEX IF NOT EXISTS events_end ON events (end);
+                CREATE INDEX IF NOT EXISTS events_stream ON events (stream, begin);
+                CREATE INDEX IF NOT EXISTS events_label ON events (label, begin);
+            """)
+
+            # continue the IDs after the events from previous runs
+            self.count = self.db.execute("SELECT COALESCE(MAX(id) + 1, 0) FROM events").fetchone()[0]
+
+    def add(self, event):
+        """
+        Add a new event, assigning its ID, and spill the oldest events if the window is full.
+        """
+        with self.lock:
+            event.id = self.count
+            event.bucket = self.bucket
+            event.score_versions = []
+            self.count += 1
+            self.events[event.id] = event
+            self.touch(event, first=0)
+            rows = self.spill()
+
+        self.write(rows)
+
+    def add_score(self, event, timestamp, score):
+        """
+        Add a score to an event (this should be called while holding the lock, along with
+        updating the rest of the event) - it's folded into the event's last bucket if that
+        started less than the bucket duration ago.
+        """
+        with self.lock:
+            scores = event.scores
+
+            if scores and timestamp - scores[-1][0] < event.bucket:
+                last = scores[-1]
+                last[4] += 1
+                last[1] += (score - last[1]) / last[4]
+                last[2] = min(last[2], score)
+                last[3] = max(last[3], score)
+                self.touch(event, first=len(scores) - 1)
+                return
+
+            scores.append([timestamp, score, score, score, 1])
+
+            if len(scores) <= self.max_buckets:
+                self.touch(event, first=len(scores) - 1)
+                return
+
+            # merge pairs of buckets, which halves the resolution of the event's scores
+            scores[:] = [merge_buckets(scores[n:n+2]) for n in range(0, len(scores), 2)]
+            event.bucket *= 2
+            self.touch(event, first=0)
+
+    def touch(self, event, first=None):
+        """
+        Mark an event as changed.  first is the index of its first score bucket that was
+        added or changed (or None if the scores didn't change).
+        """
+        with self.lock:
+            self.version += 1
+            event.version = self.version
+
+            if event.id not in self.events:
+                self.events[event.id] = event   # a spilled event that was updated again
+
+            if first is not None:
+                del event.score_versions[first:]
+                event.score_versions.extend([self.version] * (len(event.scores) - first))
+
+            self.changes[event.id] = self.version
+            self.changes.move_to_end(event.id)
+
+            if self.listener is not None:
+                self.listener(self.version)
+
+    def since(self, version=0):
+        """
+        Return the current version and a list of the events in memory that changed after the
+        given version (in the order they changed), as Event.to_list() lists with only the score
+        buckets that were added or changed after it.
+        """
+        with self.lock:
+            changed = []
+
+            for id in reversed(self.changes):
+                if self.changes[id] <= version:
+                    break
+                changed.append(self.events[id])
+
+            records = []
+
+            for event in reversed(changed):
+                record = event.to_list()
+                record[10] = event.scores[bisect.bisect_right(event.score_versions, version):]
+                records.append(record)
+
+            return self.version, records
+
+    def spill(self):
+        """
+        Move the oldest events that are no longer being updated out of memory until the window
+        fits (this should be called while holding the lock).  Returns the rows to write() to disk.
+        """
+        excess = len(self.events) - self.window
+
+        if excess <= 0:
+            return []
+
+        now = time()
+        spilled = []
+
+        for event in self.events.values():
+            if len(spilled) >= excess:
+                break
+
+            if now - event.end > self.idle:
+                spilled.append(event)
+
+        rows = [encode_record(event.to_list()) for event in spilled] if self.db is not None else []
+
+        for event in spilled:
+            del self.events[event.id]
+            del self.changes[event.id]
+
+        for row in rows:
+            self.pending[row[0]] = row
+
+        self.spilled += len(spilled)
+        return rows
+
+    def write(self, rows):
+        """
+        Write the rows of spilled events to disk (this should be called without holding the lock).
+        """
+        if not rows:
+            return
+
+        with self.db_lock:
+            if self.db is None:
+                return   # closed, which wrote the pending rows
+
+            # an event that was updated and spilled again since has a newer row (written by that spill)
+            with self.lock:
+                rows = [row for row in rows if self.pending.get(row[0]) is row]
+
+            self.db.executemany("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self.db.commit()
+
+            with self.lock:
+                for row in rows:
+                    if self.pending.get(row[0]) is row:
+                        del self.pending[row[0]]
+
+    def query(self, begin=None, end=None, stream=None, label=None, limit=1000):
+        """
+        Return the Event.to_list() lists of the events (newest first) that overlap the time range
+        and are from the given stream and of the given label (each is optional), from memory and disk.
+        """
+        def matches(event):
+            return ((begin is None or event[2] >= begin) and (end is None or event[1] <= end) and
+                    (stream is None or event[4] == stream) and (label is None or event[7] == label))
+
+        with self.lock:
+            records = [record for record in (event.to_list() for event in reversed(self.events.values())) if matches(record)]
+
+            if self.db is None or len(records) >= limit:
+                return records[:limit]
+
+            # the spilled events that aren't on disk yet, and the ones that are found there
+            ids = set(self.events)
+            records += [record for record in (decode_record(row) for row in self.pending.values())
+                        if matches(record) and record[0] not in ids]
+            ids.update(self.pending)
+
+        with self.db_lock:
+            if self.db is None:
+                return sorted(records, key=lambda record: record[0], reverse=True)[:limit]
+
+            conditions, params = [], []
+
+            for condition, value in (("begin <= ?", end), ("end >= ?", begin), ("stream = ?", stream), ("label = ?", label)):
+                if value is not None:
+                    conditions.append(condition)
+                    params.append(value)
+
+            sql = "SELECT * FROM events"
+
+            if conditions:
+                sql += " WHERE " + " AND ".join(conditions)
+
+            # events spilled to disk are older than the ones in memory, except ones that were updated again
+            rows = self.db.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit + len(ids)]).fetchall()
+            records += [decode_record(row) for row in rows if row[0] not in ids]
+
+        return sorted(records, key=lambda record: record[0], reverse=True)[:limit]
+
+    def close(self):
+        """
+        Spill all of the events to disk and close the database.
+        """
+        with self.lock:
+            rows = list(self.pending.values()) + [encode_record(event.to_list()) for event in self.events.values()]
+            self.pending.clear()
+
+        with self.db_lock:
+            if self.db is None:
+                return
+
+            self.db.executemany("INSERT OR REPLACE INTO events VALUES (?,?,?,?,?,?,?,?,?,?,?)", rows)
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def __len__(self):
+        """
+        The number of events ever added (including the ones that were spilled).
+        """
+        return self.count
+
+    def __iter__(self):
+        """
+        Iterate over the events in memory, oldest first.
+        """
+        with self.lock:
+            return iter(list(self.events.values()))
+
+
+def merge_buckets(buckets):
+    """
+    Merge [timestamp, mean, min, max, count] score buckets into one.
+    """
+    count = sum(bucket[4] for bucket in buckets)
+
+    return [buckets[0][0],
+            sum(bucket[1] * bucket[4] for bucket in buckets) / count,
+            min(bucket[2] for bucket in buckets),
+            max(bucket[3] for bucket in buckets),
+            count]
+
+
+def encode_record(record):
+    """
+    Convert an Event.to_list() list into a row of the events table.
+    """
+    return record[:10] + [json.dumps(record[10])]
+
+
+def decode_record(row):
+    """
+    Convert a row of the events table into an Event.to_list() list.
+    """
+    return list(row[:10]) + [json.loads(row[10])]
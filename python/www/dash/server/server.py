@@ -31,7 +31,6 @@ import json
 import http
 import flask
 import urllib3
-import requests
 
 import psutil
 import inspect
@@ -46,6 +45,10 @@ from jetson_utils import Log
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from event_log import EventLog
+from updates import UpdatePublisher
+from session import RestSession
+
 
 # suppress InsecureRequestWarning from using self-signed SSL certificates
 # Unverified HTTPS request is being made to host '0.0.0.0'. Adding certificate verification is strongly advised. See: https://urllib3.readthedocs.io/en/latest/advanced-usage.html#ssl-warnings
@@ -62,13 +65,19 @@ class Server:
     Set the Models object and Models.add() for how to load/create DNN models.
     
     It can be run in a handful of different ways:
-        * process() runs one iteration of the processing loop from the calling process/thread
+        * process() runs one iteration of the supervisor loop from the calling process/thread
         * run() runs the processing loop forever in the calling process/thread 
         * start() starts a new process that it runs forever in
         * connect() attempts to connect to an existing process, and if not starts one
+        * start() with in_process=True runs it on a thread of the calling process instead
         * running 'python3 server.py' to launch it manually (see __main__ below)
         
-    It typically runs in it's own process and uses JSON REST API's for command & control.
+    Each stream runs on its own worker threads (see Stream and StreamWorker), which the
+    processing loop starts, monitors, and restarts if they fail or stall.
+    
+    It typically runs in it's own process and uses JSON REST API's for command & control,
+    and pushes the versions of its resources, events and alerts to the clients when they
+    change with Server-Sent Events from /updates (see UpdatePublisher).
     This class is typically a singleton and can be accessed with Server.instance 
     """
     instance = None   # singleton instance
@@ -77,7 +86,9 @@ class Server:
     def __init__(self, name='server-backend', host='0.0.0.0', 
                  rest_port=49565, webrtc_port=49567, 
                  ssl_cert=None, ssl_key=None, stun_server=None, 
-                 resources=None):
+                 resources=None, supervise_interval=1.0, event_window=1000, event_db=None,
+                 update_interval=0.1, request_timeout=(5.0, 60.0), request_retries=3, 
+                 request_backoff=0.1, in_process=False):
         """
         Create a new instance of the backend server.
         
@@ -90,6 +101,16 @@ class Server:
             ssl_key (string) -- path to PEM-encoded SSL/TLS key file for enabling HTTPS
             stun_server (string) -- override the default WebRTC STUN server (stun.l.google.com:19302)
             resources (string or dict) -- either a path a json config file or dict containing resources to load
+            supervise_interval (float) -- seconds between the checks that restart failed streams
+            event_window (int) -- number of recent events to keep in memory
+            event_db (string) -- path to the SQLite database that older events are moved to
+            update_interval (float) -- minimum seconds between the updates pushed to a client
+            request_timeout (float or tuple) -- default (connect, read) seconds of Server.request()
+            request_retries (int) -- number of times Server.request() retries a failed request
+            request_backoff (float) -- backoff factor of the retries (see urllib3.util.Retry)
+            in_process (bool) -- if true, start() runs the server on a thread of the calling process,
+                                 and Server.request() calls it directly instead of over HTTP
+                                 (only use this when there's one client process, not with gunicorn)
         """
         Server.instance = self
         self.name = name
@@ -100,14 +121,21 @@ class Server:
         self.ssl_cert = ssl_cert
         self.ssl_key = ssl_key
         self.os_process = None  
+        self.os_thread = None            # the thread the server runs on when in_process=True
+        self.in_process = in_process
         self.run_flag = False            # this gets set to true when initialized successfully
         self.init_resources = resources  # these resources get loaded during init()
+        self.supervise_interval = supervise_interval
         self.resources = {
             'models': {},
             'streams' : {},
             #'datasets': {},
         }
-        self.events = []
+        self.updates = UpdatePublisher(interval=update_interval)
+        self.events = EventLog(window=event_window, path=event_db, 
+                               listener=lambda version: self.updates.publish('events', version))
+        self.session = RestSession(self.rest_url, timeout=request_timeout, 
+                                   retries=request_retries, backoff=request_backoff)
         self.alerts = []
         self.actions = []
         self.action_types = {}
@@ -126,10 +154,13 @@ class Server:
         Server.api.add_url_rule('/status', view_func=self._get_status, methods=['GET'])
         Server.api.add_url_rule('/resources', view_func=self._get_resources, methods=['GET'])
         Server.api.add_url_rule('/events', view_func=self._get_events, methods=['GET'])
+        Server.api.add_url_rule('/updates', view_func=self._get_updates, methods=['GET'])
         
         Server.api.add_url_rule('/streams', view_func=self._get_streams, methods=['GET'])
         Server.api.add_url_rule('/streams', view_func=self._add_stream, methods=['POST'])
         Server.api.add_url_rule('/streams/<name>', view_func=self._get_stream, methods=['GET'])
+        Server.api.add_url_rule('/streams/<name>/metrics', view_func=self._get_stream_metrics, methods=['GET'])
+        Server.api.add_url_rule('/metrics', view_func=self._get_metrics, methods=['GET'])
         
         Server.api.add_url_rule('/models', view_func=self._get_models, methods=['GET'])
         Server.api.add_url_rule('/models', view_func=self._add_model, methods=['POST'])
@@ -155,9 +186,20 @@ class Server:
         
         Server.api.json_encoder = MyJSONEncoder
         
+        # requests from this process skip HTTP and go to the flask app directly
+        self.session.app = Server.api
+        
+        # the clients keep their connections alive (see RestSession), so send the small
+        # responses right away instead of waiting for the delayed ACKs (Nagle's algorithm)
+        from werkzeug.serving import WSGIRequestHandler
+        
+        class RequestHandler(WSGIRequestHandler):
+            disable_nagle_algorithm = True
+            
         # start the REST server
         self.api_thread = threading.Thread(target=lambda: Server.api.run(host=self.host, port=self.rest_port,
-                                           ssl_context=(self.ssl_cert, self.ssl_key) if self.ssl_cert else None),
+                                           ssl_context=(self.ssl_cert, self.ssl_key) if self.ssl_cert else None,
+                                           request_handler=RequestHandler),
                                            name=f"{self.name}-rest")
         self.api_thread.start()
         
@@ -175,7 +217,7 @@ class Server:
         Attempt to connect to an existing instance of the server process.
         If one is not running, start it when autostart=True
         """
-        if self.os_process is None:
+        if self.os_process is None and not self.in_process:
             time.sleep(random.uniform(0.5, 5.0))
 
         if autostart and not is_process_running(self.name):
@@ -204,9 +246,14 @@ class Server:
      
     def start(self):
         """
-        Launch the server running in a new process.
+        Launch the server running in a new process (or a new thread when in_process=True).
         Returns the RPC proxy object for clients to call.
         """  
+        if self.in_process:
+            self.os_thread = threading.Thread(target=self.run, name=self.name, daemon=True)
+            self.os_thread.start()
+            return self.connect(autostart=False)
+            
         # we don't need the dash/webserver stuff, so use spawn instead of fork
         # TODO look into the memory savings/implications of this
         # https://britishgeologicalsurvey.github.io/science/python-forking-vs-spawn/
@@ -240,6 +287,11 @@ class Server:
         while self.run_flag:
             self.process()
           
+        for stream in list(self.resources['streams'].values()):
+            stream.stop()
+            
+        self.updates.close()
+        self.events.close()
         Log.Info(f"[{self.name}] stopped")
         
     def is_running(self):
@@ -250,19 +302,25 @@ class Server:
         
     def process(self):
         """
-        Perform one interation of the processing loop.
+        Perform one interation of the processing loop.  The streams run on their own
+        threads, so this starts new streams and restarts the ones that failed or stalled.
         """
-        if len(self.resources['streams']) > 0:
-            for stream in self.resources['streams'].values():
-                stream.process()
-        else:
-            time.sleep(1.0)
+        for stream in list(self.resources['streams'].values()):
+            try:
+                stream.supervise()
+            except Exception as error:
+                Log.Error(f"[{self.name}] failed to supervise stream {stream.name}")
+                traceback.print_exc()
+                
+        time.sleep(self.supervise_interval)
 
     @staticmethod
     def request(*args, **kwargs):
         """
         Wrapper around requests.request() that appends the server's address to the request URL.
         This can be used to make JSON REST API requests to the server without needing it's URL.
+        The connections are pooled and kept alive between requests (see RestSession), and 
+        from the server's own process the requests are handled directly without HTTP.
         """
         args = list(args)
         
@@ -272,14 +330,7 @@ class Server:
         if len(args) == 1:
             args.insert(0, 'GET')
             
-        if not args[1].startswith('http'):
-            if args[1][0] != '/':
-                args[1] = '/' + args[1]
-            args[1] = f"{Server.instance.rest_url}{args[1]}"
-
-        kwargs['verify'] = False
-        
-        return requests.request(*args, **kwargs)
+        return Server.instance.session.request(*args, **kwargs)
         
     def add_resource(self, group, name, *args, **kwargs):
         """
@@ -312,6 +363,7 @@ class Server:
             return
         
         self.resources[group][name] = resource
+        self.updates.publish('resources')
         return resource.get_config()
     
     def get_resource(self, group, name):
@@ -328,6 +380,22 @@ class Server:
             
         return self.resources[group][name].get_config()
         
+    def get_metrics(self, name=None):
+        """
+        Return a dict of a stream's FPS, queue depths and frame counters,
+        or of every stream's metrics by name if a name isn't given.
+        This function should only be called from the process the server is running in.
+        """
+        streams = self.resources['streams']
+        
+        if name is None:
+            return { name : stream.get_stats() for (name, stream) in list(streams.items()) }
+            
+        if name not in streams and not name.startswith('/'):
+            name = '/' + name
+            
+        return streams[name].get_stats()
+        
     def list_resources(self, groups=None):
         """
         Return a config dict from a group or groups of the server's resources.
@@ -456,6 +524,7 @@ class Server:
             Log.Error(f"[{self.name}] {text}")
             
         Server.instance.alerts.append((text, level, time.time(), duration))
+        Server.instance.updates.publish('alerts', len(Server.instance.alerts))
         
     def _get_status(self):
         """
@@ -497,6 +566,7 @@ class Server:
             return '', http.HTTPStatus.INTERNAL_SERVER_ERROR
             
         self.resources['models'][model.name] = model
+        self.updates.publish('resources')
         self.alert(f"Loaded {model.type} model {model.model}", level="success")
         
         return model.get_config(), http.HTTPStatus.CREATED       
@@ -513,6 +583,18 @@ class Server:
         """
         return self.get_resource('streams', name)
 
+    def _get_stream_metrics(self, name):
+        """
+        /streams/<name>/metrics REST GET request handler
+        """
+        return self.get_metrics(name)
+        
+    def _get_metrics(self):
+        """
+        /metrics REST GET request handler
+        """
+        return self.get_metrics()
+        
     def _add_stream(self):
         """
         /streams REST POST request handler
@@ -529,6 +611,7 @@ class Server:
             return '', http.HTTPStatus.INTERNAL_SERVER_ERROR
             
         self.resources['streams'][stream.name] = stream
+        self.updates.publish('resources')
         self.alert(f"Created stream {stream.name}", level="success")
         
         return stream.get_config(), http.HTTPStatus.CREATED
@@ -536,8 +619,39 @@ class Server:
     def _get_events(self):
         """
         /events REST GET request handler
+        
+        With ?since=<version>, only the events that changed after that version are returned
+        (with only their new scores), along with the current version to use as the next cursor,
+        the epoch of the versions (which changes when the server restarts) and the event window.
+        With any of ?begin=<time>&end=<time>&stream=<name>&label=<label>&limit=<n>, the matching
+        events are looked up in memory and on disk.  Otherwise the events in memory are returned.
+        """
+        args = flask.request.args
+        since = args.get('since', type=int)
+        
+        if since is None:
+            if args.keys() & {'begin', 'end', 'stream', 'label', 'limit'}:
+                return flask.jsonify(self.events.query(begin=args.get('begin', type=float), end=args.get('end', type=float),
+                                                       stream=args.get('stream'), label=args.get('label'),
+                                                       limit=args.get('limit', default=1000, type=int)))
+            
+            return flask.jsonify(list(self.events))
+            
+        version, events = self.events.since(since)
+        return flask.jsonify({'version': version, 'epoch': self.events.epoch, 'window': self.events.window,
+                              'count': len(self.events), 'events': events})
+        
+    def _get_updates(self):
+        """
+        /updates REST GET request handler
+        
+        Streams the versions of the resources, events and alerts as Server-Sent Events
+        whenever they change, for the clients to request what changed instead of polling.
+        The browsers connect to it directly (like to the WebRTC server), so CORS is allowed.
         """
-        return flask.jsonify(self.events)
+        return flask.Response(self.updates.subscribe(), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+                                       'Access-Control-Allow-Origin': '*'})
      
     def _add_action(self):
         """
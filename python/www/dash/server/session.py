@@ -0,0 +1,120 @@
+#
+# Pooled keep-alive HTTP session for the REST API (see Server.request).
+#
+# Server.request() used to call requests.request() directly, so each request
+# from the dash callbacks - on_refresh(), the event table and timeline, the
+# alerts, and the stream/model dialogs - opened a new TCP connection to the
+# backend server (and did a TLS handshake when it uses HTTPS) that was closed
+# again after the response.  A RestSession keeps a requests.Session, whose
+# connection pool is shared by the threads of the process, so the connections
+# are kept alive and reused by the following requests.  The requests get a
+# default (connect, read) timeout, and the ones that failed to connect or got
+# a 502/503/504 response are retried with an exponential backoff (once a
+# request was sent, only the idempotent methods are retried).
+#
+# Connections can't be shared across a fork, so each process creates its own
+# pool with its first request (gunicorn forks its workers after importing the
+# app).  And when the dash app and the server are in the same process (e.g.
+# with Server(in_process=True)), the requests are handed to the flask app
+# directly, without going through HTTP at all.
+#
+import os
+import threading
+
+import urllib3
+import requests
+
+
+class RestSession:
+    """
+    Thread-safe, per-process pool of keep-alive connections to the server's REST API.
+
+    Usage:
+        session = RestSession('http://0.0.0.0:49565', timeout=(5.0, 60.0), retries=3)
+        status = session.request('GET', '/status').json()
+    """
+    def __init__(self, url, timeout=(5.0, 60.0), retries=3, backoff=0.1, pool_size=16, verify=False, app=None):
+        """
+        Parameters:
+            url (string) -- base URL of the server that the request paths are relative to
+            timeout (float or tuple) -- default seconds to wait for the connection and for the response,
+                                        as a (connect, read) tuple or list, or a float for both
+            retries (int) -- number of times a failed request is retried
+            backoff (float) -- backoff factor of the retries, which wait backoff * 2^(n-1) seconds
+                               (see urllib3.util.Retry)
+            pool_size (int) -- maximum connections kept alive (the most threads making requests at once)
+            verify (bool) -- verify the server's SSL certificate (which is usually self-signed)
+            app (flask.Flask) -- if set, the requests are handled by this flask app in the same process
+        """
+        self.url = url
+        self.timeout = tuple(timeout) if isinstance(timeout, list) else timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.verify = verify
+        self.app = app
+        self.session = None   # the requests.Session of the process that created it
+        self.pid = None       # the process the session was created in
+        self.lock = threading.Lock()
+
+    def request(self, method, path, **kwargs):
+        """
+        Make a request like requests.request(), with the path relative to the server's URL
+        (unless it's a full URL).  Returns the requests.Response.
+        """
+        if not path.startswith('http'):
+            if path[0] != '/':
+                path = '/' + path
+
+            if self.app is not None and not kwargs.get('stream'):
+                return self.dispatch(method, path, **kwargs)
+
+            path = self.url + path
+
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('verify', self.verify)
+
+        return self.get_session().request(method, path, **kwargs)
+
+    def get_session(self):
+        """
+        Return the requests.Session of this process, creating it if needed.
+        """
+        pid = os.getpid()
+
+        if self.session is not None and self.pid == pid:
+            return self.session
+
+        with self.lock:
+            if self.session is None or self.pid != pid:
+                retry = urllib3.util.Retry(total=self.retries, backoff_factor=self.backoff,
+                                           status_forcelist=(502, 503, 504), raise_on_status=False)
+
+                adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+
+                self.session = session
+                self.pid = pid
+
+            return self.session
+
+    def dispatch(self, method, path, params=None, data=None, json=None, headers=None, **kwargs):
+        """
+        Handle a request with the flask app of this process instead of over HTTP,
+        and return its response as a requests.Response.
+        """
+        result = self.app.test_client().open(path, method=method, query_string=params,
+                                             data=data, json=json, headers=headers)
+
+        response = requests.Response()
+        response.status_code = result.status_code
+        response.reason = result.status.partition(' ')[2]
+        response.headers = requests.structures.CaseInsensitiveDict(result.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        response.url = self.url + path
+        response._content = result.get_data()
+
+        return response
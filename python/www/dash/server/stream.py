@@ -20,7 +20,9 @@
 # DEALINGS IN THE SOFTWARE.
 #
 
-from jetson_utils import videoSource, videoOutput, Log
+from jetson_utils import videoSource, videoOutput, cudaAllocMapped, cudaMemcpy, Log
+
+from .worker import StreamWorker
 
 import pprint
 import traceback
@@ -28,14 +30,17 @@ import traceback
 class Stream:
     """
     Represents a pipeline from a video source -> processing -> video output
+    
+    Each stream runs in its own StreamWorker threads (capture, models and render are
+    pipelined), which the server starts and restarts by calling supervise().
     """
-    def __init__(self, server, name, source, models=[]):
+    def __init__(self, server, name, source, models=[], queue_size=1, stall_timeout=10.0):
         # make sure all routes start with '/'
         if not name.startswith('/'):   
             name = '/' + name
             
         # enable HTTPS/SSL
-        video_args = None
+        video_args = []
         
         if server.ssl_cert and server.ssl_key:
             video_args = [f"--ssl-cert={server.ssl_cert}", f"--ssl-key={server.ssl_key}"]
@@ -44,11 +49,12 @@ class Stream:
         
         self.server = server
         self.name = name
+        self.uri = source
+        self.video_args = video_args
         self.frame_count = 0
         
         # create video interfaces
-        self.source = videoSource(source, argv=video_args)
-        self.output = videoOutput(f"webrtc://@:{self.server.webrtc_port}{self.name}", argv=video_args)
+        self.open()
         
         # lookup models
         self.models = []
@@ -65,31 +71,97 @@ class Stream:
             else:
                 Log.Verbose(f"[{self.server.name}] model '{model}' was not loaded on server")
 
+        # pipeline threads
+        self.worker = StreamWorker(self.name, capture=self.capture, process=self.run_models,
+                                   render=self.render, reopen=self.open, copy=cuda_copy, 
+                                   queue_size=queue_size, stall_timeout=stall_timeout)
+        
+    def open(self):
+        """
+        Open (or reopen) the video source and output.
+        """
+        if getattr(self, 'source', None) is not None:
+            Log.Info(f"[{self.server.name}] {self.name} -- reopening {self.uri}")
+            self.source.Close()
+            
+        self.source = videoSource(self.uri, argv=self.video_args)
+        
+        if getattr(self, 'output', None) is None:
+            self.output = videoOutput(f"webrtc://@:{self.server.webrtc_port}{self.name}", argv=self.video_args)
+            
+    def capture(self):
+        """
+        Capture the next frame (or return None on timeout).  When a video file ends, this
+        raises EOFError (which finishes the stream), and when a live source stops streaming,
+        IOError (which restarts it).
+        """
+        img = self.source.Capture()
+        
+        if img is None and not self.source.IsStreaming():
+            if self.source.GetOptions()['resource']['protocol'] == 'file':
+                raise EOFError(f"reached the end of {self.uri}")
+            raise IOError(f"{self.uri} stopped streaming")
+            
+        return img
+        
+    def run_models(self, img):
+        """
+        Process a frame with the models and draw their results on it.
+        """
+        for model in self.models:
+            model.process(img)
+            
+        for model in self.models:
+            model.visualize(img)
+            
+    def render(self, img):
+        """
+        Output a processed frame.
+        """
+        if self.frame_count % 25 == 0 or self.frame_count < 15:
+            Log.Verbose(f"[{self.server.name}] {self.name} -- captured frame {self.frame_count}  ({img.width}x{img.height})")
+
+        self.output.Render(img)
+        self.frame_count += 1
+        
+    def supervise(self):
+        """
+        Start the stream's threads, or restart them if the stream failed or stalled.
+        """
+        return self.worker.supervise()
+        
+    def stop(self):
+        """
+        Stop the stream's threads.
+        """
+        self.worker.stop()
+        
     def process(self):
         """
-        Perform one capture/process/output iteration
+        Perform one capture/process/output iteration from the calling thread
+        (instead of running the stream on its own threads with supervise())
         """
         try:
-            img = self.source.Capture()
+            img = self.capture()
             
             if img is None:  # timeout
                 return
                 
-            for model in self.models:
-                model.process(img)
-                
-            for model in self.models:
-                model.visualize(img)
+            self.run_models(img)
         except:
-            # TODO check if stream is still open, if not reconnect?
             traceback.print_exc()
             return
             
-        if self.frame_count % 25 == 0 or self.frame_count < 15:
-            Log.Verbose(f"[{self.server.name}] {self.name} -- captured frame {self.frame_count}  ({img.width}x{img.height})")
-
-        self.output.Render(img)
-        self.frame_count += 1
+        self.render(img)
+        
+    def get_stats(self):
+        """
+        Return a dict of the stream's FPS, queue depths and frame counters.
+        """
+        return {
+            "name" : self.name,
+            **self.worker.stats()
+        }
        
     def get_config(self):
         """
@@ -103,7 +175,20 @@ class Stream:
             "models" : [model.name for model in self.models]
             #'frame_count' : self.frame_count 
         }
+        
 
+def cuda_copy(src, dst=None):
+    """
+    Copy a cudaImage into dst, (re)allocating dst if it doesn't match the size and format of src.
+    Returns the copy.
+    """
+    if dst is None or dst.width != src.width or dst.height != src.height or dst.format != src.format:
+        dst = cudaAllocMapped(like=src)
+        
+    cudaMemcpy(dst, src)
+    return dst
+    
+    
 """       
 class Streams:
     def __init__(self, server):
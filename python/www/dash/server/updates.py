@@ -0,0 +1,123 @@
+#
+# Push channel of the backend server's changes, as Server-Sent Events.
+#
+# The dash app used to poll the server on fixed dcc.Interval timers from every
+# open browser - /resources every 2.5 s, /status every second, and /events
+# twice every 500 ms (the event table and the timeline) - whether or not
+# anything had changed, and a change took up to the timer period to show up.
+# The UpdatePublisher keeps a version number per topic (resources, events and
+# alerts) that the server bumps when they change, and /updates streams the
+# versions to each subscriber:
+#
+#   GET /updates   ->   event: update
+#                       data: {"resources": 3, "events": 1234, "alerts": 7}
+#
+# The browser (assets/updates.js) holds an EventSource open to it, and when a
+# topic's version changes, it sets the dash store of that topic - which only
+# triggers the callbacks that depend on it, and they fetch the change with the
+# REST API as before.  A change after a quiet period is sent right away, and
+# a busy topic (the events of running streams) at most once per interval -
+# which is most of the latency of the events under load, so the default 0.1 s
+# keeps it under 100 ms (about 45 ms in benchmark.py push, against 125 ms at
+# 0.25 s), at the cost of a refresh request per browser every 0.1 s.
+# While nothing changes, only a keepalive comment is sent every so often.
+#
+import json
+import time
+import threading
+
+
+class UpdatePublisher:
+    """
+    Versions of the server's topics that are pushed to the subscribers when they change.
+
+    Usage:
+        updates = UpdatePublisher(interval=0.1)
+        updates.publish('alerts')                # bump the version of a topic
+        updates.publish('events', log.version)   # or set it
+
+        for message in updates.subscribe():      # the text/event-stream of a client
+            ...
+    """
+    def __init__(self, topics=('resources', 'events', 'alerts'), interval=0.1, keepalive=15.0, retry=2.0):
+        """
+        Parameters:
+            topics (list) -- names of the topics
+            interval (float) -- minimum seconds between the messages sent to a subscriber
+            keepalive (float) -- seconds without changes after which a keepalive comment is sent
+                                 (this is also how disconnected subscribers get noticed)
+            retry (float) -- seconds the browser waits before reconnecting a lost connection
+        """
+        self.versions = {topic: 0 for topic in topics}
+        self.interval = interval
+        self.keepalive = keepalive
+        self.retry = retry
+        self.condition = threading.Condition()
+        self.closed = False
+        self.subscribers = 0   # number of subscribers connected
+        self.messages = 0      # number of update messages sent
+
+    def publish(self, topic, version=None):
+        """
+        Mark a topic as changed, by incrementing its version or setting it to the given one.
+        This never blocks for long, and can be called from any thread.
+        """
+        with self.condition:
+            self.versions[topic] = self.versions[topic] + 1 if version is None else version
+            self.condition.notify_all()
+
+    def wait(self, versions=None, timeout=None):
+        """
+        Wait until the versions differ from the given ones (or the timeout expires),
+        and return a copy of the current versions.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.closed or self.versions != versions, timeout)
+            return dict(self.versions)
+
+    def subscribe(self):
+        """
+        Generator of the text/event-stream messages for a subscriber, starting with the current
+        versions.  It exits when the publisher is closed (or the client disconnects).
+        """
+        with self.condition:
+            self.subscribers += 1
+
+        try:
+            yield f"retry: {int(self.retry * 1000)}\n\n"
+
+            sent = None
+            last = 0.0
+
+            while not self.closed:
+                # a busy topic is sent at most once per interval
+                delay = last + self.interval - time.monotonic()
+
+                if delay > 0:
+                    time.sleep(delay)
+
+                versions = self.wait(sent, self.keepalive)
+
+                if self.closed:
+                    break
+
+                if versions == sent:
+                    yield ": keepalive\n\n"
+                    continue
+
+                sent = versions
+                last = time.monotonic()
+                self.messages += 1
+
+                yield f"event: update\ndata: {json.dumps(versions)}\n\n"
+        finally:
+            with self.condition:
+                self.subscribers -= 1
+
+    def close(self):
+        """
+        End the subscriptions.
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
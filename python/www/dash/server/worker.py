@@ -0,0 +1,367 @@
+#
+# Per-stream pipeline threads for the backend server.
+#
+# Server.process() used to loop over the streams and run each one's
+# capture -> models -> render serially in one thread, so a slow RTSP source
+# or model stalled every other camera, and the aggregate FPS dropped as
+# streams were added.  A StreamWorker runs a stream as three pipelined
+# threads (capture, process, render) connected by small FrameQueues, so the
+# next frame is being captured while the previous one is in the models and
+# the one before that is being encoded.  The queues drop their oldest frame
+# when the next stage falls behind (the frames are counted as dropped), which
+# keeps the latency bounded.
+#
+# Up to 3 + 2 * queue_size frames are in flight at once (one in each stage and
+# the queued ones), which is more than the 4 images in a videoSource's ring
+# buffer - so with a copy function, each captured image is copied into one of
+# the worker's own buffers, which are recycled once a frame was rendered or
+# dropped, and the source is free to reuse its image with the next Capture().
+#
+# supervise() is called periodically from the server's main loop:  it starts
+# the worker, and if a stage raised an exception or no frame was captured for
+# the stall timeout, it reopens the stream and restarts it with an exponential
+# backoff (once all of the stages have exited, so the source isn't closed while
+# a Capture() is still using it).  If capture() raises EOFError (e.g. the end
+# of a video file), the stream is finished and isn't restarted.  stats()
+# returns the per-stage FPS, queue depths and counters that the /metrics REST
+# endpoints report.
+#
+import time
+import threading
+import traceback
+import collections
+
+
+class FrameQueue:
+    """
+    Bounded queue between two pipeline stages that drops its oldest item when full.
+    """
+    def __init__(self, size=1):
+        self.items = collections.deque()
+        self.size = size
+        self.condition = threading.Condition()
+        self.dropped = 0   # number of items dropped because the queue was full
+
+    def put(self, item):
+        """
+        Add an item, dropping the oldest one if the queue is full.  This never blocks.
+        Returns the dropped item (or None).
+        """
+        dropped = None
+
+        with self.condition:
+            if len(self.items) >= self.size:
+                dropped = self.items.popleft()
+                self.dropped += 1
+
+            self.items.append(item)
+            self.condition.notify()
+
+        return dropped
+
+    def get(self, timeout=None):
+        """
+        Wait for and return the oldest item, or None if the timeout expired.
+        """
+        with self.condition:
+            if not self.items and not self.condition.wait_for(lambda: self.items, timeout):
+                return None
+
+            return self.items.popleft()
+
+    def clear(self):
+        with self.condition:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class RateMeter:
+    """
+    Frame rate over a sliding window of the most recent frames.
+    """
+    def __init__(self, window=30, timeout=2.0):
+        """
+        Parameters:
+            window (int) -- number of frames to average the rate over
+            timeout (float) -- seconds without a frame after which the rate is zero
+        """
+        self.times = collections.deque(maxlen=window)
+        self.timeout = timeout
+        self.count = 0
+
+    def tick(self):
+        self.times.append(time.perf_counter())
+        self.count += 1
+
+    @property
+    def last(self):
+        """
+        time.perf_counter() of the last frame (or None).
+        """
+        return self.times[-1] if self.times else None
+
+    @property
+    def fps(self):
+        times = list(self.times)
+
+        if len(times) < 2 or time.perf_counter() - times[-1] > self.timeout:
+            return 0.0
+
+        return (len(times) - 1) / (times[-1] - times[0])
+
+
+class StreamWorker:
+    """
+    Runs a stream's capture, process and render stages on their own threads.
+
+    Usage:
+        worker = StreamWorker('/camera', capture=source.Capture, process=run_models,
+                              render=output.Render, reopen=open_stream)
+
+        while True:
+            worker.supervise()   # starts the worker, and restarts it if it failed or stalled
+            time.sleep(1.0)
+    """
+    def __init__(self, name, capture, process=None, render=None, reopen=None, copy=None, queue_size=1,
+                 stall_timeout=10.0, backoff=1.0, max_backoff=30.0):
+        """
+        Parameters:
+            name (string) -- name of the stream (used for the thread names and logging)
+            capture (callable) -- capture() returns the next image, or None on timeout
+                                  (and raises EOFError when the stream ended)
+            process (callable) -- process(img) runs the models on the image (optional)
+            render (callable) -- render(img) outputs the image (optional)
+            reopen (callable) -- reopen() is called before restarting a failed stream
+            copy (callable) -- copy(img, buffer) copies a captured image into one of the worker's
+                               buffers (allocating it if buffer is None) and returns it - without
+                               it, the source's images are passed through the stages as they are
+            queue_size (int) -- maximum number of frames waiting between two stages
+            stall_timeout (float) -- restart the stream if no frame was captured for this many seconds
+            backoff (float) -- seconds to wait before the first restart, doubling with each
+                               failed restart up to max_backoff
+            max_backoff (float) -- maximum seconds to wait between restarts
+        """
+        self.name = name
+        self.capture = capture
+        self.process = process
+        self.render = render
+        self.reopen = reopen
+        self.copy = copy
+        self.stall_timeout = stall_timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.queues = {'process': FrameQueue(queue_size), 'render': FrameQueue(queue_size)}
+        self.rates = {'capture': RateMeter(), 'process': RateMeter(), 'render': RateMeter()}
+        self.buffers = []         # the worker's frame buffers that are free (with a copy function)
+        self.buffers_lock = threading.Lock()
+        self.threads = []
+        self.run_flag = False
+        self.finished = False     # set when the stream ended (capture() raised EOFError)
+        self.generation = 0       # incremented on each start, so threads left over from before a restart exit
+        self.started = None       # time.perf_counter() when the stages were last started
+        self.error = None         # the last exception raised by a stage
+        self.restarts = 0         # number of times the stream was restarted
+        self.failures = 0         # number of consecutive failed starts (for the backoff)
+        self.next_restart = 0.0   # earliest time.perf_counter() of the next restart
+
+    def start(self):
+        """
+        Start the capture, process and render threads.
+        """
+        if self.running:
+            return
+
+        for queue in self.queues.values():
+            queue.clear()
+
+        self.run_flag = True
+        self.finished = False
+        self.error = None
+        self.started = time.perf_counter()
+        self.generation += 1
+
+        self.threads = [threading.Thread(target=self.run_stage, args=(stage, self.generation),
+                                         name=f"{self.name}-{stage}", daemon=True)
+                        for stage in ('capture', 'process', 'render')]
+
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=1.0):
+        """
+        Signal the threads to exit and wait for them.
+        """
+        self.run_flag = False
+
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+
+    @property
+    def running(self):
+        """
+        True while all of the stages are running.
+        """
+        return self.run_flag and len(self.threads) > 0 and all(thread.is_alive() for thread in self.threads)
+
+    @property
+    def stalled(self):
+        """
+        True if no frame was captured for the stall timeout.
+        """
+        if not self.running or self.stall_timeout is None:
+            return False
+
+        last = self.rates['capture'].last
+        last = self.started if last is None or last < self.started else last
+        return time.perf_counter() - last > self.stall_timeout
+
+    @property
+    def alive(self):
+        """
+        True while any of the stage threads hasn't exited (e.g. the capture is blocked in the source).
+        """
+        return any(thread.is_alive() for thread in self.threads if thread is not threading.current_thread())
+
+    def is_current(self, generation):
+        """
+        True while the threads started as the given generation should keep running.
+        """
+        return self.run_flag and generation == self.generation
+
+    def run_stage(self, stage, generation):
+        """
+        Thread function of a stage - any exception stops the whole stream (until it's restarted).
+        """
+        try:
+            if stage == 'capture':
+                self.capture_loop(generation)
+            else:
+                self.stage_loop(stage, generation)
+        except EOFError as error:
+            if self.is_current(generation):
+                print(f"[{self.name}] stream ended ({error})")
+                self.finished = True
+                self.run_flag = False
+        except Exception as error:
+            if self.is_current(generation):
+                self.error = f"{type(error).__name__}: {error}"
+                self.run_flag = False
+                traceback.print_exc()
+
+    def capture_loop(self, generation):
+        while self.is_current(generation):
+            img = self.capture()
+
+            if img is None or not self.is_current(generation):  # timeout
+                continue
+
+            if self.copy is not None:
+                img = self.copy(img, self.acquire())
+
+            self.rates['capture'].tick()
+            self.release(self.queues['process'].put(img))
+
+    def stage_loop(self, stage, generation):
+        func = self.process if stage == 'process' else self.render
+
+        while self.is_current(generation):
+            img = self.queues[stage].get(timeout=0.25)
+
+            if img is None:
+                continue
+
+            if func is not None:
+                func(img)
+
+            self.rates[stage].tick()
+
+            if stage == 'process':
+                self.release(self.queues['render'].put(img))
+            else:
+                self.release(img)
+
+    def acquire(self):
+        """
+        Take a free frame buffer (or None if there isn't one, and the copy allocates it).
+        """
+        with self.buffers_lock:
+            return self.buffers.pop() if self.buffers else None
+
+    def release(self, img):
+        """
+        Return a frame that was rendered or dropped to the free buffers (when copying).
+        """
+        if img is None or self.copy is None:
+            return
+
+        with self.buffers_lock:
+            self.buffers.append(img)
+
+    def supervise(self):
+        """
+        Start the stream if it isn't running, and restart it if a stage failed or it stalled
+        (waiting out the backoff between restarts).  Returns true if the stream is running.
+        """
+        if self.finished:
+            return False
+
+        if self.running and not self.stalled:
+            if time.perf_counter() - self.started > self.max_backoff:
+                self.failures = 0   # it has been running fine since the last restart
+            return True
+
+        now = time.perf_counter()
+
+        if now < self.next_restart:
+            return False
+
+        restart = self.started is not None
+
+        if restart and self.error is None:
+            self.error = 'stalled' if self.run_flag else 'stopped'
+
+        self.stop()
+
+        if self.alive:
+            # a stage is still inside a call (usually capture() blocked in the source), and
+            # reopening would close the source under it - try again on the next call
+            print(f"[{self.name}] waiting for the stream's threads to exit before restarting it")
+            return False
+
+        if restart:
+            print(f"[{self.name}] restarting stream ({self.error})")
+
+        try:
+            if restart and self.reopen is not None:
+                self.reopen()
+
+            self.start()
+        except Exception as error:
+            self.error = f"{type(error).__name__}: {error}"
+            traceback.print_exc()
+
+        if restart:
+            self.restarts += 1
+            self.failures += 1
+            self.next_restart = now + min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+
+        return self.running
+
+    def stats(self):
+        """
+        Return a dict of the stream's per-stage FPS, queue depths and counters.
+        """
+        return {
+            'running': self.running,
+            'finished': self.finished,
+            'fps': {stage: round(rate.fps, 2) for stage, rate in self.rates.items()},
+            'frames': {stage: rate.count for stage, rate in self.rates.items()},
+            'queue_depth': {stage: len(queue) for stage, queue in self.queues.items()},
+            'dropped': {stage: queue.dropped for stage, queue in self.queues.items()},
+            'restarts': self.restarts,
+            'error': self.error,
+        }
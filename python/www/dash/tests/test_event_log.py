@@ -0,0 +1,262 @@
+#
+# Tests of the EventLog with the server's Event class (server/event.py), which
+# is loaded on its own because the rest of the server package needs flask and
+# jetson_utils, and of the dash app's copy of the events (layout/event_cache.py),
+# which gets its /events?since= responses straight from an EventLog.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import json
+import types
+import threading
+import importlib.util
+
+import pytest
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(DASH_DIR, 'server'))
+
+from event_log import EventLog
+
+
+class ServerInstance:
+    """
+    The attributes of Server.instance that an Event uses.
+    """
+    def __init__(self, events):
+        self.name = 'server-test'
+        self.events = events
+        self.actions = []
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """
+    Returns the Server class and the real Event class from server/event.py.
+    """
+    module = types.ModuleType('server')
+    module.Server = type('Server', (), {'instance': None})
+    monkeypatch.setitem(sys.modules, 'server', module)
+
+    spec = importlib.util.spec_from_file_location('server_event', os.path.join(DASH_DIR, 'server', 'event.py'))
+    event = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(event)
+
+    return module.Server, event.Event
+
+
+def create_event(Event, label='person', score=0.5):
+    return Event(types.SimpleNamespace(name='/camera'), types.SimpleNamespace(name='detector'), 1, label, score)
+
+
+@pytest.fixture
+def event_cache(server):
+    """
+    Returns the layout/event_cache.py module, with Server.request() serving /events?since=
+    from the EventLog of Server.instance.
+    """
+    Server, _ = server
+
+    def request(path, params):
+        log = Server.instance.events
+        version, events = log.since(params['since'])
+        response = {'version': version, 'epoch': log.epoch, 'window': log.window, 'count': len(log), 'events': events}
+        return types.SimpleNamespace(json=lambda: json.loads(json.dumps(response)))
+
+    Server.request = staticmethod(request)
+
+    spec = importlib.util.spec_from_file_location('event_cache', os.path.join(DASH_DIR, 'layout', 'event_cache.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    return module
+
+
+def add_scores(log, event, timestamps, score=0.5):
+    with log.lock:
+        for timestamp in timestamps:
+            log.add_score(event, timestamp, score)
+
+
+def test_event_updates_are_bucketed(server):
+    Server, Event = server
+    log = EventLog(bucket=10.0)
+    Server.instance = ServerInstance(log)
+
+    event = create_event(Event)
+
+    for n in range(100):
+        event.update(n / 100)
+
+    assert event.frames == 100
+    assert all(len(bucket) == 5 for bucket in event.scores)
+    assert sum(bucket[4] for bucket in event.scores) == 101
+    assert event.scores[-1][3] == pytest.approx(0.99)
+
+    version, records = log.since(0)
+    assert version == log.version
+    assert [record[0] for record in records] == [event.id]
+    assert records[0][10] == event.scores
+
+
+def test_event_scores_are_bounded(server):
+    Server, Event = server
+    log = EventLog(bucket=1e-9, max_buckets=8)
+    Server.instance = ServerInstance(log)
+
+    event = create_event(Event)
+
+    for n in range(1000):
+        event.update(0.5)
+
+    assert len(event.scores) <= 8
+    assert sum(bucket[4] for bucket in event.scores) == 1001
+    assert event.bucket > 1e-9   # the buckets were merged
+
+
+def test_events_spill_to_disk(server, tmp_path):
+    Server, Event = server
+    log = EventLog(window=1, path=str(tmp_path / 'events.db'), idle=-1.0)
+    Server.instance = ServerInstance(log)
+
+    first = create_event(Event, 'person')
+    first.update(0.75)
+    second = create_event(Event, 'car')
+
+    assert log.spilled == 1
+    assert list(log) == [second]
+
+    records = log.query(label='person')
+    assert [record[0] for record in records] == [first.id]
+    assert records[0][10] == [list(bucket) for bucket in first.scores]
+
+    log.close()
+
+
+def test_since_returns_only_the_changes(server):
+    Server, Event = server
+    log = EventLog(bucket=1.0)
+    Server.instance = ServerInstance(log)
+
+    first = create_event(Event, 'person')
+    second = create_event(Event, 'car')
+    add_scores(log, first, [first.begin + 1, first.begin + 2])
+    cursor = log.version
+
+    add_scores(log, second, [second.begin + 1])
+    add_scores(log, first, [first.begin + 2.5, first.begin + 3])
+
+    version, records = log.since(cursor)
+
+    # in the order they last changed, with the buckets that were added or changed after the cursor
+    assert version == log.version
+    assert [record[0] for record in records] == [second.id, first.id]
+    assert records[1][10] == first.scores[-2:]
+    assert records[1][10][0][4] == 2   # the bucket that got another score
+    assert log.since(version) == (version, [])
+
+
+def test_event_cache_merges_buckets(server, event_cache):
+    Server, Event = server
+    log = EventLog(bucket=1.0)
+    Server.instance = ServerInstance(log)
+    cache = event_cache.EventCache()
+
+    event = create_event(Event)
+    add_scores(log, event, [event.begin + n for n in range(1, 4)])
+    version = cache.refresh()
+
+    add_scores(log, event, [event.begin + 3.5, event.begin + 4])
+    assert cache.changed(version) == []
+
+    version = cache.refresh()
+
+    assert cache.changed(0) == [event.id]
+    assert cache.records[event.id][10] == [list(bucket) for bucket in event.scores]
+
+    # the buckets get merged on the server, which sends all of them again
+    with log.lock:
+        log.max_buckets = 2
+        log.add_score(event, event.begin + 10, 0.5)
+
+    cache.refresh()
+
+    assert cache.records[event.id][10] == [list(bucket) for bucket in event.scores]
+    assert cache.changed(version) == [event.id]
+
+
+def test_event_cache_evicts_and_resets(server, event_cache):
+    Server, Event = server
+    log = EventLog(window=3, idle=1e9)
+    Server.instance = ServerInstance(log)
+    cache = event_cache.EventCache()
+    view = event_cache.EventView(cache, lambda record: record[0], limit=2)
+
+    events = [create_event(Event) for _ in range(5)]
+    add_scores(log, events[0], [events[0].begin + 1])   # the oldest event changed last
+
+    version = cache.refresh()
+
+    assert sorted(cache.records) == [events[0].id, events[3].id, events[4].id]
+    assert cache.evicted == 2
+    assert view.update(version) == [events[4].id, events[0].id]
+
+    # a restarted server starts its versions over, with a new epoch
+    Server.instance = ServerInstance(EventLog())
+    restarted = create_event(Event)
+    version = cache.refresh()
+
+    assert cache.resets == 1 and list(cache.records) == [restarted.id]
+    assert view.update(version) == [restarted.id]
+
+
+def test_spill_writes_outside_the_lock(server, tmp_path):
+    Server, Event = server
+    log = EventLog(window=1, path=str(tmp_path / 'events.db'), idle=-1.0)
+    Server.instance = ServerInstance(log)
+    commits = []
+
+    class Database:
+        """
+        The log's database, recording whether another thread could take the lock during each commit.
+        """
+        def __init__(self, db):
+            self.db = db
+
+        def __getattr__(self, name):
+            return getattr(self.db, name)
+
+        def commit(self):
+            thread = threading.Thread(target=lambda: commits.append(log.lock.acquire(timeout=1.0) and log.lock.release() is None))
+            thread.start()
+            thread.join()
+            self.db.commit()
+
+    log.db = Database(log.db)
+
+    first = create_event(Event, 'person')
+    second = create_event(Event, 'car')
+
+    assert commits == [True]
+    assert log.pending == {} and log.spilled == 1
+
+    # until the spilled rows are written, the queries find them pending
+    log.idle = 1e9
+    third = create_event(Event, 'person')   # the window is full, but it's being updated
+    log.idle = -1.0
+
+    with log.lock:
+        rows = log.spill()
+
+    assert list(log.pending) == [second.id]
+    assert [record[0] for record in log.query(label='car')] == [second.id]
+
+    log.write(rows)
+
+    assert log.pending == {} and commits == [True, True]
+    assert [record[0] for record in log.query(label='car')] == [second.id]
+    assert [record[0] for record in log.query(label='person')] == [third.id, first.id]
+
+    log.close()
@@ -0,0 +1,136 @@
+#
+# Tests of the pooled REST session (server/session.py), with a stub flask app
+# and a stub HTTP server.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import json
+import threading
+import http.server
+import multiprocessing
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(DASH_DIR, 'server'))
+
+from session import RestSession
+
+
+def encode(value):
+    return json.dumps(value).encode()
+
+
+class StubResult:
+    """
+    The attributes of the werkzeug response that a flask test client returns.
+    """
+    def __init__(self, status_code, status, headers, data):
+        self.status_code = status_code
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+    def get_data(self):
+        return self.data
+
+
+class StubApp:
+    """
+    Stand-in for a flask app, whose test client echoes the requests it gets.
+    """
+    def __init__(self):
+        self.requests = []
+
+    def test_client(self):
+        return self
+
+    def open(self, path, method='GET', query_string=None, data=None, json=None, headers=None):
+        self.requests.append((method, path, query_string, json))
+        body = encode({'method': method, 'path': path, 'params': query_string, 'json': json})
+        return StubResult(201, '201 CREATED', {'Content-Type': 'application/json; charset=utf-8'}, body)
+
+
+class FlakyHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Responds 503 to the first requests of each path (the count is given by the path), then 200,
+    and records the client port of each request.
+    """
+    protocol_version = 'HTTP/1.1'
+    counts = {}
+    ports = []
+
+    def do_GET(self):
+        FlakyHandler.ports.append(self.client_address[1])
+        count = FlakyHandler.counts[self.path] = FlakyHandler.counts.get(self.path, 0) + 1
+        status = 503 if count <= int(self.path.strip('/')) else 200
+        body = encode({'requests': count})
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_dispatch_to_app():
+    app = StubApp()
+    session = RestSession('http://server:49565', app=app)
+
+    response = session.request('POST', 'streams', params={'name': 'a'}, json={'source': '/dev/video0'}, timeout=1.0)
+
+    assert response.status_code == 201 and response.reason == 'CREATED' and response.ok
+    assert response.headers['content-type'].startswith('application/json')
+    assert response.encoding == 'utf-8'
+    assert response.url == 'http://server:49565/streams'
+    assert response.json() == {'method': 'POST', 'path': '/streams', 'params': {'name': 'a'}, 'json': {'source': '/dev/video0'}}
+    assert session.session is None   # no HTTP session was needed
+
+
+def test_retries_and_keepalive():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), FlakyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        session = RestSession(url, timeout=[1.0, 2.0], retries=2, backoff=0.0)
+
+        assert session.timeout == (1.0, 2.0)
+        assert session.request('GET', '/2').json() == {'requests': 3}     # two 503s were retried
+        assert session.request('GET', '/5').status_code == 503            # out of retries
+        assert len(FlakyHandler.ports) == 6 and len(set(FlakyHandler.ports)) == 1   # over one kept-alive connection
+
+        retry = session.get_session().get_adapter(url).max_retries
+
+        assert (retry.total, retry.backoff_factor) == (2, 0.0)
+        assert set(retry.status_forcelist) == {502, 503, 504}
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def check_child_session(session, parent, results):
+    child = session.get_session()
+    results.put((child is not parent, session.pid == os.getpid(), child is session.get_session()))
+
+
+def test_session_per_process():
+    session = RestSession('http://127.0.0.1:1')
+    parent = session.get_session()
+
+    assert session.get_session() is parent
+
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=check_child_session, args=(session, parent, results))
+    process.start()
+
+    # the forked child got a new session of its own, which it keeps using
+    assert results.get(timeout=10) == (True, True, True)
+
+    process.join()
+
+    assert session.get_session() is parent and session.pid == os.getpid()
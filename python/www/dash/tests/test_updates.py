@@ -0,0 +1,93 @@
+#
+# Tests of the /updates push channel (server/updates.py).
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import json
+import time
+import threading
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(DASH_DIR, 'server'))
+
+from updates import UpdatePublisher
+
+
+def versions(message):
+    """
+    Parse the versions of an update message.
+    """
+    assert message.startswith("event: update\n")
+    return json.loads(message.split("data: ")[1])
+
+
+def test_subscribe_throttles_busy_topics():
+    updates = UpdatePublisher(topics=('events', 'alerts'), interval=0.1)
+    stream = updates.subscribe()
+
+    assert next(stream) == "retry: 2000\n\n"
+    assert versions(next(stream)) == {'events': 0, 'alerts': 0}   # the current versions right away
+    assert updates.subscribers == 1
+
+    # the changes within the interval are sent together once it's over
+    time_begin = time.monotonic()
+
+    for _ in range(5):
+        updates.publish('events')
+
+    assert versions(next(stream)) == {'events': 5, 'alerts': 0}
+    assert time.monotonic() - time_begin >= 0.09
+
+    # a change after a quiet period is sent right away
+    time.sleep(0.15)
+    threading.Timer(0.02, updates.publish, args=('alerts', 7)).start()
+    time_begin = time.monotonic()
+
+    assert versions(next(stream)) == {'events': 5, 'alerts': 7}
+    assert time.monotonic() - time_begin < 0.09
+    assert updates.messages == 3
+
+    stream.close()
+
+    assert updates.subscribers == 0
+
+
+def test_subscribe_keepalive():
+    updates = UpdatePublisher(interval=0.01, keepalive=0.05)
+    stream = updates.subscribe()
+
+    next(stream)
+    next(stream)
+
+    assert next(stream) == ": keepalive\n\n"
+    assert updates.messages == 1
+
+    updates.publish('resources')
+
+    assert versions(next(stream))['resources'] == 1
+
+
+def test_close_ends_subscriptions():
+    updates = UpdatePublisher(keepalive=15.0)
+    received = [[] for _ in range(3)]
+    threads = [threading.Thread(target=lambda messages=messages: messages.extend(updates.subscribe())) for messages in received]
+
+    for thread in threads:
+        thread.start()
+
+    time_end = time.monotonic() + 2.0
+
+    while updates.subscribers < len(threads) and time.monotonic() < time_end:
+        time.sleep(0.001)
+
+    time.sleep(0.05)   # waiting for changes
+    updates.close()
+
+    for thread in threads:
+        thread.join(timeout=1.0)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert updates.subscribers == 0
+    assert all(len(messages) == 2 for messages in received)   # the retry and the initial versions
@@ -0,0 +1,144 @@
+#
+# Tests of the StreamWorker pipeline threads (server/worker.py) with stub stages.
+#
+#   $ python3 -m pytest tests
+#
+import os
+import sys
+import time
+import threading
+
+DASH_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(DASH_DIR, 'server'))
+
+from worker import FrameQueue, StreamWorker
+
+
+class StubSource:
+    """
+    Captures a new frame object every interval, and fails or ends after a number of frames.
+    """
+    def __init__(self, interval=0.005, fail_after=None, end_after=None):
+        self.interval = interval
+        self.fail_after = fail_after
+        self.end_after = end_after
+        self.frames = 0
+        self.capturing = False
+        self.reopened = 0
+
+    def capture(self):
+        self.capturing = True
+
+        try:
+            if self.fail_after is not None and self.frames >= self.fail_after:
+                raise IOError("stub source disconnected")
+
+            if self.end_after is not None and self.frames >= self.end_after:
+                raise EOFError("end of the stub file")
+
+            time.sleep(self.interval)
+            self.frames += 1
+            return object()
+        finally:
+            self.capturing = False
+
+    def reopen(self):
+        assert not self.capturing, "the source was reopened during a capture"
+        self.frames = 0
+        self.reopened += 1
+
+
+def supervise(worker, seconds, interval=0.05):
+    time_end = time.perf_counter() + seconds
+
+    while time.perf_counter() < time_end:
+        worker.supervise()
+        time.sleep(interval)
+
+
+def test_frame_queue_drops_oldest():
+    queue = FrameQueue(size=2)
+
+    assert queue.put(1) is None
+    assert queue.put(2) is None
+    assert queue.put(3) == 1
+    assert queue.dropped == 1
+    assert [queue.get(), queue.get(), queue.get(timeout=0.01)] == [2, 3, None]
+
+
+def test_failed_stream_is_reopened_and_restarted():
+    source = StubSource(fail_after=20)
+    worker = StreamWorker('/test', capture=source.capture, reopen=source.reopen, backoff=0.05, max_backoff=0.1)
+
+    supervise(worker, 1.0)
+    stats = worker.stats()
+    worker.stop()
+
+    assert stats['restarts'] >= 2
+    assert source.reopened == stats['restarts']
+    assert stats['frames']['render'] > 20
+
+
+def test_reopen_waits_for_a_blocked_capture():
+    release = threading.Event()
+    source = StubSource()
+    capture = source.capture
+
+    def blocking_capture():
+        if source.frames >= 5:
+            release.wait()   # blocked in the source, even after the stall timeout
+        return capture()
+
+    worker = StreamWorker('/test', capture=blocking_capture, reopen=source.reopen, stall_timeout=0.1, backoff=0.0)
+    supervise(worker, 1.5)
+
+    assert source.reopened == 0
+    assert worker.alive
+
+    release.set()
+    supervise(worker, 0.5)
+    worker.stop()
+
+    assert source.reopened >= 1
+
+
+def test_ended_stream_is_not_restarted():
+    source = StubSource(end_after=10)
+    worker = StreamWorker('/test', capture=source.capture, reopen=source.reopen, backoff=0.0)
+
+    supervise(worker, 0.5)
+    stats = worker.stats()
+
+    assert stats['finished']
+    assert stats['error'] is None
+    assert stats['restarts'] == 0
+    assert source.reopened == 0
+    assert not worker.supervise()
+
+
+def test_frames_are_copied_into_recycled_buffers():
+    source = StubSource(interval=0.001)
+    buffers = []   # every buffer the copy allocated
+    rendered = []
+
+    def copy(img, buffer):
+        if buffer is None:
+            buffer = {}
+            buffers.append(buffer)
+        buffer['img'] = img
+        return buffer
+
+    def render(img):
+        assert any(img is buffer for buffer in buffers)
+        rendered.append(img['img'])
+        time.sleep(0.01)   # slower than the capture, so frames are dropped
+
+    worker = StreamWorker('/test', capture=source.capture, process=lambda img: time.sleep(0.005),
+                          render=render, copy=copy, queue_size=1)
+    supervise(worker, 0.5)
+    stats = worker.stats()
+    worker.stop()
+
+    assert len(rendered) > 10
+    assert stats['dropped']['process'] > 0
+    assert len(buffers) <= 3 + 2 * 1   # the frames in flight
@@ -38,6 +38,7 @@ parser.add_argument("--ssl-cert", default=os.getenv('SSL_CERT'), type=str, help=
 parser.add_argument("--title", default='Hello AI World', type=str, help="the title of the webpage as shown in the browser")
 parser.add_argument("--input", default='webrtc://@:8554/input', type=str, help="input camera stream or video file")
 parser.add_argument("--output", default='webrtc://@:8554/output', type=str, help="WebRTC output stream to serve from --input")
+parser.add_argument("--no-prefetch", dest="prefetch", action="store_false", help="capture each frame in sequence with processing it, instead of in the background")
 parser.add_argument("--classification", default='', type=str, help="load classification model (see imageNet arguments)")
 parser.add_argument("--detection", default='', type=str, help="load object detection model (see detectNet arguments)")
 parser.add_argument("--segmentation", default='', type=str, help="load semantic segmentation model (see segNet arguments)")
@@ -37,6 +37,7 @@ parser.add_argument("--ssl-key", default=os.getenv('SSL_KEY'), type=str, help="p
 parser.add_argument("--ssl-cert", default=os.getenv('SSL_CERT'), type=str, help="path to PEM-encoded SSL/TLS certificate file for enabling HTTPS")
 parser.add_argument("--input", default='webrtc://@:8554/input', type=str, help="input camera stream or video file")
 parser.add_argument("--output", default='webrtc://@:8554/output', type=str, help="WebRTC output stream to serve from --input")
+parser.add_argument("--no-prefetch", dest="prefetch", action="store_false", help="capture each frame in sequence with processing it, instead of in the background")
 parser.add_argument("--no-stream", action="store_true", help="disable creation of the input/output stream (serve website only)")
 parser.add_argument("--classification", action="store_true", help="load classification model (see imageNet arguments)")
 parser.add_argument("--detection", action="store_true", help="load object detection model (see detectNet arguments)")
@@ -20,6 +20,7 @@
 # FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 #
+import os
 import sys
 import threading
 import traceback
@@ -27,6 +28,10 @@ import traceback
 from jetson_inference import imageNet, detectNet, segNet, actionNet, poseNet, backgroundNet
 from jetson_utils import videoSource, videoOutput, cudaFont, cudaAllocMapped
 
+# CapturePrefetcher is shared with the laser guidance examples (capture.py only needs jetson_utils)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'examples', 'laser_guidance'))
+from capture import CapturePrefetcher
+
 
 class Stream(threading.Thread):
     """
@@ -36,6 +41,10 @@ class Stream(threading.Thread):
         super().__init__()
         self.args = args
         self.input = videoSource(args.input, argv=sys.argv)
+
+        if args.prefetch:
+            self.input = CapturePrefetcher(self.input)   # capture the next frame while this one is processed
+
         self.output = videoOutput(args.output, argv=sys.argv)
         self.frames = 0
 